@@ -7,11 +7,11 @@ warnings.simplefilter('ignore', ExtDeprecationWarning)
 
 from pytz import utc
 
-from app.helpers.scheduled_jobs import send_mail_to_expired_orders, empty_trash, send_after_event_mail, \
-    send_event_fee_notification, send_event_fee_notification_followup, empty_csv_export
+from app.helpers.scheduled_jobs import write_last_access, write_logs
 
 from celery import Celery
-from celery.signals import after_task_publish
+from celery.signals import after_task_publish, task_postrun
+import atexit
 import logging
 import os.path
 from os import environ
@@ -42,7 +42,12 @@ from app.api.helpers.errors import NotFoundError, PermissionDeniedError, ServerE
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.helpers.data import DataManager, delete_from_db
 from app.helpers.helpers import send_after_event
-from app.helpers.cache import cache
+from app.helpers.cache import cache, get_cache_config
+from app.helpers.last_access import record_access, LAST_ACCESS_FLUSH_INTERVAL
+from app.helpers.log_writer import flush_logs, LOG_FLUSH_INTERVAL
+from app.helpers.mail_dispatch import dispatch_mails, stop_mailers
+from app.helpers.exporters.export_scheduler import dispatch_exports
+from app.helpers.job_runner import schedule_jobs, beat_schedule
 from app.helpers.babel import babel
 from helpers.helpers import send_email_for_expired_orders
 from werkzeug.contrib.profiler import ProfilerMiddleware
@@ -92,10 +97,7 @@ def create_app():
     _manager = Manager(app)
     _manager.add_command('db', MigrateCommand)
 
-    if app.config['CACHING']:
-        cache.init_app(app, config={'CACHE_TYPE': 'simple'})
-    else:
-        cache.init_app(app, config={'CACHE_TYPE': 'null'})
+    cache.init_app(app, config=get_cache_config(app.config))
 
     stripe.api_key = 'SomeStripeKey'
     app.secret_key = 'super secret key'
@@ -150,7 +152,22 @@ init_error_handlers(app)
 @app.before_request
 def track_user():
     if current_user.is_authenticated:
-        current_user.update_lat()
+        record_access(current_user)
+
+
+@app.teardown_request
+def write_request_logs(exception=None):
+    flush_logs()
+
+
+@app.teardown_appcontext
+def send_queued_mails(exception=None):
+    dispatch_mails()
+
+
+@app.teardown_appcontext
+def queue_schedule_exports(exception=None):
+    dispatch_exports()
 
 
 def make_celery(app):
@@ -186,20 +203,36 @@ def update_sent_state(sender=None, body=None, **kwargs):
     backend.store_result(body['id'], None, 'WAITING')
 
 
+@task_postrun.connect
+def write_task_logs(**kwargs):
+    with app.app_context():
+        flush_logs()
+
+
 # register celery tasks. removing them will cause the tasks to not function. so don't remove them
 # it is important to register them after celery is defined to resolve circular imports
 import api.helpers.tasks
 import helpers.tasks
+# register the cache invalidation receivers
+import helpers.cache_invalidation
+# keep the sales rollups in sync with the orders
+import helpers.sales_rollup
 
 
 scheduler = BackgroundScheduler(timezone=utc)
-scheduler.add_job(send_mail_to_expired_orders, 'interval', hours=5)
-scheduler.add_job(empty_trash, 'cron', hour=5, minute=30)
-scheduler.add_job(empty_csv_export, 'cron', hour=5, minute=30)
-scheduler.add_job(send_after_event_mail, 'cron', hour=5, minute=30)
-scheduler.add_job(send_event_fee_notification, 'cron', day=1)
-scheduler.add_job(send_event_fee_notification_followup, 'cron', day=15)
+# the jobs of app.helpers.scheduled_jobs run once across the fleet: from the
+# scheduler of every process, under their lock, or from `celery beat` alone
+if app.config['SCHEDULED_JOBS_RUNNER'] == 'scheduler':
+    schedule_jobs(scheduler)
+celery.conf.CELERYBEAT_SCHEDULE = beat_schedule()
+celery.conf.CELERY_TIMEZONE = 'UTC'
+# the buffers of this process
+scheduler.add_job(write_last_access, 'interval', seconds=LAST_ACCESS_FLUSH_INTERVAL)
+scheduler.add_job(write_logs, 'interval', seconds=LOG_FLUSH_INTERVAL)
 scheduler.start()
+# don't lose the logs queued by a worker shutting down
+atexit.register(write_logs)
+atexit.register(stop_mailers)
 
 
 # Testing database performance
@@ -1,10 +1,12 @@
+import errno
 import json
 import os
 import shutil
+import tempfile
+import zipfile
 from collections import OrderedDict
 from datetime import datetime
 
-import requests
 from flask import current_app as app
 from flask import request, g, url_for
 from flask_restplus import marshal
@@ -14,7 +16,8 @@ from app.helpers.data_getter import DataGetter
 from app.helpers.helpers import send_email_after_export, send_notif_after_export
 from app.models.event import Event as EventModel
 from app.models.export_jobs import ExportJob
-from import_helpers import is_downloadable, get_filename_from_cd
+from .helpers import get_object_query
+from .media_transfer import MediaFetcher
 from .non_apis import CustomFormDAO, CUSTOM_FORM
 from ..events import DAO as EventDAO, EVENT as EVENT_MODEL
 from ..microlocations import DAO as MicrolocationDAO, MICROLOCATION
@@ -41,6 +44,12 @@ EXPORTS = [
     ('forms', CustomFormDAO, CUSTOM_FORM)
 ]
 
+# workspaces of the export jobs, under BASE_DIR
+EXPORT_WORKSPACES = '/static/uploads/exports/'
+
+# entities marshalled and written at a time
+EXPORT_BATCH_SIZE = 100
+
 # order of keys in export json
 FIELD_ORDER = {
     'event': [
@@ -123,12 +132,13 @@ def _order_json(data, srv):
     return new_data
 
 
-def _download_media(data, srv, dir_path, settings):
+def _media_targets(data, srv, settings):
     """
-    Downloads the media and saves it
+    Returns the (data, field, path, url) of the media to download
     """
     if srv not in DOWNLOAD_FIEDLS:
-        return
+        return []
+    targets = []
     for i in DOWNLOAD_FIEDLS[srv]:
         if not data[i]:
             continue
@@ -145,24 +155,8 @@ def _download_media(data, srv, dir_path, settings):
             ext = data[i].rsplit('.', 1)[1]
             if ext.find('/') == -1:
                 path += '.' + ext
-        full_path = dir_path + path
-        # make dir
-        cdir = full_path.rsplit('/', 1)[0]
-        if not os.path.isdir(cdir):
-            os.makedirs(cdir)
-        # download and set
-        url = data[i]
-        if not is_downloadable(url):
-            continue
-        try:
-            r = requests.get(url, allow_redirects=True)
-            ext = get_filename_from_cd(r.headers.get('content-disposition'))[1]
-            full_path += ext
-            path += ext
-            open(full_path, 'wb').write(r.content)
-            data[i] = path
-        except Exception:
-            pass
+        targets.append((data, i, path, data[i]))
+    return targets
 
 
 def _generate_meta():
@@ -173,53 +167,144 @@ def _generate_meta():
     return d
 
 
+def _batches(model, event_id, size):
+    """
+    Yields the objects of an event in batches, walking their ids upwards
+    """
+    query = get_object_query(model, event_id=event_id)
+    last_id = None
+    while True:
+        batch_query = query if last_id is None else query.filter(model.id > last_id)
+        batch = batch_query.order_by(model.id).limit(size).all()
+        if not batch:
+            return
+        yield batch
+        if len(batch) < size:
+            return
+        last_id = batch[-1].id
+
+
+def _dumps(data):
+    return json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
+
+
+class EventExport(object):
+    """
+    Writes the zip of an event in one pass. The services are marshalled in
+    batches and their JSON arrays and media go straight to the archive,
+    in a workspace of the job.
+    """
+
+    def __init__(self, event_id, settings):
+        self.event_id = event_id
+        self.settings = settings
+        self.workspace = None
+        self.zip = None
+        # content digest / url -> path of the media in the archive
+        self.saved = {}
+        self.saved_urls = {}
+
+    def run(self):
+        exports_dir = app.config['BASE_DIR'] + EXPORT_WORKSPACES
+        try:
+            os.makedirs(exports_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        # exports of the same event may run at the same time
+        self.workspace = tempfile.mkdtemp(prefix='event%d_' % self.event_id, dir=exports_dir)
+        try:
+            zip_path = os.path.join(self.workspace, 'event%d.zip' % self.event_id)
+            self.zip = zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+            try:
+                for e in EXPORTS:
+                    if e[0] == 'event':
+                        self._write_event(e)
+                    else:
+                        self._write_service(e)
+                self.zip.writestr('meta', json.dumps(
+                    _generate_meta(), sort_keys=True,
+                    indent=4, ensure_ascii=False
+                ).encode('utf-8'))
+            finally:
+                self.zip.close()
+            return self._upload(zip_path)
+        finally:
+            shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def _write_event(self, e):
+        data = _order_json(marshal(e[1].get(self.event_id), e[2]), e)
+        self._save_media(_media_targets(data, e[0], self.settings))
+        self.zip.writestr(e[0], _dumps(data))
+
+    def _write_service(self, e):
+        # zipfile can't write an entry in parts, the array is streamed to a
+        # file of the workspace first
+        path = os.path.join(self.workspace, e[0])
+        count = 0
+        with open(path, 'w') as f:
+            f.write('[')
+            for batch in _batches(e[1].model, self.event_id, EXPORT_BATCH_SIZE):
+                data = [_order_json(item, e) for item in marshal(batch, e[2])]
+                targets = []
+                for item in data:
+                    targets += _media_targets(item, e[0], self.settings)
+                self._save_media(targets)
+                for item in data:
+                    if count:
+                        f.write(',')
+                    f.write('\n    ' + _dumps(item).replace('\n', '\n    '))
+                    count += 1
+            f.write('\n]' if count else ']')
+        self.zip.write(path, e[0])
+        os.remove(path)
+
+    def _save_media(self, targets):
+        """
+        Downloads the media of a batch in parallel and adds them to the
+        archive. Media with the same content are added once, their fields
+        share the path.
+        """
+        if not targets:
+            return
+        media_dir = tempfile.mkdtemp(prefix='media_', dir=self.workspace)
+        try:
+            fetched = MediaFetcher(media_dir).fetch_all(
+                url for _, _, _, url in targets if url not in self.saved_urls)
+            for data, field, path, url in targets:
+                if url not in self.saved_urls:
+                    media = fetched.get(url)
+                    if media is None:
+                        continue
+                    if media.digest not in self.saved:
+                        path += media.extension
+                        self.zip.write(media.path, path.lstrip('/'))
+                        self.saved[media.digest] = path
+                    self.saved_urls[url] = self.saved[media.digest]
+                data[field] = self.saved_urls[url]
+        finally:
+            shutil.rmtree(media_dir, ignore_errors=True)
+
+    def _upload(self, zip_path):
+        storage_path = UPLOAD_PATHS['exports']['zip'].format(
+            event_id=self.event_id
+        )
+        uploaded_file = UploadedFile(zip_path, zip_path.rsplit('/', 1)[1])
+        try:
+            storage_url = upload(uploaded_file, storage_path)
+        finally:
+            uploaded_file.file.close()
+
+        if get_settings()['storage_place'] != "s3" and get_settings()['storage_place'] != 'gs':
+            storage_url = app.config['BASE_DIR'] + storage_url.replace("/serve_", "/")
+        return storage_url
+
+
 def export_event_json(event_id, settings):
     """
     Exports the event as a zip on the server and return its path
     """
-    # make directory
-    exports_dir = app.config['BASE_DIR'] + '/static/uploads/exports/'
-    if not os.path.isdir(exports_dir):
-        os.mkdir(exports_dir)
-    dir_path = exports_dir + 'event%d' % event_id
-    if os.path.isdir(dir_path):
-        shutil.rmtree(dir_path, ignore_errors=True)
-    os.mkdir(dir_path)
-    # save to directory
-    for e in EXPORTS:
-        if e[0] == 'event':
-            data = _order_json(marshal(e[1].get(event_id), e[2]), e)
-            _download_media(data, 'event', dir_path, settings)
-        else:
-            data = marshal(e[1].list(event_id), e[2])
-            for count in range(len(data)):
-                data[count] = _order_json(data[count], e)
-                _download_media(data[count], e[0], dir_path, settings)
-        data_str = json.dumps(data, indent=4, ensure_ascii=False).encode('utf-8')
-        fp = open(dir_path + '/' + e[0], 'w')
-        fp.write(data_str)
-        fp.close()
-    # add meta
-    data_str = json.dumps(
-        _generate_meta(), sort_keys=True,
-        indent=4, ensure_ascii=False
-    ).encode('utf-8')
-    fp = open(dir_path + '/meta', 'w')
-    fp.write(data_str)
-    fp.close()
-    # make zip
-    shutil.make_archive(dir_path, 'zip', dir_path)
-    dir_path = dir_path + ".zip"
-
-    storage_path = UPLOAD_PATHS['exports']['zip'].format(
-        event_id=event_id
-    )
-    uploaded_file = UploadedFile(dir_path, dir_path.rsplit('/', 1)[1])
-    storage_url = upload(uploaded_file, storage_path)
-
-    if get_settings()['storage_place'] != "s3" and get_settings()['storage_place'] != 'gs':
-        storage_url = app.config['BASE_DIR'] + storage_url.replace("/serve_", "/")
-    return storage_url
+    return EventExport(event_id, settings).run()
 
 
 # HELPERS
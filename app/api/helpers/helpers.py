@@ -1,3 +1,4 @@
+import base64
 import json
 from datetime import datetime
 from functools import wraps, update_wrapper
@@ -8,10 +9,11 @@ from flask.ext.restplus import fields
 from flask.ext.restplus.utils import merge
 from flask.ext.scrypt import check_password_hash
 from flask_jwt import jwt_required, JWTError, current_identity
-from sqlalchemy import func
+from sqlalchemy import func, or_, and_
 
 from app.helpers.helpers import represents_int
 from app.helpers.data import save_to_db, delete_from_db
+from app.helpers.last_access import record_access
 from app.models import db
 from app.models.event import Event as EventModel
 from app.models.user import User as UserModel
@@ -20,6 +22,9 @@ from query_filters import extract_special_queries, apply_special_queries
 from .errors import NotFoundError, InvalidServiceError, ValidationError, \
     NotAuthorizedError, ServerError, PermissionDeniedError
 
+CURSOR_ARGS = ('cursor', 'cursor_key', 'with_count')
+CURSOR_DATETIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
 
 def _get_queryset(klass):
     """Returns the queryset for `klass` model"""
@@ -33,10 +38,10 @@ def _make_url_query(args):
     return '?' + '&'.join('%s=%s' % (key, args[key]) for key in args)
 
 
-def get_object_list(klass, **kwargs):
-    """Returns a list of objects of a model class. Uses other passed arguments
+def get_object_query(klass, **kwargs):
+    """Returns the filtered query for a model class. Uses other passed arguments
     with `filter_by` to filter objects.
-    `klass` can be a model such as a Track, Event, Session, etc.
+    Nothing is fetched from the database until the query is evaluated.
     """
     queryset = _get_queryset(klass)
     if hasattr(klass, 'deleted_at'):
@@ -50,9 +55,15 @@ def get_object_list(klass, **kwargs):
         else:
             queryset = queryset.filter(getattr(klass, i) == kwargs[i])
     # special filters
-    obj_list = apply_special_queries(queryset, specials)
-    # return as list
-    return list(obj_list)
+    return apply_special_queries(queryset, specials)
+
+
+def get_object_list(klass, **kwargs):
+    """Returns a list of objects of a model class. Uses other passed arguments
+    with `filter_by` to filter objects.
+    `klass` can be a model such as a Track, Event, Session, etc.
+    """
+    return list(get_object_query(klass, **kwargs))
 
 
 def get_list_or_404(klass, **kwargs):
@@ -96,6 +107,69 @@ def get_object_in_event(klass, id_, event_id):
     return obj
 
 
+def _keyset_columns(klass, key):
+    """
+    Columns a keyset (cursor) page is ordered and seeked on.
+    `id` is always the last column so that the ordering is total.
+    """
+    if key == 'start_time' and hasattr(klass, 'start_time'):
+        return [klass.start_time, klass.id]
+    return [klass.id]
+
+
+def encode_cursor(key, item):
+    """
+    Returns an opaque cursor pointing just after `item`
+    """
+    values = []
+    for column in _keyset_columns(type(item), key):
+        value = getattr(item, column.key)
+        if isinstance(value, datetime):
+            value = value.strftime(CURSOR_DATETIME_FORMAT)
+        values.append(value)
+    return base64.urlsafe_b64encode(json.dumps([key, values]))
+
+
+def decode_cursor(klass, cursor):
+    """
+    Returns the (key, values) pair stored in a cursor.
+    Raises a ValidationError for malformed cursors.
+    """
+    try:
+        key, values = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        columns = _keyset_columns(klass, key)
+        if len(values) != len(columns):
+            raise ValueError
+        if key == 'start_time' and len(columns) == 2:
+            values[0] = datetime.strptime(values[0], CURSOR_DATETIME_FORMAT)
+    except (TypeError, ValueError):
+        raise ValidationError(field='cursor', message='Invalid cursor')
+    return key, values
+
+
+def _apply_keyset(queryset, klass, key, values=None):
+    """
+    Orders the query on the keyset columns and, when `values` are given,
+    seeks past them without an OFFSET.
+    """
+    columns = _keyset_columns(klass, key)
+    queryset = queryset.order_by(None).order_by(*columns)
+    if values:
+        # (c1, c2) > (v1, v2) spelt out so that it works on every backend
+        condition = columns[-1] > values[-1]
+        for column, value in reversed(list(zip(columns[:-1], values[:-1]))):
+            condition = or_(column > value, and_(column == value, condition))
+        queryset = queryset.filter(condition)
+    return queryset
+
+
+def _count_query(queryset):
+    """
+    Returns the number of rows matched by a query, computed in SQL
+    """
+    return queryset.order_by(None).count()
+
+
 def get_paginated_list(klass, url=None, args={}, **kwargs):
     """
     Returns a paginated response object
@@ -105,18 +179,29 @@ def get_paginated_list(klass, url=None, args={}, **kwargs):
     args - args passed to the request as query parameters
     kwargs - filters for query on the `klass` model. if
         kwargs has event_id, check if it exists for 404
+
+    The count and the page are both computed by the database (COUNT and
+    LIMIT/OFFSET), so only the rows of the requested page are loaded.
+    If `cursor` is present in args (an empty value starts from the
+    beginning), the keyset mode is used instead of OFFSET. The page is
+    then ordered on `cursor_key` (`id` or `start_time`) and `next_cursor`
+    points to the following page. `count` is only computed in keyset mode
+    when `with_count` is set.
     """
     if 'event_id' in kwargs:
         get_object_or_404(EventModel, kwargs['event_id'])
     # auto-get url
     if url is None:
         url = request.base_url
+    queryset = get_object_query(klass, **kwargs)
+    if args.get('cursor') is not None:
+        return _get_keyset_page(klass, queryset, url, args)
+    args = dict((k, v) for k, v in args.items() if k not in CURSOR_ARGS)
     # get page bounds
     start = args['start']
     limit = args['limit']
     # check if page exists
-    results = get_object_list(klass, **kwargs)
-    count = len(results)
+    count = _count_query(queryset)
     if (count < start):
         raise NotFoundError(
             message='Start position \'{}\' out of bound'.format(start))
@@ -142,7 +227,47 @@ def get_paginated_list(klass, url=None, args={}, **kwargs):
         args_copy['start'] = start + limit
         obj['next'] = url + _make_url_query(args_copy)
     # finally extract result according to bounds
-    obj['results'] = results[(start - 1):(start - 1 + limit)]
+    # id is appended as a tie-breaker so that pages don't overlap
+    obj['results'] = queryset.order_by(klass.id) \
+        .offset(start - 1).limit(limit).all()
+
+    return obj
+
+
+def _get_keyset_page(klass, queryset, url, args):
+    """
+    Keyset (cursor) variant of `get_paginated_list`.
+    Cost does not grow with the position of the page in the table, unless
+    `with_count` asks for the total (a COUNT over the filtered rows).
+    """
+    limit = args['limit']
+    cursor = args.get('cursor')
+    key = args.get('cursor_key') or 'id'
+    values = None
+    if cursor:
+        key, values = decode_cursor(klass, cursor)
+    # fetch one more row to know if there is a next page
+    results = _apply_keyset(queryset, klass, key, values) \
+        .limit(limit + 1).all()
+    if not cursor and not results:
+        raise NotFoundError(message='Object list is empty')
+    has_next = len(results) > limit
+    results = results[:limit]
+    obj = {}
+    obj['start'] = args.get('start')
+    obj['limit'] = limit
+    obj['count'] = _count_query(queryset) if args.get('with_count') else None
+    obj['previous'] = ''
+    obj['next'] = ''
+    obj['next_cursor'] = ''
+    if has_next:
+        args_copy = dict((k, v) for k, v in args.items() if k != 'start' and
+                         (k != 'with_count' or v))
+        args_copy['cursor'] = encode_cursor(key, results[-1])
+        args_copy['cursor_key'] = key
+        obj['next_cursor'] = args_copy['cursor']
+        obj['next'] = url + _make_url_query(args_copy)
+    obj['results'] = results
 
     return obj
 
@@ -312,7 +437,7 @@ def requires_auth(f):
                 # and not pickable which causes problems in celery
                 success = True
         else:
-            g.user.update_lat()
+            record_access(g.user)
         if success:
             return f(*args, **kwargs)
         else:
@@ -1,23 +1,28 @@
+import errno
 import json
 import os
-import re
 import shutil
+import tempfile
 import traceback
 import zipfile
 
-import requests
 from flask import current_app as app
 from flask import request, g
 from werkzeug import secure_filename
 
 from app.helpers.data import save_to_db
+from app.helpers.data_getter import DataGetter
 from app.helpers.helpers import update_state, send_email_after_import
-from app.helpers.storage import UploadedFile, upload, UploadedMemory, \
-    UPLOAD_PATHS
+from app.helpers.storage import UploadedFile, upload, UPLOAD_PATHS
 from app.helpers.update_version import VersionUpdater
+from app.models import db
 from app.models.import_jobs import ImportJob
+from app.settings import get_settings
 from errors import BaseError, ServerError, NotFoundError
+from app.api.helpers.helpers import model_custom_form
+from app.api.helpers.media_transfer import MediaFetcher, run_parallel
 from app.api.helpers.non_apis import CustomFormDAO
+from app.api.helpers.utils import ServiceDAO
 from app.api.events import DAO as EventDAO, LinkDAO as SocialLinkDAO
 from app.api.microlocations import DAO as MicrolocationDAO
 from app.api.sessions import DAO as SessionDAO, TypeDAO as SessionTypeDAO
@@ -51,10 +56,14 @@ RELATED_FIELDS = {
     ]
 }
 
-UPLOAD_QUEUE = []
-
-CUR_ID = None
+# the extracted zips, under BASE_DIR, a directory per import
+IMPORT_WORKSPACES = '/static/uploads/import_event'
 
+# the custom form fields validating a service
+CUSTOM_FORM_FIELDS = {
+    'sessions': 'session_form',
+    'speakers': 'speaker_form',
+}
 
 def _allowed_file(filename, ext):
     return '.' in filename and filename.rsplit('.', 1)[1] in ext
@@ -135,94 +144,6 @@ def _delete_fields(srv, data):
     return data
 
 
-def _upload_media_queue(srv, obj):
-    """
-    Add media uploads to queue
-    """
-    global UPLOAD_QUEUE
-
-    if srv[0] not in UPLOAD_PATHS:
-        return
-    for i in UPLOAD_PATHS[srv[0]]:
-        path = getattr(obj, i)
-        if not path:
-            continue
-        # if not path.startswith('/'):  # relative
-        #     continue
-        # file OK
-        UPLOAD_QUEUE.append({
-            'srv': srv,
-            'id': obj.id,
-            'field': i
-        })
-    return
-
-
-def _upload_media(task_handle, event_id, base_path):
-    """
-    Actually uploads the resources
-    """
-    global UPLOAD_QUEUE
-    total = len(UPLOAD_QUEUE)
-    ct = 0
-
-    for i in UPLOAD_QUEUE:
-        # update progress
-        ct += 1
-        update_state(task_handle, 'Uploading media (%d/%d)' % (ct, total))
-        # get upload infos
-        name, dao = i['srv']
-        id_ = i['id']
-        if name == 'event':
-            item = dao.get(event_id)
-        else:
-            item = dao.get(event_id, id_)
-        # get cur file
-        field = i['field']
-        path = getattr(item, field)
-        if path.startswith('/'):
-            # relative files
-            path = base_path + path
-            if os.path.isfile(path):
-                filename = path.rsplit('/', 1)[1]
-                file = UploadedFile(path, filename)
-            else:
-                file = ''  # remove current file setting
-        else:
-            # absolute links
-            try:
-                filename = UPLOAD_PATHS[name][field].rsplit('/', 1)[1]
-                if is_downloadable(path):
-                    r = requests.get(path, allow_redirects=True)
-                    file = UploadedMemory(r.content, filename)
-                else:
-                    file = None
-            except:
-                file = None
-        # don't update current file setting
-        if file is None:
-            continue
-        # upload
-        try:
-            if file == '':
-                raise Exception()
-            key = UPLOAD_PATHS[name][field]
-            if name == 'event':
-                key = key.format(event_id=event_id)
-            else:
-                key = key.format(event_id=event_id, id=id_)
-            print key
-            new_url = upload(file, key)
-        except Exception:
-            print traceback.format_exc()
-            new_url = None
-        setattr(item, field, new_url)
-        save_to_db(item, msg='Url updated')
-    # clear queue
-    UPLOAD_QUEUE = []
-    return
-
-
 def _fix_related_fields(srv, data, service_ids):
     """
     Fixes the ids services which are related to others.
@@ -259,140 +180,212 @@ def _fix_related_fields(srv, data, service_ids):
     return data
 
 
-def create_service_from_json(task_handle, data, srv, event_id, service_ids=None):
+class EventImport(object):
     """
-    Given :data as json, create the service on server
-    :service_ids are the mapping of ids of already created services.
-        Used for mapping old ids to new
+    Import of an event zip. Every import has a workspace of its own, the
+    zip is extracted in a temporary directory removed when it is done.
+    The services of the event are validated, built in memory with their
+    old ids mapped to the new objects, and inserted in a single
+    transaction, a flush per service. Media are uploaded once the event is
+    saved.
     """
-    if service_ids is None:
-        service_ids = {}
-    global CUR_ID
-    # sort by id
-    data.sort(key=lambda k: k['id'])
-    ids = {}
-    ct = 0
-    total = len(data)
-    # start creating
-    for obj in data:
-        # update status
-        ct += 1
-        update_state(task_handle, 'Importing %s (%d/%d)' % (srv[0], ct, total))
-        # trim id field
-        old_id, obj = _trim_id(obj)
-        CUR_ID = old_id
-        # delete not needed fields
-        obj = _delete_fields(srv, obj)
-        # related
-        obj = _fix_related_fields(srv, obj, service_ids)
-        # create object
-        new_obj = srv[1].create(event_id, obj, 'dont')[0]
-        ids[old_id] = new_obj.id
-        # add uploads to queue
-        _upload_media_queue(srv, new_obj)
-
-    return ids
+
+    def __init__(self, zip_path, task_handle):
+        self.zip_path = zip_path
+        self.task_handle = task_handle
+        self.workspace = None
+        self.event = None
+        # service name -> {old id: new id}
+        self.service_ids = {}
+        # service name -> {new id: object}
+        self.objects = {}
+        # (service name, object, field) of the media to upload
+        self.uploads = []
+        # (service name, old id) being imported, for the error messages
+        self.current = None
+
+    def run(self):
+        update_state(self.task_handle, 'Started')
+        with app.app_context():
+            parent = app.config['BASE_DIR'] + IMPORT_WORKSPACES
+        try:
+            os.makedirs(parent)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        self.workspace = tempfile.mkdtemp(prefix='import_', dir=parent)
+        try:
+            with zipfile.ZipFile(self.zip_path, "r") as z:
+                z.extractall(self.workspace)
+            data = self._import_event()
+            self._import_services(data.get('social_links', []))
+            self._upload_media()
+            VersionUpdater(False, self.event.id, '').set(data.get('version', {}))
+            return self.event
+        finally:
+            shutil.rmtree(self.workspace, ignore_errors=True)
+
+    def _read(self, name):
+        with open(os.path.join(self.workspace, name), 'r') as f:
+            return json.loads(f.read())
+
+    def _import_event(self):
+        update_state(self.task_handle, 'Importing event core')
+        try:
+            data = self._read('event')
+            _, data = _trim_id(data)
+            data = _delete_fields(('event', EventDAO), data)
+            self.event = EventDAO.create(data, 'dont')[0]
+            self._queue_media('event', self.event)
+        except BaseError as e:
+            raise make_error('event', er=e)
+        except Exception as e:
+            raise make_error('event', er=e)
+        return data
+
+    def _import_services(self, social_links):
+        name = None
+        try:
+            for name, dao in IMPORT_SERIES:
+                update_state(self.task_handle, 'Importing %s' % name)
+                items = social_links if name == 'social_links' else self._read(name)
+                self._import_service(name, dao, items)
+            self.current = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            old_id = self.current[1] if self.current else None
+            EventDAO.delete(self.event.id)
+            if isinstance(e, BaseError):
+                raise make_error(name, er=e, id_=old_id)
+            if isinstance(e, IOError):
+                raise NotFoundError('File %s missing in event zip' % name)
+            if isinstance(e, ValueError):
+                raise make_error(name, er=ServerError('Invalid json'))
+            print traceback.format_exc()
+            raise make_error(name, id_=old_id)
+
+    def _validator(self, name, dao):
+        """Returns the validation of a service, its custom form is read once"""
+        model = None
+        if name in CUSTOM_FORM_FIELDS:
+            form = DataGetter.get_custom_form_elements(self.event.id)
+            if form:
+                model = model_custom_form(getattr(form, CUSTOM_FORM_FIELDS[name]), dao.post_api_model)
+        return lambda data: ServiceDAO.validate(dao, data, model)
+
+    def _import_service(self, name, dao, items):
+        validate = self._validator(name, dao)
+        items = sorted(items, key=lambda k: k['id'])
+        created = []
+        for item in items:
+            old_id, data = _trim_id(item)
+            self.current = (name, old_id)
+            data = _delete_fields((name, dao), data)
+            data = _fix_related_fields((name, dao), data, self.service_ids)
+            created.append((old_id, self._build(name, dao, validate(data))))
+        self.current = None
+        # the new ids are needed by the services relating to this one
+        db.session.flush()
+        self.service_ids[name] = dict((old_id, obj.id) for old_id, obj in created)
+        self.objects[name] = dict((obj.id, obj) for _, obj in created)
+        for _, obj in created:
+            self._queue_media(name, obj)
+
+    def _build(self, name, dao, data):
+        event_id = self.event.id
+        if name == 'forms':
+            # an event has one custom form
+            form = dao.model.query.filter_by(event_id=event_id).first()
+            if form:
+                for key, value in data.items():
+                    setattr(form, key, value)
+                return form
+        elif name == 'sessions':
+            related = dict((field, self.objects[service].get(data.get(key)))
+                           for field, key, service in RELATED_FIELDS['sessions'] if field != 'speakers')
+            speakers = [self.objects['speakers'][speaker_id] for speaker_id in data.get('speaker_ids') or []
+                        if speaker_id in self.objects['speakers']]
+            data = dao._delete_fields(data)
+            data.update(related)
+            data['speakers'] = speakers
+        data['event_id'] = event_id
+        obj = dao.model(**data)
+        db.session.add(obj)
+        return obj
+
+    def _queue_media(self, name, obj):
+        for field in UPLOAD_PATHS.get(name, {}):
+            if getattr(obj, field):
+                self.uploads.append((name, obj, field))
+
+    def _media_file(self, name, field, path, fetched):
+        """
+        Returns the (path, filename) of a media, '' to clear the field or
+        None to keep it
+        """
+        if path.startswith('/'):
+            # relative files
+            path = self.workspace + path
+            if os.path.isfile(path):
+                return path, path.rsplit('/', 1)[1]
+            return ''
+        # absolute links, fetched beforehand
+        if path in fetched:
+            return fetched[path].path, UPLOAD_PATHS[name][field].rsplit('/', 1)[1]
+        return None
+
+    def _upload_media(self):
+        if not self.uploads:
+            return
+        update_state(self.task_handle, 'Fetching media')
+        fetched = MediaFetcher(tempfile.mkdtemp(prefix='media_', dir=self.workspace)).fetch_all(
+            getattr(obj, field) for _, obj, field in self.uploads
+            if not getattr(obj, field).startswith('/'))
+        jobs = []
+        for name, obj, field in self.uploads:
+            file = self._media_file(name, field, getattr(obj, field), fetched)
+            # don't update current file setting
+            if file is None:
+                continue
+            key = UPLOAD_PATHS[name][field]
+            if name == 'event':
+                key = key.format(event_id=self.event.id)
+            else:
+                key = key.format(event_id=self.event.id, id=obj.id)
+            jobs.append((obj, field, file, key))
+        update_state(self.task_handle, 'Uploading media (%d)' % len(jobs))
+        # the workers read the settings cached by this call
+        get_settings()
+        new_urls = run_parallel(_upload_job, jobs)
+        for (obj, field, _, _), new_url in zip(jobs, new_urls):
+            setattr(obj, field, new_url)
+        db.session.commit()
+
+
+def _upload_job(job):
+    _, _, file, key = job
+    if file == '':
+        return None
+    path, filename = file
+    uploaded = UploadedFile(path, filename)
+    try:
+        return upload(uploaded, key)
+    finally:
+        uploaded.file.close()
 
 
 def import_event_json(zip_path, task_handle):
     """
     Imports and creates event from json zip
     """
-    global CUR_ID, UPLOAD_QUEUE
-    UPLOAD_QUEUE = []
-    update_state(task_handle, 'Started')
-
-    with app.app_context():
-        path = app.config['BASE_DIR'] + '/static/uploads/import_event'
-    # delete existing files
-    if os.path.isdir(path):
-        shutil.rmtree(path, ignore_errors=True)
-    # extract files from zip
-    with zipfile.ZipFile(zip_path, "r") as z:
-        z.extractall(path)
-    # create event
-    try:
-        update_state(task_handle, 'Importing event core')
-        data = json.loads(open(path + '/event', 'r').read())
-        _, data = _trim_id(data)
-        srv = ('event', EventDAO)
-        data = _delete_fields(srv, data)
-        new_event = EventDAO.create(data, 'dont')[0]
-        version_data = data.get('version', {})
-        write_file(
-            path + '/social_links',
-            json.dumps(data.get('social_links', []))
-        )  # save social_links
-        _upload_media_queue(srv, new_event)
-    except BaseError as e:
-        raise make_error('event', er=e)
-    except Exception as e:
-        raise make_error('event', er=e)
-    # create other services
-    try:
-        service_ids = {}
-        for item in IMPORT_SERIES:
-            item[1].is_importing = True
-            data = open(path + '/%s' % item[0], 'r').read()
-            dic = json.loads(data)
-            changed_ids = create_service_from_json(
-                task_handle, dic, item, new_event.id, service_ids)
-            service_ids[item[0]] = changed_ids.copy()
-            CUR_ID = None
-            item[1].is_importing = False
-    except BaseError as e:
-        EventDAO.delete(new_event.id)
-        raise make_error(item[0], er=e, id_=CUR_ID)
-    except IOError:
-        EventDAO.delete(new_event.id)
-        raise NotFoundError('File %s missing in event zip' % item[0])
-    except ValueError:
-        EventDAO.delete(new_event.id)
-        raise make_error(item[0], er=ServerError('Invalid json'))
-    except Exception:
-        print traceback.format_exc()
-        EventDAO.delete(new_event.id)
-        raise make_error(item[0], id_=CUR_ID)
-    # run uploads
-    _upload_media(task_handle, new_event.id, path)
-    # set version
-    VersionUpdater(False, new_event.id, '').set(version_data)
-    # return
-    return new_event
+    return EventImport(zip_path, task_handle).run()
 
 
 ##########
 # HELPERS
 ##########
 
-def is_downloadable(url):
-    """
-    Does the url contain a downloadable resource
-    """
-    h = requests.head(url, allow_redirects=True)
-    header = h.headers
-    content_type = header.get('content-type')
-    # content_length = header.get('content-length', 1e10)
-    if 'text' in content_type.lower():
-        return False
-    if 'html' in content_type.lower():
-        return False
-    return True
-
-
-def get_filename_from_cd(cd):
-    """
-    Get filename and ext from content-disposition
-    """
-    if not cd:
-        return '', ''
-    fname = re.findall('filename=(.+)', cd)
-    if len(fname) == 0:
-        return '', ''
-    fn = fname[0].rsplit('.', 1)
-    return fn[0], '' if len(fn) == 1 else ('.' + fn[1])
-
-
 def write_file(file, data):
     """simple write to file"""
     fp = open(file, 'w')
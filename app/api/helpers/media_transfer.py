@@ -0,0 +1,147 @@
+"""
+Media transfer stage of the event imports and exports.
+
+The media of an event used to be handled one file at a time: a HEAD
+request to check the url, a GET reading the whole body in memory, an
+upload and a commit. They now go through a bounded pool of threads
+(`run_parallel`) sharing one pooled HTTP session:
+
+- `MediaFetcher` fetches every distinct url once, streaming the body to
+  a file in chunks, and keeps a single file per content hash,
+- the callers upload or place the files in parallel and save the
+  results in one commit.
+"""
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+import requests
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+MEDIA_WORKERS = 8
+CHUNK_SIZE = 64 * 1024
+FETCH_TIMEOUT = 30
+
+_http_session = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session():
+    """Returns the HTTP session of the process, its pool fits the workers"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=MEDIA_WORKERS, pool_maxsize=MEDIA_WORKERS)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            _http_session = session
+        return _http_session
+
+
+def is_downloadable_type(content_type):
+    """Text and html responses are pages, not media"""
+    content_type = (content_type or '').lower()
+    return 'text' not in content_type and 'html' not in content_type
+
+
+def get_filename_from_cd(cd):
+    """
+    Get filename and ext from content-disposition
+    """
+    if not cd:
+        return '', ''
+    fname = re.findall('filename=(.+)', cd)
+    if len(fname) == 0:
+        return '', ''
+    fn = fname[0].rsplit('.', 1)
+    return fn[0], '' if len(fn) == 1 else ('.' + fn[1])
+
+
+def run_parallel(func, items, workers=MEDIA_WORKERS):
+    """
+    Calls `func` on every item over a pool of threads, in an app context,
+    and returns the results in order. An item whose call raised gets None.
+    """
+    if not items:
+        return []
+    app = current_app._get_current_object()
+
+    def call(item):
+        with app.app_context():
+            try:
+                return func(item)
+            except Exception:
+                logging.exception('Media transfer of %r failed' % (item,))
+                return None
+
+    pool = ThreadPool(min(workers, len(items)))
+    try:
+        return pool.map(call, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+class FetchedMedia(object):
+    """A media streamed to `path`"""
+
+    def __init__(self, path, digest, extension):
+        self.path = path
+        self.digest = digest
+        # from the content-disposition of the response
+        self.extension = extension
+
+
+def fetch(url, directory):
+    """
+    Streams the body of `url` to a new file of `directory`. Returns a
+    `FetchedMedia`, or None when the url is not a downloadable file.
+    """
+    response = get_http_session().get(url, stream=True, allow_redirects=True, timeout=FETCH_TIMEOUT)
+    try:
+        if response.status_code >= 400 or not is_downloadable_type(response.headers.get('content-type')):
+            return None
+        digest = hashlib.sha1()
+        fd, path = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if chunk:
+                    digest.update(chunk)
+                    f.write(chunk)
+        extension = get_filename_from_cd(response.headers.get('content-disposition'))[1]
+        return FetchedMedia(path, digest.hexdigest(), extension)
+    finally:
+        response.close()
+
+
+class MediaFetcher(object):
+    """
+    Fetches media to `directory`: every url once, and a single file for the
+    urls serving the same content
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def fetch_all(self, urls):
+        """Returns {url: FetchedMedia} of the urls that could be fetched"""
+        urls = list(OrderedDict.fromkeys(url for url in urls if url))
+        by_digest = {}
+        fetched = {}
+        for url, media in zip(urls, run_parallel(lambda url: fetch(url, self.directory), urls)):
+            if media is None:
+                continue
+            if media.digest in by_digest:
+                os.remove(media.path)
+                media = by_digest[media.digest]
+            else:
+                by_digest[media.digest] = media
+            fetched[url] = media
+        return fetched
@@ -3,7 +3,7 @@ from hashlib import md5
 
 from flask import request
 from flask.ext.restplus import Resource as RestplusResource
-from flask_restplus import Model, fields, reqparse
+from flask_restplus import Model, fields, inputs, reqparse
 
 from app.helpers.data import update_version
 from app.models.event import Event as EventModel
@@ -50,6 +50,21 @@ PAGE_PARAMS = {
         'type': int,
         'default': DEFAULT_PAGE_LIMIT
     },
+    'cursor': {
+        'description': 'Cursor returned as `next_cursor` by the previous page. '
+                       'Pass it empty to start a cursor based listing',
+        'type': str
+    },
+    'cursor_key': {
+        'description': 'Column the cursor based listing is ordered on (id or start_time)',
+        'type': str,
+        'default': 'id'
+    },
+    'with_count': {
+        'description': 'Also count the results in a cursor based listing (a full count of the matching rows)',
+        'type': bool,
+        'default': False
+    },
 }
 
 # ETag Header (required=False by default)
@@ -63,7 +78,8 @@ PAGINATED_MODEL = Model('PaginatedModel', {
     'limit': fields.Integer,
     'count': fields.Integer,
     'next': fields.String,
-    'previous': fields.String
+    'previous': fields.String,
+    'next_cursor': fields.String
 })
 
 
@@ -108,6 +124,9 @@ class PaginatedResourceBase():
     parser = reqparse.RequestParser()
     parser.add_argument('start', type=int, default=DEFAULT_PAGE_START)
     parser.add_argument('limit', type=int, default=DEFAULT_PAGE_LIMIT)
+    parser.add_argument('cursor', type=str)
+    parser.add_argument('cursor_key', type=str, default='id', choices=('id', 'start_time'))
+    parser.add_argument('with_count', type=inputs.boolean, default=False)
 
 
 # DAO for Models
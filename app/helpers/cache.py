@@ -1,3 +1,276 @@
+"""
+Application cache.
+
+`cache` is the Flask-Cache instance used all over the app. Its backend is
+picked by `get_cache_config` from the app config:
+
+- `local`: a size-bounded in-process LRU. One per worker, used for tests
+  and development.
+- `redis`: the Redis server Celery already uses, shared by every worker,
+  fronted by a small short-lived local LRU tier so that hot keys do not
+  cost a round-trip each time.
+
+Both backends count hits and misses, see `cache_stats`.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import redis
 from flask.ext.cache import Cache
+from werkzeug.contrib.cache import BaseCache, RedisCache
 
 cache = Cache()
+
+CACHE_BACKENDS = {
+    'local': 'app.helpers.cache.local_cache',
+    'redis': 'app.helpers.cache.redis_cache',
+    'null': 'null',
+}
+
+
+def namespaced_key(namespace, *parts):
+    """
+    Builds a cache key inside a namespace. e.g.
+    namespaced_key('event', 12, 'schedule') -> 'event:12:schedule'
+    """
+    return ':'.join([namespace] + [unicode(part) for part in parts])
+
+
+class CacheStats(object):
+    """Process wide hit/miss counters of the cache"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {
+                'local_hits': 0,
+                'shared_hits': 0,
+                'misses': 0,
+                'sets': 0,
+                'deletes': 0,
+            }
+
+    def incr(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def as_dict(self):
+        with self.lock:
+            stats = dict(self.counters)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_ratio'] = (float(lookups - stats['misses']) / lookups) if lookups else 0.0
+        return stats
+
+
+stats = CacheStats()
+
+
+def cache_stats():
+    """Returns the hit/miss counters of this process"""
+    return stats.as_dict()
+
+
+class LRUCache(BaseCache):
+    """
+    Thread safe in-process cache holding at most `max_size` keys. The least
+    recently used key is evicted first. Values are pickled like werkzeug's
+    SimpleCache, so callers never share mutable objects.
+    """
+
+    def __init__(self, max_size=1000, default_timeout=300):
+        BaseCache.__init__(self, default_timeout)
+        self.max_size = max_size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expiry(self, timeout):
+        if timeout is None:
+            timeout = self.default_timeout
+        if timeout == 0:
+            return None
+        return time.time() + timeout
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.pop(key, None)
+            if item is None:
+                return None
+            expires, value = item
+            if expires is not None and expires < time.time():
+                return None
+            # re-insert as the most recently used
+            self._items[key] = item
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        item = (self._expiry(timeout), pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = item
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def delete(self, key):
+        with self._lock:
+            return self._items.pop(key, None) is not None
+
+    def has(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            return item is not None and (item[0] is None or item[0] >= time.time())
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        return True
+
+    def inc(self, key, delta=1):
+        with self._lock:
+            item = self._items.get(key)
+            value = (pickle.loads(item[1]) if item else 0) + delta
+            self._items[key] = (item[0] if item else None, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class TieredCache(BaseCache):
+    """
+    Cache made of a `shared` backend and an optional `local` LRU in front
+    of it. Values read from or written to the shared backend are kept in
+    the local tier for at most `local_timeout` seconds, which bounds how
+    stale another worker's copy can be after an invalidation.
+    """
+
+    def __init__(self, shared, local=None, local_timeout=5, default_timeout=300):
+        BaseCache.__init__(self, default_timeout)
+        self.shared = shared
+        self.local = local
+        self.local_timeout = local_timeout
+
+    def _local_set(self, key, value, timeout=None):
+        if self.local is not None:
+            if timeout is None:
+                timeout = self.default_timeout
+            if timeout == 0 or timeout > self.local_timeout:
+                timeout = self.local_timeout
+            self.local.set(key, value, timeout)
+
+    def get(self, key):
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                stats.incr('local_hits')
+                return value
+        value = self.shared.get(key)
+        if value is None:
+            stats.incr('misses')
+        else:
+            stats.incr('shared_hits')
+            self._local_set(key, value)
+        return value
+
+    def get_many(self, *keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value, timeout=None):
+        stats.incr('sets')
+        self._local_set(key, value, timeout)
+        return self.shared.set(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        added = self.shared.add(key, value, timeout)
+        if added:
+            self._local_set(key, value, timeout)
+        return added
+
+    def set_many(self, mapping, timeout=None):
+        for key, value in mapping.items():
+            self._local_set(key, value, timeout)
+        return self.shared.set_many(mapping, timeout)
+
+    def delete(self, key):
+        stats.incr('deletes')
+        if self.local is not None:
+            self.local.delete(key)
+        return self.shared.delete(key)
+
+    def delete_many(self, *keys):
+        if self.local is not None:
+            self.local.delete_many(*keys)
+        return self.shared.delete_many(*keys)
+
+    def has(self, key):
+        if self.local is not None and self.local.has(key):
+            return True
+        return self.shared.has(key)
+
+    def clear(self):
+        if self.local is not None:
+            self.local.clear()
+        return self.shared.clear()
+
+    def inc(self, key, delta=1):
+        if self.local is not None:
+            self.local.delete(key)
+        return self.shared.inc(key, delta)
+
+    def dec(self, key, delta=1):
+        if self.local is not None:
+            self.local.delete(key)
+        return self.shared.dec(key, delta)
+
+
+# Flask-Cache backend factories, referenced by `CACHE_TYPE`
+
+def local_cache(app, config, args, kwargs):
+    return TieredCache(
+        LRUCache(max_size=config['CACHE_LOCAL_SIZE'], default_timeout=kwargs['default_timeout']),
+        default_timeout=kwargs['default_timeout'])
+
+
+def redis_cache(app, config, args, kwargs):
+    shared = RedisCache(host=redis.from_url(config['CACHE_REDIS_URL']),
+                        key_prefix=config['CACHE_KEY_PREFIX'],
+                        default_timeout=kwargs['default_timeout'])
+    local = None
+    if config['CACHE_LOCAL_TIMEOUT']:
+        local = LRUCache(max_size=config['CACHE_LOCAL_SIZE'])
+    return TieredCache(shared, local,
+                       local_timeout=config['CACHE_LOCAL_TIMEOUT'],
+                       default_timeout=kwargs['default_timeout'])
+
+
+def get_cache_config(config):
+    """
+    Returns the Flask-Cache config for the app config `config`
+    """
+    if not config['CACHING']:
+        return {'CACHE_TYPE': 'null'}
+    return {
+        'CACHE_TYPE': CACHE_BACKENDS[config['CACHE_BACKEND']],
+        'CACHE_DEFAULT_TIMEOUT': config['CACHE_DEFAULT_TIMEOUT'],
+        'CACHE_REDIS_URL': config['CACHE_REDIS_URL'],
+        'CACHE_KEY_PREFIX': config['CACHE_KEY_PREFIX'],
+        'CACHE_LOCAL_SIZE': config['CACHE_LOCAL_SIZE'],
+        'CACHE_LOCAL_TIMEOUT': config['CACHE_LOCAL_TIMEOUT'],
+    }
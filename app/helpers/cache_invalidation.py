@@ -0,0 +1,153 @@
+"""
+Event scoped cache invalidation.
+
+Everything cached about an event (public pages, API JSON, schedule
+exports...) is stored under a key built by `event_cache_key`. These keys
+embed a per-event generation number, so invalidating an event is a single
+increment of that number: the old fragments become unreachable and expire
+on their own, on every worker sharing the cache.
+
+The generation is bumped when one of the event signals is sent and, as a
+safety net for code paths that don't send signals, after every commit that
+touched a row belonging to the event. Memoized `CachedGetter` entries of
+the committed rows are dropped at the same time, and so are the site wide
+getters of the committed tables (pages, custom placeholders).
+"""
+import logging
+
+from flask import has_app_context
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session as SQLASession
+
+from app.helpers.cache import cache, namespaced_key
+from app.helpers.cached_getter import CachedGetter
+from app.helpers.signals import event_json_modified, speakers_modified, sessions_modified, \
+    microlocations_modified
+from app.models.custom_placeholder import CustomPlaceholder
+from app.models.discount_code import DiscountCode
+from app.models.event import Event
+from app.models.page import Page
+from app.models.ticket import Ticket
+from app.models.user import User
+
+EVENT_NAMESPACE = 'event'
+# cached fragments are dropped at the latest after this long
+EVENT_FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+# model -> memoized getter taking the id of the model
+MEMOIZED_GETTERS = {
+    Event: CachedGetter.get_event,
+    Ticket: CachedGetter.get_ticket,
+    DiscountCode: CachedGetter.get_discount_code,
+    User: CachedGetter.get_user,
+}
+
+# model -> memoized getter of the whole table
+SITE_GETTERS = {
+    Page: CachedGetter.get_all_pages,
+    CustomPlaceholder: CachedGetter.get_custom_placeholders,
+}
+
+
+def _generation_key(event_id):
+    return namespaced_key(EVENT_NAMESPACE, event_id, 'generation')
+
+
+def get_event_generation(event_id):
+    """Returns the current cache generation of an event"""
+    # the key only exists once the event was invalidated
+    return cache.get(_generation_key(event_id)) or 0
+
+
+def event_cache_key(event_id, *parts):
+    """
+    Returns the cache key of a fragment of an event. Keys built here are
+    invalidated by `invalidate_event_cache`.
+    """
+    return namespaced_key(EVENT_NAMESPACE, event_id, get_event_generation(event_id), *parts)
+
+
+def get_event_fragment(event_id, *parts):
+    return cache.get(event_cache_key(event_id, *parts))
+
+
+def set_event_fragment(event_id, value, *parts, **kwargs):
+    timeout = kwargs.get('timeout', EVENT_FRAGMENT_TIMEOUT)
+    cache.set(event_cache_key(event_id, *parts), value, timeout=timeout)
+    return value
+
+
+def invalidate_event_cache(event_id):
+    """
+    Drops every cached fragment of an event, on all workers
+    """
+    if event_id is None:
+        return
+    # Flask-Cache has no `inc`, the backend's starts a missing key at 0
+    # and never gives it an expiry
+    cache.cache.inc(_generation_key(event_id))
+    cache.delete_memoized(CachedGetter.get_event, event_id)
+
+
+@speakers_modified.connect
+@sessions_modified.connect
+@microlocations_modified.connect
+@event_json_modified.connect
+def invalidate_event_cache_receiver(app, **kwargs):
+    invalidate_event_cache(kwargs.get('event_id'))
+
+
+# SQLAlchemy hooks
+
+def _event_id_of(item):
+    if isinstance(item, Event):
+        return item.id
+    return getattr(item, 'event_id', None)
+
+
+@sa_event.listens_for(SQLASession, 'after_flush')
+def _collect_invalidations(session, flush_context):
+    """
+    Remembers the events and memoized rows touched by the flush. They are
+    invalidated once the transaction is committed.
+    """
+    event_ids = session.info.setdefault('invalidate_event_ids', set())
+    memoized = session.info.setdefault('invalidate_memoized', set())
+    for item in list(session.new) + list(session.dirty) + list(session.deleted):
+        event_id = _event_id_of(item)
+        if event_id is not None:
+            event_ids.add(event_id)
+        getter = MEMOIZED_GETTERS.get(type(item))
+        if getter and item.id is not None:
+            memoized.add((getter, item.id))
+        getter = SITE_GETTERS.get(type(item))
+        if getter:
+            memoized.add((getter, None))
+
+
+@sa_event.listens_for(SQLASession, 'after_commit')
+def _invalidate_after_commit(session):
+    event_ids = session.info.pop('invalidate_event_ids', set())
+    memoized = session.info.pop('invalidate_memoized', set())
+    if not has_app_context():
+        return
+    try:
+        for event_id in event_ids:
+            invalidate_event_cache(event_id)
+        for getter, item_id in memoized:
+            if item_id is None:
+                cache.delete_memoized(getter)
+            else:
+                cache.delete_memoized(getter, item_id)
+    except Exception:
+        # the commit went through, an unreachable cache must not fail it
+        logging.exception('Cache invalidation failed for events %s' % list(event_ids))
+
+
+@sa_event.listens_for(SQLASession, 'after_soft_rollback')
+def _discard_invalidations(session, previous_transaction):
+    # rolling back a savepoint keeps the rest of the transaction
+    if previous_transaction.parent is not None:
+        return
+    session.info.pop('invalidate_event_ids', None)
+    session.info.pop('invalidate_memoized', None)
@@ -1,5 +1,6 @@
 from app.helpers.cache import cache
 from app.helpers.data_getter import DataGetter
+from app.models.custom_placeholder import CustomPlaceholder
 from app.models.discount_code import DiscountCode
 from app.models.ticket import Ticket
 from app.models.user import User
@@ -27,3 +28,17 @@ class CachedGetter(object):
     @cache.memoize(50)
     def get_user(user_id):
         return User.query.get(user_id)
+
+    @staticmethod
+    @cache.memoize(21600)
+    def get_all_pages(selected_lang=None):
+        return DataGetter.get_all_pages(selected_lang)
+
+    @staticmethod
+    @cache.memoize(21600)
+    def get_custom_placeholders():
+        """Returns {name: custom placeholder}"""
+        placeholders = {}
+        for placeholder in CustomPlaceholder.query.order_by(CustomPlaceholder.id):
+            placeholders.setdefault(placeholder.name, placeholder)
+        return placeholders
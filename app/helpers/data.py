@@ -20,6 +20,7 @@ from requests_oauthlib import OAuth2Session
 
 from app.helpers.assets.images import get_image_file_name, get_path_of_temp_url
 from app.helpers.cache import cache
+from app.helpers.log_writer import queue_record
 from app.helpers.helpers import string_empty, string_not_empty
 from app.helpers.notification_email_triggers import trigger_new_session_notifications, \
     trigger_session_state_change_notifications
@@ -984,11 +985,7 @@ def record_activity(template, login_user=None, **kwargs):
         msg = ACTIVITIES[template].format(**kwargs)
     except Exception:  # in case some error happened, not good
         msg = '[ERROR LOGGING] %s' % template
-    # conn.execute(Activity.__table__.insert().values(
-    #     actor=actor, action=msg, time=datetime.now()
-    # ))
-    activity = Activity(actor=actor, action=msg)
-    save_to_db(activity, 'Activity Recorded')
+    queue_record(Activity(actor=actor, action=msg))
 
 
 def update_version(event_id, is_created, column_to_increment):
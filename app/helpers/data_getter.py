@@ -16,6 +16,7 @@ from app.helpers.cache import cache
 from app.helpers.helpers import get_event_id, string_empty, represents_int, get_count, \
     send_email_after_account_create_with_password
 from app.helpers.language_list import LANGUAGE_LIST
+from app.helpers.ticket_inventory import TicketInventory
 from app.helpers.static import EVENT_TOPICS, EVENT_LICENCES, PAYMENT_COUNTRIES, PAYMENT_CURRENCIES, DEFAULT_EVENT_IMAGES
 from app.models.activity import Activity
 from app.models.call_for_papers import CallForPaper
@@ -35,7 +36,6 @@ from app.models.microlocation import Microlocation
 from app.models.modules import Module
 from app.models.notifications import Notification
 from app.models.order import Order
-from app.models.order import OrderTicket
 from app.models.page import Page
 from app.models.panel_permissions import PanelPermission
 from app.models.permission import Permission
@@ -751,14 +751,11 @@ class DataGetter(object):
         tickets = Ticket.query.filter(Ticket.event_id == event_id).filter(
             Ticket.sales_start <= datetime.datetime.now(pytz.timezone(event_timezone)).replace(tzinfo=None)).filter(
             Ticket.sales_end >= datetime.datetime.now(pytz.timezone(event_timezone)).replace(tzinfo=None))
+        tickets = tickets.all()
+        inventory = TicketInventory.get_inventory(tickets)
         open_tickets = []
         for ticket in tickets:
-            orders = OrderTicket.query.filter(OrderTicket.ticket_id == ticket.id)
-            ticket_count = 0
-            for order in orders:
-                if order.order.status == 'completed' or order.order.status == 'placed':
-                    ticket_count += order.quantity
-            if ticket_count >= ticket.quantity:
+            if inventory[ticket.id]['available'] <= 0:
                 status = "Sold"
             else:
                 status = "Available"
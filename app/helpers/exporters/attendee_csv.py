@@ -5,7 +5,7 @@ class AttendeeCsv:
 
     @staticmethod
     def export(event_id):
-        (_, event_id, holders, _, _) = TicketingManager.get_attendee_export_info(event_id=event_id)
+        """Yields the header then one row per attendee, without loading them all"""
         if event_id == 275:
             headers = ['Order#', 'Order Date', 'Status', 'First Name', 'Last Name', 'Email', 'Country',
                 'Occupation', 'Company/Instt', 'Gender', 'Expertise', 'Welcome Reception', 'Recruitment',
@@ -21,8 +21,8 @@ class AttendeeCsv:
             fields = (
             'order_invoice', 'created_at', 'status', 'firstname', 'lastname',
             'email', 'country', 'paid_via', 'ticket_name', 'ticket_price', 'ticket_type')
-        rows = [headers]
-        for holder in holders:
+        yield headers
+        for holder in TicketingManager.iter_attendee_export_info(event_id):
             if holder['status'] != "deleted":
                 columns = []
                 for f in fields:
@@ -30,6 +30,4 @@ class AttendeeCsv:
                         columns.append(str(holder.get(f, '').encode('utf-8')))
                     else:
                         columns.append(str(holder.get(f, '')))
-                rows.append(columns)
-
-        return rows
+                yield columns
@@ -0,0 +1,180 @@
+"""
+Debounced regeneration of the schedule exports (pentabarf, iCal, xCal).
+
+Every `sessions_modified`, `speakers_modified` and `event_json_modified`
+signal used to queue a full rebuild of each format, so editing 50 sessions
+queued 150 rebuilds. The receivers below now call `request_exports`, which
+collects the exports changed while an app context is active. When it ends,
+`dispatch_exports` marks them pending in `schedule_exports`, and only an
+event with no export pending yet queues `export_schedule_task`, delayed by
+`EXPORT_DEBOUNCE`. The changes made in the meantime are coalesced into
+that run.
+
+The task waits until the event was left alone for `EXPORT_DEBOUNCE`, then
+builds every pending format once. An export whose content did not change
+is not uploaded again.
+"""
+import errno
+import hashlib
+import os
+import tempfile
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from flask import current_app, g
+from sqlalchemy import and_
+
+from app.helpers.data import save_to_db
+from app.helpers.data_getter import DataGetter
+from app.helpers.exporters.ical import ICalExporter
+from app.helpers.exporters.pentabarfxml import PentabarfExporter
+from app.helpers.exporters.xcal import XCalExporter
+from app.helpers.signals import event_json_modified, speakers_modified, microlocations_modified, \
+    sessions_modified
+from app.helpers.storage import UPLOAD_PATHS, upload, UploadedFile
+from app.models import db
+from app.models.schedule_export import ScheduleExport, SCHEDULE_EXPORT_FORMATS
+
+# seconds an event has to be left alone before its exports are built
+EXPORT_DEBOUNCE = 60
+
+# format -> (exporter, url attribute of the event, filename)
+EXPORTS = {
+    'pentabarf': (PentabarfExporter, 'pentabarf_url', 'pentabarf.xml'),
+    'ical': (ICalExporter, 'ical_url', 'ical.ics'),
+    'xcal': (XCalExporter, 'xcal_url', 'xcal.xcs'),
+}
+
+
+def _queue_task(event_id, countdown=EXPORT_DEBOUNCE):
+    from app.helpers.tasks import export_schedule_task
+    export_schedule_task.apply_async(args=(event_id,), countdown=countdown)
+
+
+def request_exports(event_id, formats=SCHEDULE_EXPORT_FORMATS):
+    """Queues a rebuild of the exports of an event, when the app context ends"""
+    g.setdefault('schedule_exports', OrderedDict()).setdefault(event_id, set()).update(formats)
+
+
+@speakers_modified.connect
+@sessions_modified.connect
+@event_json_modified.connect
+def schedule_export_receiver(app, **kwargs):
+    request_exports(kwargs['event_id'])
+
+
+@microlocations_modified.connect
+def pentabarf_export_receiver(app, **kwargs):
+    request_exports(kwargs['event_id'], ['pentabarf'])
+
+
+def dispatch_exports():
+    """Marks the exports requested in the current app context pending"""
+    requested = g.pop('schedule_exports', None)
+    if not requested:
+        return
+    for event_id, formats in requested.items():
+        mark_pending(event_id, formats)
+
+
+def mark_pending(event_id, formats):
+    """
+    Marks exports of an event pending, on a connection of its own. Queues
+    the task of the event unless one is already waiting.
+    """
+    table = ScheduleExport.__table__
+    now = datetime.utcnow()
+    queue = False
+    with db.engine.begin() as connection:
+        for export_format in formats:
+            row = and_(table.c.event_id == event_id, table.c.format == export_format)
+            if connection.execute(table.update().where(row).where(table.c.requested_at.isnot(None))
+                                  .values(requested_at=now)).rowcount:
+                continue
+            queue = True
+            if not connection.execute(table.update().where(row).values(requested_at=now)).rowcount:
+                connection.execute(table.insert().values(event_id=event_id, format=export_format,
+                                                         requested_at=now))
+    if queue:
+        _queue_task(event_id)
+
+
+def run_exports(event_id):
+    """
+    Builds the pending exports of an event once it was left alone for
+    `EXPORT_DEBOUNCE`, queues the task again otherwise
+    """
+    exports = ScheduleExport.query.filter(ScheduleExport.event_id == event_id) \
+        .filter(ScheduleExport.requested_at.isnot(None)).all()
+    if not exports:
+        return
+    quiet_at = max(export.requested_at for export in exports) + timedelta(seconds=EXPORT_DEBOUNCE)
+    wait = (quiet_at - datetime.utcnow()).total_seconds()
+    # eager tasks run at once, they'd wait forever
+    if wait > 0 and not current_app.config.get('CELERY_ALWAYS_EAGER'):
+        _queue_task(event_id, countdown=int(wait) + 1)
+        return
+    for export in exports:
+        build_export(event_id, export.format)
+
+
+def _write_export(event, export_format, content):
+    folder = current_app.config['TEMP_UPLOADS_FOLDER']
+    try:
+        os.mkdir(folder)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST:
+            raise exc
+    _, attribute, filename = EXPORTS[export_format]
+    fd, file_path = tempfile.mkstemp(dir=folder)
+    try:
+        with os.fdopen(fd, 'w') as temp_file:
+            temp_file.write(content)
+        export_file = UploadedFile(file_path=file_path, filename=filename)
+        setattr(event, attribute, upload(export_file, UPLOAD_PATHS['exports'][export_format]
+                                         .format(event_id=event.id)))
+        export_file.file.close()
+    finally:
+        os.remove(file_path)
+
+
+def build_export(event_id, export_format):
+    """
+    Builds an export of an event, uploads it when its content changed and
+    clears its pending state. Returns whether it was uploaded.
+    """
+    event = DataGetter.get_event(event_id)
+    export = ScheduleExport.query.get((event_id, export_format))
+    requested_at = export.requested_at if export else None
+    exporter, attribute, _ = EXPORTS[export_format]
+    content = exporter.export(event_id)
+    content_hash = hashlib.sha1(content).hexdigest()
+    uploaded = export is None or export.content_hash != content_hash or \
+        not getattr(event, attribute)
+    if uploaded:
+        _write_export(event, export_format, content)
+        save_to_db(event)
+    table = ScheduleExport.__table__
+    row = and_(table.c.event_id == event_id, table.c.format == export_format)
+    values = {'built_at': datetime.utcnow(), 'content_hash': content_hash}
+    changed = False
+    with db.engine.begin() as connection:
+        if export is None:
+            connection.execute(table.insert().values(event_id=event_id, format=export_format, **values))
+        else:
+            connection.execute(table.update().where(row).values(**values))
+            # a change made during the build keeps the export pending
+            changed = requested_at is not None and not connection.execute(
+                table.update().where(row).where(table.c.requested_at == requested_at)
+                .values(requested_at=None)).rowcount
+    if changed:
+        _queue_task(event_id)
+    return uploaded
+
+
+def get_export_states(event_id):
+    """Returns {format: ScheduleExport or None} of an event"""
+    states = OrderedDict((export_format, None) for export_format in SCHEDULE_EXPORT_FORMATS)
+    for export in ScheduleExport.query.filter(ScheduleExport.event_id == event_id):
+        states[export.format] = export
+    return states
@@ -1,3 +1,9 @@
+import csv
+from StringIO import StringIO
+
+from flask import Response, stream_with_context
+
+
 def format_timedelta(td):
     hours, remainder = divmod(td.total_seconds(), 3600)
     minutes, seconds = divmod(remainder, 60)
@@ -7,3 +13,24 @@ def format_timedelta(td):
     if minutes < 10:
         minutes = '0%s' % minutes
     return '%s:%s' % (hours, minutes)
+
+
+def iter_csv(rows, chunk_rows=500):
+    """Yields the CSV text of `rows`, `chunk_rows` rows at a time"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    for index, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if index % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def csv_response(rows, filename):
+    """A chunked download of `rows`, streamed as they are produced"""
+    response = Response(stream_with_context(iter_csv(rows)), mimetype='text/csv')
+    response.headers['Content-Disposition'] = 'attachment; filename=%s' % filename
+    return response
@@ -2,11 +2,8 @@ import icalendar
 import pytz
 from flask import url_for
 from icalendar import Calendar, vCalAddress, vText
-from sqlalchemy import asc
 
-from app.models.event import Event as EventModel
-from app.models.session import Session
-from app.helpers.signals import event_json_modified, speakers_modified, sessions_modified
+from app.helpers.exporters.schedule import get_schedule
 
 
 class ICalExporter:
@@ -17,7 +14,8 @@ class ICalExporter:
     def export(event_id):
         """Takes an event id and returns the event in iCal format"""
 
-        event = EventModel.query.get(event_id)
+        schedule = get_schedule(event_id)
+        event = schedule.event
 
         cal = Calendar()
         cal.add('prodid', '-//fossasia//open-event//EN')
@@ -28,19 +26,14 @@ class ICalExporter:
         tz = event.timezone or 'UTC'
         tz = pytz.timezone(tz)
 
-        sessions = Session.query \
-            .filter_by(event_id=event_id) \
-            .filter_by(state='accepted') \
-            .filter(Session.deleted_at.is_(None)) \
-            .order_by(asc(Session.start_time)).all()
-
-        for session in sessions:
+        for session in schedule.sessions:
 
             if session and session.start_time and session.end_time:
                 event_component = icalendar.Event()
                 event_component.add('summary', session.title)
                 event_component.add('uid', str(session.id) + "-" + event.identifier)
-                event_component.add('geo', (event.latitude, event.longitude))
+                if event.latitude is not None and event.longitude is not None:
+                    event_component.add('geo', (event.latitude, event.longitude))
                 event_component.add('location', session.microlocation.name or '' + " " + event.location_name)
                 event_component.add('dtstart', tz.localize(session.start_time))
                 event_component.add('dtend', tz.localize(session.end_time))
@@ -59,11 +52,3 @@ class ICalExporter:
                 cal.add_component(event_component)
 
         return cal.to_ical()
-
-
-@speakers_modified.connect
-@sessions_modified.connect
-@event_json_modified.connect
-def ical_export_celery(app, **kwargs):
-    from app.helpers.tasks import export_ical_task
-    export_ical_task.delay(kwargs['event_id'])
@@ -1,16 +1,39 @@
-from app.helpers.ticketing import TicketingManager
+from sqlalchemy import desc, func
+
+from app.helpers.ticketing import EXPORT_BATCH_SIZE
+from app.models import db
+from app.models.discount_code import DiscountCode
+from app.models.order import Order, OrderTicket
+from app.models.user import User
+from app.models.user_detail import UserDetail
 
 
 class OrderCsv:
 
     @staticmethod
     def export(event_id):
-        orders = TicketingManager.get_orders(event_id)
+        """
+        Yields the header then one row per order. Orders are read from a
+        server side cursor along with their buyer, discount code and
+        tickets count, so memory use does not grow with the number of
+        orders.
+        """
         headers = ['Order#', 'Order Date', 'Status', 'Payment Type', 'Total Amount', 'Quantity',
             'Discount Code', 'First Name', 'Last Name', 'Email']
+        yield headers
+
+        quantities = db.session.query(OrderTicket.order_id, func.sum(OrderTicket.quantity).label('quantity')) \
+            .group_by(OrderTicket.order_id).subquery()
+        rows = db.session.query(Order, User, UserDetail, DiscountCode.code, quantities.c.quantity) \
+            .join(User, User.id == Order.user_id) \
+            .outerjoin(UserDetail, UserDetail.user_id == User.id) \
+            .outerjoin(DiscountCode, DiscountCode.id == Order.discount_code_id) \
+            .outerjoin(quantities, quantities.c.order_id == Order.id) \
+            .filter(Order.event_id == event_id) \
+            .order_by(desc(Order.id)) \
+            .yield_per(EXPORT_BATCH_SIZE)
 
-        rows = [headers]
-        for order in orders:
+        for order, user, user_detail, discount_code, quantity in rows:
             if order.status != "deleted":
                 column = []
                 column.append(str(order.get_invoice_number()))
@@ -18,13 +41,11 @@ class OrderCsv:
                 column.append(str(order.status) if order.status else '')
                 column.append(str(order.paid_via) if order.paid_via else '')
                 column.append(str(order.amount) if order.amount else '')
-                column.append(str(order.get_tickets_count()))
-                column.append(str(order.discount_code.code) if order.discount_code else '')
-                column.append(str(order.user.user_detail.firstname.encode('utf-8'))
-                              if order.user.user_detail and order.user.user_detail.firstname else '')
-                column.append(str(order.user.user_detail.lastname.encode('utf-8'))
-                              if order.user.user_detail and order.user.user_detail.lastname else '')
-                column.append(str(order.user.email) if order.user.email else '')
-                rows.append(column)
-
-        return rows
+                column.append(str(quantity or 0))
+                column.append(str(discount_code) if discount_code else '')
+                column.append(str(user_detail.firstname.encode('utf-8'))
+                              if user_detail and user_detail.firstname else '')
+                column.append(str(user_detail.lastname.encode('utf-8'))
+                              if user_detail and user_detail.lastname else '')
+                column.append(str(user.email) if user.email else '')
+                yield column
@@ -5,17 +5,10 @@ from pentabarf.Day import Day
 from pentabarf.Event import Event
 from pentabarf.Person import Person
 from pentabarf.Room import Room
-from sqlalchemy import DATE
-from sqlalchemy import asc
-from sqlalchemy import cast
-from sqlalchemy import func
 
-from app import db
-from app.helpers.data_getter import DataGetter
 from app.helpers.exporters.helpers import format_timedelta
-from app.models.session import Session
+from app.helpers.exporters.schedule import get_schedule
 from app.settings import get_settings
-from app.helpers.signals import event_json_modified, speakers_modified, microlocations_modified, sessions_modified
 
 
 class PentabarfExporter:
@@ -24,7 +17,8 @@ class PentabarfExporter:
 
     @staticmethod
     def export(event_id):
-        event = DataGetter.get_event(event_id)
+        schedule = get_schedule(event_id)
+        event = schedule.event
         diff = (event.end_time - event.start_time)
 
         tz = event.timezone or 'UTC'
@@ -34,37 +28,17 @@ class PentabarfExporter:
                                 days=diff.days if diff.days > 0 else 1,
                                 day_change="00:00", timeslot_duration="00:15",
                                 venue=event.location_name)
-        dates = (db.session.query(cast(Session.start_time, DATE))
-                 .filter_by(event_id=event_id)
-                 .filter_by(state='accepted')
-                 .filter(Session.deleted_at.is_(None))
-                 .order_by(asc(Session.start_time)).distinct().all())
-
-        for date in dates:
-            date = date[0]
+        for date, rooms in schedule.days():
             day = Day(date=date)
-            microlocation_ids = list(db.session.query(Session.microlocation_id)
-                                     .filter(func.date(Session.start_time) == date)
-                                     .filter_by(state='accepted')
-                                     .filter(Session.deleted_at.is_(None))
-                                     .order_by(asc(Session.microlocation_id)).distinct())
-            for microlocation_id in microlocation_ids:
-                microlocation_id = microlocation_id[0]
-                microlocation = DataGetter.get_microlocation(microlocation_id)
-                sessions = Session.query.filter_by(microlocation_id=microlocation_id) \
-                    .filter(func.date(Session.start_time) == date) \
-                    .filter_by(state='accepted') \
-                    .filter(Session.deleted_at.is_(None)) \
-                    .order_by(asc(Session.start_time)).all()
-
-                room = Room(name=microlocation.name)
+            for microlocation, sessions in rooms:
+                room = Room(name=microlocation.name if microlocation else '')
                 for session in sessions:
 
                     session_event = Event(id=session.id,
                                           date=tz.localize(session.start_time),
                                           start=tz.localize(session.start_time).strftime("%H:%M"),
                                           duration=format_timedelta(session.end_time - session.start_time),
-                                          track=session.track.name,
+                                          track=session.track.name if session.track else '',
                                           abstract=session.short_abstract,
                                           title=session.title,
                                           type='Talk',
@@ -84,12 +58,3 @@ class PentabarfExporter:
             conference.add_day(day)
 
         return conference.generate("Generated by " + get_settings()['app_name'])
-
-
-@speakers_modified.connect
-@sessions_modified.connect
-@microlocations_modified.connect
-@event_json_modified.connect
-def pentabarf_export_celery(app, **kwargs):
-    from app.helpers.tasks import export_pentabarf_task
-    export_pentabarf_task.delay(kwargs['event_id'])
@@ -0,0 +1,52 @@
+"""
+Schedule of an event shared by the pentabarf, iCal and xCal exporters.
+
+The exporters used to query the sessions of every day and room separately
+and then lazy load the rooms, tracks and speakers of each session. The
+accepted sessions are now read once with all of them joined in, and
+grouped by day and room in Python, so an export runs the same few queries
+whatever the size of the schedule.
+"""
+from collections import OrderedDict
+
+from sqlalchemy import asc
+from sqlalchemy.orm import joinedload
+
+from app.helpers.data_getter import DataGetter
+from app.models.session import Session
+
+
+class Schedule(object):
+    """The event and its accepted sessions, ordered by start time"""
+
+    def __init__(self, event, sessions):
+        self.event = event
+        self.sessions = sessions
+
+    def days(self):
+        """
+        Returns [(date, [(microlocation, [session])])], the rooms of a day
+        ordered by id and their sessions by start time
+        """
+        days = OrderedDict()
+        for session in self.sessions:
+            rooms = days.setdefault(session.start_time.date(), OrderedDict())
+            rooms.setdefault(session.microlocation_id, []).append(session)
+        return [(date, [(sessions[0].microlocation, sessions) for _, sessions in
+                        sorted(rooms.items(), key=lambda room: (room[0] is None, room[0]))])
+                for date, rooms in days.items()]
+
+
+def get_schedule(event_id):
+    """Loads the schedule of an event in one query of its sessions"""
+    event = DataGetter.get_event(event_id)
+    sessions = Session.query \
+        .filter_by(event_id=event_id) \
+        .filter_by(state='accepted') \
+        .filter(Session.deleted_at.is_(None)) \
+        .options(joinedload(Session.microlocation),
+                 joinedload(Session.track),
+                 joinedload(Session.session_type),
+                 joinedload(Session.speakers)) \
+        .order_by(asc(Session.start_time), asc(Session.id)).all()
+    return Schedule(event, sessions)
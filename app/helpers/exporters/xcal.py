@@ -2,12 +2,9 @@ from xml.etree.ElementTree import Element, SubElement, tostring
 
 import pytz
 from flask import url_for
-from sqlalchemy import asc
 
-from app.helpers.data_getter import DataGetter
 from app.helpers.exporters.helpers import format_timedelta
-from app.models.session import Session
-from app.helpers.signals import event_json_modified, speakers_modified, sessions_modified
+from app.helpers.exporters.schedule import get_schedule
 
 
 class XCalExporter:
@@ -16,7 +13,8 @@ class XCalExporter:
 
     @staticmethod
     def export(event_id):
-        event = DataGetter.get_event(event_id)
+        schedule = get_schedule(event_id)
+        event = schedule.event
 
         tz = event.timezone or 'UTC'
         tz = pytz.timezone(tz)
@@ -33,13 +31,7 @@ class XCalExporter:
         cal_name_node = SubElement(v_calendar_node, 'x-wr-calname')
         cal_name_node.text = event.name
 
-        sessions = Session.query \
-            .filter_by(event_id=event_id) \
-            .filter_by(state='accepted') \
-            .filter(Session.deleted_at.is_(None)) \
-            .order_by(asc(Session.start_time)).all()
-
-        for session in sessions:
+        for session in schedule.sessions:
 
             if session and session.start_time and session.end_time:
 
@@ -80,18 +72,10 @@ class XCalExporter:
                                         identifier=event.identifier, _external=True)
 
                 location_node = SubElement(v_event_node, 'location')
-                location_node.text = session.microlocation.name
+                location_node.text = session.microlocation.name if session.microlocation else ''
 
                 for speaker in session.speakers:
                     attendee_node = SubElement(v_event_node, 'attendee')
                     attendee_node.text = speaker.name
 
         return tostring(i_calendar_node)
-
-
-@speakers_modified.connect
-@sessions_modified.connect
-@event_json_modified.connect
-def xcal_export_celery(app, **kwargs):
-    from app.helpers.tasks import export_xcal_task
-    export_xcal_task.delay(kwargs['event_id'])
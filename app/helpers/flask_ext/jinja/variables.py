@@ -1,8 +1,10 @@
 from datetime import datetime
 
-from flask import request
+from flask import request, _request_ctx_stack
+from werkzeug.local import LocalProxy
 
 from app.helpers.babel import babel
+from app.helpers.cached_getter import CachedGetter
 from app.helpers.data_getter import DataGetter
 from app.settings import get_settings
 from config import LANGUAGES
@@ -16,20 +18,45 @@ def get_locale():
         return request.accept_languages.best_match(LANGUAGES.keys())
 
 
+def lazy_variable(func):
+    """
+    Template variable computed by `func` the first time a template of the
+    request uses it. Templates rendered later in the same request (partials,
+    error pages...) reuse the value.
+    """
+
+    def get_value():
+        ctx = _request_ctx_stack.top
+        if ctx is None:
+            return func()
+        if not hasattr(ctx, 'template_variables'):
+            ctx.template_variables = {}
+        values = ctx.template_variables
+        if func not in values:
+            values[func] = func()
+        return values[func]
+
+    return LocalProxy(get_value)
+
+
 def init_variables(app):
+    settings = lazy_variable(get_settings)
+    system_pages = lazy_variable(lambda: CachedGetter.get_all_pages(get_locale()))
+    placeholders = lazy_variable(CachedGetter.get_custom_placeholders)
+
     @app.context_processor
     def template_context():
         return dict(
             all_languages=LANGUAGES,
             selected_lang=get_locale(),
-            settings=get_settings(),
-            app_name=get_settings()['app_name'],
-            tagline=get_settings()['tagline'],
+            settings=settings,
+            app_name=LocalProxy(lambda: settings['app_name']),
+            tagline=LocalProxy(lambda: settings['tagline']),
             event_typo=DataGetter.get_event_types()[:10],
             base_dir=app.config['BASE_DIR'],
-            system_pages=DataGetter.get_all_pages(get_locale()),
+            system_pages=system_pages,
             datetime_now=datetime.now(),
-            logo=DataGetter.get_custom_placeholder_by_name('Logo'),
-            avatar=DataGetter.get_custom_placeholder_by_name('Avatar'),
+            logo=LocalProxy(lambda: placeholders.get('Logo')),
+            avatar=LocalProxy(lambda: placeholders.get('Avatar')),
             integrate_socketio=app.config.get('INTEGRATE_SOCKETIO', False)
         )
@@ -0,0 +1,165 @@
+"""
+Currency exchange rates.
+
+Rates are fetched once a day from a rate provider by `refresh_rates` (run
+by the scheduler and by `python manage.py refresh_fx_rates`) and stored in
+the `fx_rates` table. Each process keeps an in-memory snapshot of the
+latest rates, reloaded from the table every `FX_SNAPSHOT_TIMEOUT` seconds,
+so that conversions are plain arithmetic and never wait on the network.
+
+The provider is picked by the `FX_RATE_PROVIDER` setting:
+
+- `forex_python`: the forex-python web API.
+- `fixture`: the JSON file `FX_RATE_FIXTURE`, e.g.
+  {"base": "USD", "rates": {"EUR": 0.9, "INR": 64.2}}. Used by the tests
+  and for offline development.
+"""
+import json
+import logging
+import threading
+import time
+from datetime import date
+
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db
+from app.models.fx_rate import FxRate
+
+
+class FxRates(object):
+    """Exchange rates of currencies against a `base` currency"""
+
+    def __init__(self, rates, base, day=None):
+        self.base = base
+        self.day = day
+        self.rates = dict(rates)
+        self.rates[base] = 1.0
+
+    def currencies(self):
+        return self.rates.keys()
+
+    def rate(self, from_currency, to_currency):
+        """Returns the rate between two currencies, None if one is unknown"""
+        if from_currency == to_currency:
+            return 1.0
+        try:
+            return self.rates[to_currency] / self.rates[from_currency]
+        except (KeyError, TypeError, ZeroDivisionError):
+            return None
+
+    def convert(self, from_currency, to_currency, amount):
+        """
+        Converts an amount. Amounts in an unknown currency are returned
+        unconverted.
+        """
+        rate = self.rate(from_currency, to_currency)
+        if rate is None or amount is None:
+            return amount
+        return amount * rate
+
+    def convert_many(self, from_currency, to_currency, amounts):
+        """Converts a list of amounts in the same currency"""
+        rate = self.rate(from_currency, to_currency)
+        if rate is None:
+            return list(amounts)
+        return [amount * rate if amount is not None else None for amount in amounts]
+
+    def convert_all(self, to_currency, items):
+        """Converts a list of (currency, amount) to `to_currency`"""
+        return [self.convert(currency, to_currency, amount) for currency, amount in items]
+
+
+# Rate providers. `get_rates(base)` returns {currency: rate}
+
+class ForexPythonProvider(object):
+    """Rates of the forex-python web API"""
+
+    def get_rates(self, base):
+        from forex_python.converter import CurrencyRates
+        return CurrencyRates().get_rates(base)
+
+
+class FixtureFileProvider(object):
+    """Rates read from a JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get_rates(self, base):
+        with open(self.path) as fixture:
+            data = json.load(fixture)
+        rates = FxRates(data['rates'], data['base'])
+        return dict((currency, rates.rate(base, currency)) for currency in rates.currencies()
+                    if currency != base)
+
+
+FX_RATE_PROVIDERS = {
+    'forex_python': lambda config: ForexPythonProvider(),
+    'fixture': lambda config: FixtureFileProvider(config['FX_RATE_FIXTURE']),
+}
+
+
+def get_provider(config):
+    return FX_RATE_PROVIDERS[config['FX_RATE_PROVIDER']](config)
+
+
+# In-memory snapshot of this process
+
+_snapshot = {
+    'rates': None,
+    'loaded_at': 0,
+}
+_snapshot_lock = threading.Lock()
+
+
+def load_rates(base):
+    """Reads the latest rates against `base` from the database"""
+    day = db.session.query(func.max(FxRate.day)).filter(FxRate.base == base).scalar()
+    if day is None:
+        return FxRates({}, base)
+    rows = db.session.query(FxRate.currency, FxRate.rate).filter(FxRate.base == base).filter(FxRate.day == day)
+    return FxRates(dict(rows), base, day)
+
+
+def get_rates():
+    """Returns the rate snapshot of this process, reloaded when too old"""
+    with _snapshot_lock:
+        age = time.time() - _snapshot['loaded_at']
+        if _snapshot['rates'] is None or age > current_app.config['FX_SNAPSHOT_TIMEOUT']:
+            _snapshot['rates'] = load_rates(current_app.config['FX_BASE_CURRENCY'])
+            _snapshot['loaded_at'] = time.time()
+        return _snapshot['rates']
+
+
+def invalidate_rates():
+    """The next `get_rates` of this process reloads the rates"""
+    with _snapshot_lock:
+        _snapshot['rates'] = None
+
+
+def refresh_rates(provider=None, day=None):
+    """
+    Fetches the rates of the day from the provider and stores them.
+    Returns the number of rates stored.
+    """
+    base = current_app.config['FX_BASE_CURRENCY']
+    provider = provider or get_provider(current_app.config)
+    day = day or date.today()
+    rates = provider.get_rates(base)
+    FxRate.query.filter_by(day=day, base=base).delete()
+    stored = 0
+    for currency, rate in rates.items():
+        if rate:
+            db.session.add(FxRate(day=day, base=base, currency=currency, rate=float(rate)))
+            stored += 1
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # another worker stored the rates of the day first
+        db.session.rollback()
+        logging.info('FX rates of %s already refreshed' % day)
+        stored = 0
+    invalidate_rates()
+    return stored
@@ -9,31 +9,27 @@ from sqlalchemy import func
 from app.helpers.assets.images import get_image_file_name
 from app.helpers.flask_ext.helpers import get_real_ip
 from app.helpers.storage import UploadedFile
+from app.helpers.log_writer import queue_record
+from app.helpers.mail_dispatch import queue_mail
 from app.models.notifications import (
     # Prepended with `NOTIF_` to differentiate from mails
     EVENT_ROLE_INVITE as NOTIF_EVENT_ROLE,
-    NEW_SESSION as NOTIF_NEW_SESSION,
-    SESSION_SCHEDULE as NOTIF_SESSION_SCHEDULE,
     NEXT_EVENT as NOTIF_NEXT_EVENT,
-    SESSION_ACCEPT_REJECT as NOTIF_SESSION_ACCEPT_REJECT,
     INVITE_PAPERS as NOTIF_INVITE_PAPERS,
     USER_CHANGE_EMAIL as NOTIF_USER_CHANGE_EMAIL,
     TICKET_PURCHASED as NOTIF_TICKET_PURCHASED,
     EVENT_EXPORT_FAIL as NOTIF_EVENT_EXPORT_FAIL,
-    EVENT_EXPORTED as NOTIF_EVENT_EXPORTED,
-    TICKET_PURCHASED_ORGANIZER as NOTIF_TICKET_PURCHASED_ORGANIZER,
-    TICKET_RESEND_ORGANIZER as NOTIF_TICKET_RESEND_ORGANIZER
-
+    EVENT_EXPORTED as NOTIF_EVENT_EXPORTED
 )
 from app.settings import get_settings
 from flask import request, url_for, current_app
 from system_mails import MAILS
 from system_notifications import NOTIFS
-from app.models.mail import INVITE_PAPERS, NEW_SESSION, USER_CONFIRM, NEXT_EVENT, \
-    USER_REGISTER, PASSWORD_RESET, SESSION_ACCEPT_REJECT, SESSION_SCHEDULE, EVENT_ROLE, EVENT_PUBLISH, Mail, \
+from app.models.mail import INVITE_PAPERS, USER_CONFIRM, NEXT_EVENT, \
+    USER_REGISTER, PASSWORD_RESET, EVENT_ROLE, EVENT_PUBLISH, Mail, \
     AFTER_EVENT, USER_CHANGE_EMAIL, USER_REGISTER_WITH_PASSWORD, TICKET_PURCHASED, EVENT_EXPORTED, \
     EVENT_EXPORT_FAIL, MAIL_TO_EXPIRED_ORDERS, MONTHLY_PAYMENT_FOLLOWUP_EMAIL, MONTHLY_PAYMENT_EMAIL, \
-    EVENT_IMPORTED, EVENT_IMPORT_FAIL, TICKET_PURCHASED_ORGANIZER, TICKET_CANCELLED
+    EVENT_IMPORTED, EVENT_IMPORT_FAIL, TICKET_CANCELLED
 from app.models.message_settings import MessageSettings
 
 
@@ -93,59 +89,6 @@ def send_email_invitation(email, event_name, link):
         )
 
 
-def send_new_session_organizer(email, event_name, link):
-    """Send email after new sessions proposal"""
-    message_settings = MessageSettings.query.filter_by(action=NEW_SESSION).first()
-    if not message_settings or message_settings.mail_status == 1:
-        send_email(
-            to=email,
-            action=NEW_SESSION,
-            subject=MAILS[NEW_SESSION]['subject'].format(event_name=event_name),
-            html=MAILS[NEW_SESSION]['message'].format(
-                email=str(email),
-                event_name=str(event_name),
-                link=link
-            )
-        )
-
-
-def send_session_accept_reject(email, session_name, acceptance, link, subject=None, message=None):
-    """Send session accepted or rejected"""
-    message_settings = MessageSettings.query.filter_by(action=SESSION_ACCEPT_REJECT).first()
-    if not message_settings or message_settings.mail_status == 1:
-        action = SESSION_ACCEPT_REJECT
-        subject = subject if subject else MAILS[SESSION_ACCEPT_REJECT]['subject'].format(session_name=session_name,
-                                                                                         acceptance=acceptance),
-        message = message if message else MAILS[SESSION_ACCEPT_REJECT]['message'].format(
-            email=str(email),
-            session_name=str(session_name),
-            acceptance=str(acceptance),
-            link=link)
-
-        send_email(
-            to=email,
-            action=action,
-            subject=subject,
-            html=message
-        )
-
-
-def send_schedule_change(email, session_name, link):
-    """Send schedule change in session"""
-    message_settings = MessageSettings.query.filter_by(action=SESSION_SCHEDULE).first()
-    if not message_settings or message_settings.mail_status == 1:
-        send_email(
-            to=email,
-            action=SESSION_SCHEDULE,
-            subject=MAILS[SESSION_SCHEDULE]['subject'].format(session_name=session_name),
-            html=MAILS[SESSION_SCHEDULE]['message'].format(
-                email=str(email),
-                session_name=str(session_name),
-                link=link
-            )
-        )
-
-
 def send_next_event(email, event_name, link, up_coming_events):
     """Send next event"""
     message_settings = MessageSettings.query.filter_by(action=NEXT_EVENT).first()
@@ -305,19 +248,6 @@ def send_email_after_cancel_ticket(email, invoice_id, order_url, event_name, can
     )
 
 
-def send_email_for_after_purchase_organizers(email, buyer_email, invoice_id, order_url, event_name, event_organiser):
-    """Send email with order invoice link after purchase"""
-    send_email(
-        to=email,
-        action=TICKET_PURCHASED_ORGANIZER,
-        subject=MAILS[TICKET_PURCHASED_ORGANIZER]['subject'].format(invoice_id=invoice_id, event_name=event_name,
-                                                                    buyer_email=buyer_email),
-        html=MAILS[TICKET_PURCHASED_ORGANIZER]['message'].format(order_url=order_url, buyer_email=buyer_email,
-                                                                 event_name=event_name,
-                                                                 event_organiser=event_organiser)
-    )
-
-
 def send_email_for_expired_orders(email, event_name, invoice_id, order_url):
     """Send email with order invoice link after purchase"""
     send_email(
@@ -430,8 +360,7 @@ def send_email(to, action, subject, html):
                     'port': get_settings()['smtp_port'],
                 }
 
-                from tasks import send_mail_via_smtp_task
-                send_mail_via_smtp_task.delay(config, payload)
+                queue_mail(config, payload)
             else:
                 payload['fromname'] = email_from_name
                 key = get_settings()['sendgrid_key']
@@ -450,8 +379,8 @@ def send_email(to, action, subject, html):
             message=html, time=datetime.now()
         )
 
-        from data import save_to_db, record_activity
-        save_to_db(mail, 'Mail Recorded')
+        from data import record_activity
+        queue_record(mail)
         record_activity('mail_event', email=to, action=action, subject=subject)
     return
 
@@ -496,27 +425,6 @@ def send_notif_for_after_purchase(user, invoice_id, order_url):
     )
 
 
-def send_notif_for_after_purchase_organizer(user, invoice_id, order_url, event_name, buyer_email):
-    """Send notification with order invoice link after purchase"""
-    send_notification(
-        user=user,
-        action=NOTIF_TICKET_PURCHASED_ORGANIZER,
-        title=NOTIFS[NOTIF_TICKET_PURCHASED_ORGANIZER]['title'].format(invoice_id=invoice_id, event_name=event_name,
-                                                                       buyer_email=buyer_email),
-        message=NOTIFS[NOTIF_TICKET_PURCHASED_ORGANIZER]['message'].format(order_url=order_url)
-    )
-
-
-def send_notif_for_resend(user, invoice_id, order_url, event_name, buyer_email):
-    """Send notification with order invoice link after purchase"""
-    send_notification(
-        user=user,
-        action=NOTIF_TICKET_RESEND_ORGANIZER,
-        title=NOTIFS[NOTIF_TICKET_RESEND_ORGANIZER]['title'].format(invoice_id=invoice_id, event_name=event_name, buyer_email=buyer_email),
-        message=NOTIFS[NOTIF_TICKET_RESEND_ORGANIZER]['message'].format(order_url=order_url)
-    )
-
-
 def send_notif_when_changes_email(user, old_email, new_email):
     send_notification(
         user=user,
@@ -547,28 +455,6 @@ def send_notif_event_role(user, role_name, event_name, accept_link, decline_link
         send_notification(user, action, title, message)
 
 
-def send_notif_new_session_organizer(user, event_name, link):
-    message_settings = MessageSettings.query.filter_by(action=NOTIF_NEW_SESSION).first()
-    if not message_settings or message_settings.notif_status == 1:
-        notif = NOTIFS[NOTIF_NEW_SESSION]
-        action = NOTIF_NEW_SESSION
-        title = notif['title'].format(event_name=event_name)
-        message = notif['message'].format(event_name=event_name, link=link)
-
-        send_notification(user, action, title, message)
-
-
-def send_notif_session_schedule(user, session_name, link):
-    message_settings = MessageSettings.query.filter_by(action=NOTIF_SESSION_SCHEDULE).first()
-    if not message_settings or message_settings.notif_status == 1:
-        notif = NOTIFS[NOTIF_SESSION_SCHEDULE]
-        action = NOTIF_SESSION_SCHEDULE
-        title = notif['title'].format(session_name=session_name)
-        message = notif['message'].format(session_name=session_name, link=link)
-
-        send_notification(user, action, title, message)
-
-
 def send_notif_next_event(user, event_name, up_coming_events, link):
     message_settings = MessageSettings.query.filter_by(action=NOTIF_NEXT_EVENT).first()
     if not message_settings or message_settings.notif_status == 1:
@@ -581,22 +467,6 @@ def send_notif_next_event(user, event_name, up_coming_events, link):
         send_notification(user, action, title, message)
 
 
-def send_notif_session_accept_reject(user, session_name, acceptance, link):
-    message_settings = MessageSettings.query.filter_by(action=NOTIF_SESSION_ACCEPT_REJECT).first()
-    if not message_settings or message_settings.notif_status == 1:
-        notif = NOTIFS[NOTIF_SESSION_ACCEPT_REJECT]
-        action = NOTIF_SESSION_ACCEPT_REJECT
-        title = notif['title'].format(session_name=session_name,
-                                      acceptance=acceptance)
-        message = notif['message'].format(
-            session_name=session_name,
-            acceptance=acceptance,
-            link=link
-        )
-
-        send_notification(user, action, title, message)
-
-
 def send_notif_invite_papers(user, event_name, cfs_link, submit_link):
     message_settings = MessageSettings.query.filter_by(action=NOTIF_INVITE_PAPERS).first()
     if not message_settings or message_settings.notif_status == 1:
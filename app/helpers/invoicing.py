@@ -1,12 +1,28 @@
+import uuid
 from datetime import datetime
 
+from dateutil.relativedelta import relativedelta
+from sqlalchemy import func, or_
+from sqlalchemy.orm import joinedload
+
 from app.helpers.cache import cache
 from app.helpers.data import save_to_db
 from app.helpers.helpers import get_count, represents_int
-from app.helpers.payment import StripePaymentsManager, PayPalPaymentsManager
+from app.helpers.payment import StripePaymentsManager, PayPalPaymentsManager, DEFAULT_FEE
+from app.models import db
 from app.models.discount_code import DiscountCode, EVENT
 from app.models.event import Event
 from app.models.event_invoice import EventInvoice
+from app.models.fees import TicketFees
+from app.models.order import Order, OrderTicket
+from app.models.role import Role
+from app.models.ticket import Ticket
+from app.models.users_events_roles import UsersEventsRoles
+
+
+def _months_between(start, end):
+    delta = relativedelta(end, start)
+    return delta.years * 12 + delta.months
 
 
 class InvoicingManager(object):
@@ -54,6 +70,84 @@ class InvoicingManager(object):
             invoices = invoices.filter(EventInvoice.created_at <= to_date)
         return invoices.all()
 
+    @staticmethod
+    def get_monthly_fees(period_end):
+        """
+        Returns {event_id: service fee} of the completed paid orders not
+        invoiced yet that completed before `period_end`, summed in one
+        grouped query. The fee is charged once per order ticket line.
+        """
+        invoiced = db.session.query(
+            EventInvoice.event_id.label('event_id'),
+            func.max(func.coalesce(EventInvoice.billed_until, EventInvoice.created_at)).label('until')) \
+            .group_by(EventInvoice.event_id).subquery()
+        lines = db.session.query(Order.event_id, Event.payment_currency, func.sum(Ticket.price)) \
+            .select_from(OrderTicket) \
+            .join(Order, Order.id == OrderTicket.order_id) \
+            .join(Ticket, Ticket.id == OrderTicket.ticket_id) \
+            .join(Event, Event.id == Order.event_id) \
+            .outerjoin(invoiced, invoiced.c.event_id == Order.event_id) \
+            .filter(Order.status == 'completed') \
+            .filter(Order.completed_at < period_end) \
+            .filter(or_(invoiced.c.until.is_(None), Order.completed_at > invoiced.c.until)) \
+            .filter(or_(Order.paid_via.is_(None), Order.paid_via != 'free')) \
+            .filter(Order.amount > 0) \
+            .filter(Ticket.price > 0) \
+            .group_by(Order.event_id, Event.payment_currency)
+        # the latest fee settings of each currency
+        rates = dict(db.session.query(TicketFees.currency, TicketFees.service_fee).order_by(TicketFees.id))
+        fees = {}
+        for event_id, currency, total in lines:
+            fee = (total or 0) * (rates.get(currency, DEFAULT_FEE) or 0) / 100.0
+            if fee > 0:
+                fees[event_id] = fees.get(event_id, 0) + fee
+        return fees
+
+    @staticmethod
+    def create_monthly_invoices(period_end):
+        """
+        Invoices the service fees of the orders completed before
+        `period_end` in one bulk insert, and returns the new invoices.
+        Running it again for the same period creates nothing: the orders
+        were invoiced up to `period_end`.
+        """
+        fees = InvoicingManager.get_monthly_fees(period_end)
+        if not fees:
+            return []
+        organizers = {}
+        for event_id, user_id in db.session.query(UsersEventsRoles.event_id, UsersEventsRoles.user_id) \
+                .join(Role, UsersEventsRoles.role_id == Role.id) \
+                .filter(Role.name == 'organizer') \
+                .filter(UsersEventsRoles.event_id.in_(fees.keys())) \
+                .order_by(UsersEventsRoles.id):
+            organizers.setdefault(event_id, user_id)
+        now = datetime.utcnow()
+        rows = []
+        for event in Event.query.options(joinedload(Event.discount_code)).filter(Event.id.in_(fees.keys())):
+            amount = fees[event.id]
+            discount_code = event.discount_code
+            # event discount codes take `value` percent off the fees for `max_quantity` months
+            if discount_code and discount_code.max_quantity and event.created_at and \
+                    _months_between(event.created_at, now) < discount_code.max_quantity:
+                amount -= amount * (discount_code.value / 100.0)
+            else:
+                discount_code = None
+            rows.append({
+                'identifier': str(uuid.uuid4()),
+                'amount': amount,
+                'event_id': event.id,
+                'user_id': organizers.get(event.id),
+                'discount_code_id': discount_code.id if discount_code else None,
+                'created_at': now,
+                'billed_until': period_end,
+            })
+        db.session.execute(EventInvoice.__table__.insert(), rows)
+        db.session.commit()
+        return EventInvoice.query.options(joinedload(EventInvoice.user), joinedload(EventInvoice.event)) \
+            .filter(EventInvoice.billed_until == period_end) \
+            .filter(EventInvoice.event_id.in_(fees.keys())) \
+            .order_by(EventInvoice.event_id).all()
+
     @staticmethod
     def get_invoices_count(event_id, status='completed'):
         return get_count(EventInvoice.query.filter_by(event_id=event_id).filter_by(status=status))
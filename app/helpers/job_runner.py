@@ -0,0 +1,251 @@
+"""
+Runner of the scheduled jobs.
+
+Every gunicorn and Celery worker imports the app and starts its own
+scheduler, so the jobs used to run once per process: trash was emptied
+several times over and the same mails went out several times. Jobs are
+now registered here (`register_job`) and always started through
+`run_job`, which:
+
+- takes a lock per job, a PostgreSQL advisory lock shared by the fleet
+  (a process lock on other databases),
+- skips the run when the job already ran during the last half of its
+  period, so schedulers firing a few seconds apart run it once,
+- records the run, its outcome and its error in `job_runs`.
+
+Jobs walk their rows in chunks of `JOB_CHUNK_SIZE` (`id_chunks`), and the
+incremental ones keep how far they got in `job_watermarks`
+(`get_watermark`, `save_watermark`) so that a run only reads what changed
+since the previous one.
+
+The jobs are started by the scheduler of every process
+(`SCHEDULED_JOBS_RUNNER = 'scheduler'`) or only by `celery beat`
+(`SCHEDULED_JOBS_RUNNER = 'celery'`, see `beat_schedule`), and can be
+started by hand with `python manage.py run_job -n <name>`.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import text
+
+from app.models import db
+from app.models.job_run import JobRun, JobWatermark, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+
+# first key of the advisory locks of the jobs, keeps them apart from other locks
+JOB_LOCK_NAMESPACE = 7411
+
+# rows a job reads and writes at a time
+JOB_CHUNK_SIZE = 500
+
+# APScheduler cron fields -> celery crontab arguments
+CRONTAB_FIELDS = {
+    'minute': 'minute',
+    'hour': 'hour',
+    'day': 'day_of_month',
+    'month': 'month_of_year',
+    'day_of_week': 'day_of_week',
+}
+
+
+class Job(object):
+    """
+    A scheduled job. `interval` is a timedelta, `cron` the APScheduler cron
+    fields of the job (all of them down to the minute). `period` is the time
+    between two runs, it defaults to `interval`.
+    """
+
+    def __init__(self, name, func, interval=None, cron=None, period=None):
+        if (interval is None) == (cron is None):
+            raise ValueError('Job %s needs either an interval or a cron schedule' % name)
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.cron = cron
+        self.period = period or interval
+        if self.period is None:
+            raise ValueError('Job %s needs a period' % name)
+
+    def add_to(self, scheduler):
+        if self.interval is not None:
+            scheduler.add_job(run_job, 'interval', args=[self.name], id=self.name,
+                              seconds=int(self.interval.total_seconds()))
+        else:
+            scheduler.add_job(run_job, 'cron', args=[self.name], id=self.name, **self.cron)
+
+    def celery_schedule(self):
+        if self.interval is not None:
+            return self.interval
+        from celery.schedules import crontab
+        return crontab(**dict((CRONTAB_FIELDS[field], value) for field, value in self.cron.items()))
+
+
+# name -> Job, in the order they were registered
+JOBS = OrderedDict()
+
+
+def register_job(name, func, interval=None, cron=None, period=None):
+    JOBS[name] = Job(name, func, interval=interval, cron=cron, period=period)
+    return JOBS[name]
+
+
+def schedule_jobs(scheduler):
+    """Adds the registered jobs to an APScheduler scheduler"""
+    for job in JOBS.values():
+        job.add_to(scheduler)
+
+
+def beat_schedule():
+    """Returns the `CELERYBEAT_SCHEDULE` of the registered jobs"""
+    return dict((job.name, {
+        'task': 'jobs.run',
+        'schedule': job.celery_schedule(),
+        'args': (job.name,),
+    }) for job in JOBS.values())
+
+
+_local_locks = {}
+_local_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _process_lock(name):
+    with _local_locks_lock:
+        lock = _local_locks.setdefault(name, threading.Lock())
+    acquired = lock.acquire(False)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            lock.release()
+
+
+@contextmanager
+def _advisory_lock(name):
+    key = zlib.crc32(name) & 0x7fffffff
+    connection = db.engine.connect()
+    try:
+        acquired = connection.execute(text('SELECT pg_try_advisory_lock(:namespace, :key)'),
+                                      namespace=JOB_LOCK_NAMESPACE, key=key).scalar()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                connection.execute(text('SELECT pg_advisory_unlock(:namespace, :key)'),
+                                   namespace=JOB_LOCK_NAMESPACE, key=key)
+    finally:
+        connection.close()
+
+
+def job_lock(name):
+    """
+    Context manager trying to take the lock of a job, yields whether it got
+    it. It never waits for the lock.
+    """
+    if db.engine.dialect.name == 'postgresql':
+        return _advisory_lock(name)
+    return _process_lock(name)
+
+
+def _host():
+    return '%s:%d' % (socket.gethostname(), os.getpid())
+
+
+def last_run(name, status=None):
+    """Returns the latest run of a job"""
+    query = JobRun.query.filter(JobRun.name == name)
+    if status is not None:
+        query = query.filter(JobRun.status == status)
+    return query.order_by(JobRun.started_at.desc(), JobRun.id.desc()).first()
+
+
+def _ran_since(name, since):
+    table = JobRun.__table__
+    statement = table.select() \
+        .where(table.c.name == name) \
+        .where(table.c.status.in_([JOB_RUNNING, JOB_SUCCEEDED])) \
+        .where(table.c.started_at > since) \
+        .limit(1)
+    with db.engine.connect() as connection:
+        return connection.execute(statement).first() is not None
+
+
+def run_job(name, trigger='scheduler', force=False):
+    """
+    Runs a registered job under its lock. Returns the status of the run, or
+    None when it was skipped because it is running elsewhere or, unless
+    `force`, ran recently.
+    """
+    from app import current_app as app
+    job = JOBS[name]
+    table = JobRun.__table__
+    with app.app_context():
+        with job_lock(name) as acquired:
+            if not acquired:
+                logging.info('Job %s is running elsewhere, skipped' % name)
+                return None
+            started_at = datetime.utcnow()
+            if not force and _ran_since(name, started_at - job.period / 2):
+                logging.info('Job %s ran recently, skipped' % name)
+                return None
+            # the run is recorded on connections of its own, the job may
+            # commit, roll back or remove the session
+            with db.engine.begin() as connection:
+                run_id = connection.execute(table.insert().values(
+                    name=name, trigger=trigger, host=_host(), status=JOB_RUNNING,
+                    started_at=started_at)).inserted_primary_key[0]
+            status, error = JOB_SUCCEEDED, None
+            try:
+                job.func()
+            except Exception:
+                logging.exception('Job %s failed' % name)
+                db.session.rollback()
+                status, error = JOB_FAILED, traceback.format_exc()
+            with db.engine.begin() as connection:
+                connection.execute(table.update().where(table.c.id == run_id).values(
+                    status=status, error=error, finished_at=datetime.utcnow()))
+            return status
+
+
+def id_chunks(query, column, size=JOB_CHUNK_SIZE):
+    """
+    Yields the ids selected by `query` (a query of `column` alone) in
+    chunks, walking them upwards. Rows left behind by a failed chunk are
+    not read again by the same run.
+    """
+    last_id = None
+    while True:
+        chunk_query = query if last_id is None else query.filter(column > last_id)
+        ids = [row[0] for row in chunk_query.order_by(column).limit(size)]
+        if not ids:
+            return
+        yield ids
+        if len(ids) < size:
+            return
+        last_id = ids[-1]
+
+
+def get_watermark(name):
+    """Returns the (watermark, last_id) an incremental job got to, or (None, None)"""
+    table = JobWatermark.__table__
+    with db.engine.connect() as connection:
+        row = connection.execute(table.select().where(table.c.name == name)).first()
+    if row is None:
+        return None, None
+    return row.watermark, row.last_id
+
+
+def save_watermark(name, watermark, last_id=None):
+    """Checkpoints an incremental job, on a connection of its own"""
+    table = JobWatermark.__table__
+    values = {'watermark': watermark, 'last_id': last_id, 'updated_at': datetime.utcnow()}
+    # jobs run under their lock, nobody else writes the row
+    with db.engine.begin() as connection:
+        if not connection.execute(table.update().where(table.c.name == name).values(**values)).rowcount:
+            connection.execute(table.insert().values(name=name, **values))
@@ -0,0 +1,77 @@
+"""
+Last access tracking of users.
+
+Recording the last access of a user used to dirty their row on every
+authenticated request, so every click and API call paid for an UPDATE.
+Accesses are now recorded in memory, at the resolution the admin panel
+shows them (`LAST_ACCESS_RESOLUTION`), and written by `flush_last_access`
+in one bulk UPDATE. The scheduler of each process runs it every
+`LAST_ACCESS_FLUSH_INTERVAL` seconds.
+"""
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, or_
+
+from app.models import db
+from app.models.user import User
+
+LAST_ACCESS_RESOLUTION = timedelta(minutes=1)
+LAST_ACCESS_FLUSH_INTERVAL = 60
+
+# {user id: last access} not written yet
+_pending = {}
+_pending_lock = threading.Lock()
+
+
+def _truncate(when):
+    return when.replace(second=0, microsecond=0)
+
+
+def record_access(user, when=None):
+    """Remembers that `user` accessed the site, nothing is written yet"""
+    when = _truncate(when or datetime.now())
+    if user.last_access_time is not None and when - user.last_access_time < LAST_ACCESS_RESOLUTION:
+        return
+    with _pending_lock:
+        _remember(user.id, when)
+
+
+def _remember(user_id, when):
+    if user_id not in _pending or _pending[user_id] < when:
+        _pending[user_id] = when
+
+
+def pending_accesses():
+    with _pending_lock:
+        return dict(_pending)
+
+
+def flush_last_access():
+    """
+    Writes the recorded accesses. Returns the number of users updated.
+    """
+    with _pending_lock:
+        accesses = dict(_pending)
+        _pending.clear()
+    if not accesses:
+        return 0
+    table = User.__table__
+    statement = table.update() \
+        .where(table.c.id == bindparam('user_id')) \
+        .where(or_(table.c.last_access_time.is_(None), table.c.last_access_time < bindparam('accessed_at'))) \
+        .values(last_access_time=bindparam('accessed_at'))
+    try:
+        db.session.execute(statement, [{'user_id': user_id, 'accessed_at': accessed_at}
+                                       for user_id, accessed_at in accesses.items()])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logging.exception('Could not write the last access of %d users' % len(accesses))
+        # keep them for the next flush unless newer accesses came in
+        with _pending_lock:
+            for user_id, accessed_at in accesses.items():
+                _remember(user_id, accessed_at)
+        return 0
+    return len(accesses)
@@ -0,0 +1,86 @@
+"""
+Buffered writer of the activity and mail logs.
+
+Recording an `Activity` or a `Mail` used to commit it on its own, inline,
+so bulk operations (accepting hundreds of sessions, mailing every
+attendee...) paid for hundreds of extra commits. Records are now queued in
+memory and written in order, with multi-row INSERTs on a connection of
+their own:
+
+- when a request is torn down,
+- when a Celery task finishes,
+- by the scheduler of every process, every `LOG_FLUSH_INTERVAL` seconds,
+- when `LOG_FLUSH_SIZE` records are waiting,
+- when the process exits.
+
+Records that could not be written are put back at the head of the queue
+and written by the next flush.
+"""
+import logging
+import threading
+from collections import deque
+
+from app.models import db
+
+LOG_FLUSH_SIZE = 500
+LOG_FLUSH_INTERVAL = 5
+# rows per INSERT statement
+INSERT_CHUNK = 500
+
+# (table, {column: value}) in the order they were recorded
+_queue = deque()
+_queue_lock = threading.Lock()
+# one flush at a time keeps the records of the process in order
+_flush_lock = threading.Lock()
+
+
+def queue_record(item):
+    """Queues a new model instance (`Activity`, `Mail`...) to be inserted"""
+    table = item.__table__
+    values = dict((column.name, getattr(item, column.name)) for column in table.columns
+                  if not column.primary_key)
+    with _queue_lock:
+        _queue.append((table, values))
+        size = len(_queue)
+    if size >= LOG_FLUSH_SIZE:
+        flush_logs()
+
+
+def queued_records():
+    with _queue_lock:
+        return list(_queue)
+
+
+def _batches(records):
+    """Splits records into runs of the same table of at most INSERT_CHUNK"""
+    batch_table, rows = None, []
+    for table, values in records:
+        if rows and (table is not batch_table or len(rows) >= INSERT_CHUNK):
+            yield batch_table, rows
+            rows = []
+        batch_table = table
+        rows.append(values)
+    if rows:
+        yield batch_table, rows
+
+
+def flush_logs():
+    """
+    Writes the queued records. Returns the number of records written.
+    """
+    with _flush_lock:
+        with _queue_lock:
+            records = list(_queue)
+            _queue.clear()
+        if not records:
+            return 0
+        try:
+            with db.engine.begin() as connection:
+                for table, rows in _batches(records):
+                    connection.execute(table.insert().values(rows))
+        except Exception:
+            logging.exception('Could not write %d log records' % len(records))
+            with _queue_lock:
+                _queue.extendleft(reversed(records))
+            return 0
+        return len(records)
@@ -0,0 +1,153 @@
+"""
+Bulk dispatch of SMTP mails.
+
+`queue_mail` collects the mails sent while an app context is active (a
+request, a Celery task, a scheduled job). When the context is torn down,
+`dispatch_mails` groups them by SMTP configuration and hands them to
+`send_mail_batch_task` in batches of `MAIL_BATCH_SIZE`, so mailing every
+speaker of an event costs a few tasks instead of one per recipient.
+
+Workers keep one started mailer per SMTP configuration (`get_mailer`).
+Consecutive messages and batches reuse its connection and TLS session
+instead of opening a new one for every mail.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, has_app_context
+from marrow.mailer import Mailer, Message
+from marrow.mailer.exc import DeliveryFailedException
+
+from app.helpers.versioning import strip_tags
+
+MAIL_BATCH_SIZE = 50
+
+# SMTP configuration -> started mailer of this process
+_mailers = {}
+_mailers_lock = threading.Lock()
+
+
+def _config_key(config):
+    return tuple(sorted(config.items()))
+
+
+def get_mailer(config):
+    """Returns the started mailer of an SMTP configuration"""
+    key = _config_key(config)
+    with _mailers_lock:
+        mailer = _mailers.get(key)
+        if mailer is None:
+            transport = {
+                'use': 'smtp',
+                'host': config['host'],
+                'tls': config['encryption'],
+                'port': config['port']
+            }
+            # marrow.mailer can't take empty credentials, the server then
+            # doesn't ask for a login
+            if config['username']:
+                transport['username'] = config['username']
+                transport['password'] = config['password'] or ''
+            mailer = Mailer({
+                'manager': {
+                    'use': 'immediate'
+                },
+                'transport': transport
+            })
+            mailer.start()
+            _mailers[key] = mailer
+        return mailer
+
+
+def discard_mailer(config):
+    """Closes the mailer of a configuration, the next mail opens a new one"""
+    with _mailers_lock:
+        mailer = _mailers.pop(_config_key(config), None)
+    if mailer is not None:
+        try:
+            mailer.stop()
+        except Exception:
+            logging.exception('Could not stop the mailer of %s' % config['host'])
+
+
+def stop_mailers():
+    with _mailers_lock:
+        mailers = _mailers.values()
+        _mailers.clear()
+    for mailer in mailers:
+        try:
+            mailer.stop()
+        except Exception:
+            logging.exception('Could not stop a mailer')
+
+
+def build_message(payload):
+    message = Message(author=payload['from'], to=payload['to'])
+    message.subject = payload['subject']
+    message.plain = strip_tags(payload['html'])
+    message.rich = payload['html']
+    return message
+
+
+class MailBatchError(Exception):
+    """The connection failed after `sent` mails of a batch"""
+
+    def __init__(self, sent, error):
+        super(MailBatchError, self).__init__(str(error))
+        self.sent = sent
+        self.error = error
+
+
+def send_batch(config, payloads):
+    """
+    Sends mails over the pooled connection of `config`. Mails refused by
+    the server are logged and skipped. Returns a dict with the number of
+    mails sent and the throughput in mails per second.
+    """
+    sent = 0
+    refused = 0
+    start = time.time()
+    for payload in payloads:
+        try:
+            get_mailer(config).send(build_message(payload))
+            sent += 1
+        except DeliveryFailedException:
+            refused += 1
+            logging.exception('Mail to %s refused' % payload['to'])
+        except Exception as e:
+            discard_mailer(config)
+            raise MailBatchError(sent + refused, e)
+    elapsed = time.time() - start
+    rate = sent / elapsed if elapsed else float(sent)
+    logging.info('Sent %d mails through %s in %.2fs (%.1f mails/s)' % (sent, config['host'], elapsed, rate))
+    return {
+        'sent': sent,
+        'refused': refused,
+        'seconds': elapsed,
+        'rate': rate,
+    }
+
+
+def queue_mail(config, payload):
+    """Queues a mail to be sent through SMTP when the app context ends"""
+    if not has_app_context():
+        from app.helpers.tasks import send_mail_batch_task
+        send_mail_batch_task.delay(config, [payload])
+        return
+    g.setdefault('mail_outbox', []).append((config, payload))
+
+
+def dispatch_mails():
+    """Sends the mails queued in the current app context, in batches"""
+    outbox = g.pop('mail_outbox', [])
+    if not outbox:
+        return
+    from app.helpers.tasks import send_mail_batch_task
+    grouped = OrderedDict()
+    for config, payload in outbox:
+        grouped.setdefault(_config_key(config), (config, []))[1].append(payload)
+    for config, payloads in grouped.values():
+        for start in range(0, len(payloads), MAIL_BATCH_SIZE):
+            send_mail_batch_task.delay(config, payloads[start:start + MAIL_BATCH_SIZE])
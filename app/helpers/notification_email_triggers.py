@@ -1,10 +1,16 @@
 from flask import url_for
 
 from app.helpers.data_getter import DataGetter
-from app.helpers.helpers import send_new_session_organizer, send_notif_new_session_organizer, \
-    send_notif_session_accept_reject, send_session_accept_reject, send_schedule_change, send_notif_session_schedule, \
-    send_email_for_after_purchase_organizers, send_notif_for_after_purchase_organizer, send_notif_for_resend
-from app.models.mail import NEW_SESSION, SESSION_ACCEPT_REJECT, SESSION_SCHEDULE, TICKET_PURCHASED
+from app.helpers.notification_fanout import Fanout, render, get_message_settings, get_email_preferences, \
+    get_event_staff, wants_mail, wants_notification
+from app.helpers.system_mails import MAILS
+from app.helpers.system_notifications import NOTIFS
+from app.models.mail import NEW_SESSION, SESSION_ACCEPT_REJECT, SESSION_SCHEDULE, TICKET_PURCHASED, \
+    TICKET_PURCHASED_ORGANIZER
+from app.models.notifications import NEW_SESSION as NOTIF_NEW_SESSION, \
+    SESSION_ACCEPT_REJECT as NOTIF_SESSION_ACCEPT_REJECT, SESSION_SCHEDULE as NOTIF_SESSION_SCHEDULE, \
+    TICKET_PURCHASED_ORGANIZER as NOTIF_TICKET_PURCHASED_ORGANIZER, \
+    TICKET_RESEND_ORGANIZER as NOTIF_TICKET_RESEND_ORGANIZER
 
 
 def trigger_new_session_notifications(session_id, event_id=None, event=None):
@@ -16,35 +22,49 @@ def trigger_new_session_notifications(session_id, event_id=None, event=None):
     link = url_for('event_sessions.session_display_view',
                    event_id=event.id, session_id=session_id, _external=True)
 
-    admin_msg_setting = DataGetter.get_message_setting_by_action(NEW_SESSION)
-    organizers = DataGetter.get_user_event_roles_by_role_name(event.id, 'organizer')
-    for organizer in organizers:
-        email_notification_setting = DataGetter.get_email_notification_settings_by_event_id(organizer.user.id, event.id)
-        if not admin_msg_setting or \
-            (email_notification_setting and email_notification_setting.new_paper == 1 and
-             admin_msg_setting.user_control_status == 1) or admin_msg_setting.user_control_status == 0:
+    settings = get_message_settings(NEW_SESSION, NOTIF_NEW_SESSION)
+    organizers = get_event_staff(event.id, ['organizer'])
+    preferences = get_email_preferences(event.id, [user_id for user_id, _ in organizers])
 
-            send_new_session_organizer(organizer.user.email, event.name, link)
-        # Send notification
-        send_notif_new_session_organizer(organizer.user, event.name, link)
+    subject = MAILS[NEW_SESSION]['subject'].format(event_name=event.name)
+    html = render(MAILS[NEW_SESSION]['message'], event_name=event.name, link=link)
+    notif = NOTIFS[NOTIF_NEW_SESSION]
+    title = notif['title'].format(event_name=event.name)
+    message = notif['message'].format(event_name=event.name, link=link)
+
+    fanout = Fanout()
+    for user_id, email in organizers:
+        if wants_mail(settings.get(NEW_SESSION), preferences.get(user_id), 'new_paper'):
+            fanout.mail(email, NEW_SESSION, subject, html)
+        if wants_notification(settings.get(NOTIF_NEW_SESSION)):
+            fanout.notify(user_id, NOTIF_NEW_SESSION, title, message)
+    fanout.send()
 
 
 def trigger_session_state_change_notifications(session, event_id, state=None, message=None, subject=None):
     if not state:
         state = session.state
     link = url_for('event_sessions.session_display_view', event_id=event_id, session_id=session.id, _external=True)
-    admin_msg_setting = DataGetter.get_message_setting_by_action(SESSION_ACCEPT_REJECT)
-    for speaker in session.speakers:
-        email_notification_setting = DataGetter.get_email_notification_settings_by_event_id(speaker.user_id, event_id)
-        if not admin_msg_setting or \
-            (email_notification_setting and email_notification_setting.session_accept_reject == 1 and
-             admin_msg_setting.user_control_status == 1) or admin_msg_setting.user_control_status == 0:
-
-            if speaker.email:
-                send_session_accept_reject(speaker.email, session.title, state, link, subject=subject, message=message)
-            # Send notification
-        if speaker.user:
-            send_notif_session_accept_reject(speaker.user, session.title, state, link)
+    settings = get_message_settings(SESSION_ACCEPT_REJECT, NOTIF_SESSION_ACCEPT_REJECT)
+    speakers = session.speakers
+    preferences = get_email_preferences(event_id, [speaker.user_id for speaker in speakers])
+
+    subject = subject or MAILS[SESSION_ACCEPT_REJECT]['subject'].format(session_name=session.title,
+                                                                        acceptance=state)
+    html = message or render(MAILS[SESSION_ACCEPT_REJECT]['message'], session_name=session.title,
+                             acceptance=state, link=link)
+    notif = NOTIFS[NOTIF_SESSION_ACCEPT_REJECT]
+    title = notif['title'].format(session_name=session.title, acceptance=state)
+    notif_message = notif['message'].format(session_name=session.title, acceptance=state, link=link)
+
+    fanout = Fanout()
+    for speaker in speakers:
+        if speaker.email and wants_mail(settings.get(SESSION_ACCEPT_REJECT), preferences.get(speaker.user_id),
+                                        'session_accept_reject'):
+            fanout.mail(speaker.email, SESSION_ACCEPT_REJECT, subject, html)
+        if speaker.user_id and wants_notification(settings.get(NOTIF_SESSION_ACCEPT_REJECT)):
+            fanout.notify(speaker.user_id, NOTIF_SESSION_ACCEPT_REJECT, title, notif_message)
+    fanout.send()
     session.state_email_sent = True
     from app.helpers.data import save_to_db
     save_to_db(session)
@@ -52,17 +72,24 @@ def trigger_session_state_change_notifications(session, event_id, state=None, me
 
 def trigger_session_schedule_change_notifications(session, event_id):
     link = url_for('event_sessions.session_display_view', event_id=event_id, session_id=session.id, _external=True)
-    admin_msg_setting = DataGetter.get_message_setting_by_action(SESSION_SCHEDULE)
-    for speaker in session.speakers:
-        email_notification_setting = DataGetter.get_email_notification_settings_by_event_id(speaker.user_id, event_id)
-        if not admin_msg_setting or \
-            (email_notification_setting and email_notification_setting.session_schedule == 1 and
-             admin_msg_setting.user_control_status == 1) or admin_msg_setting.user_control_status == 0:
-            if speaker.email:
-                send_schedule_change(speaker.email, session.title, link)
-        # Send notification
-        if speaker.user:
-            send_notif_session_schedule(speaker.user, session.title, link)
+    settings = get_message_settings(SESSION_SCHEDULE, NOTIF_SESSION_SCHEDULE)
+    speakers = session.speakers
+    preferences = get_email_preferences(event_id, [speaker.user_id for speaker in speakers])
+
+    subject = MAILS[SESSION_SCHEDULE]['subject'].format(session_name=session.title)
+    html = render(MAILS[SESSION_SCHEDULE]['message'], session_name=session.title, link=link)
+    notif = NOTIFS[NOTIF_SESSION_SCHEDULE]
+    title = notif['title'].format(session_name=session.title)
+    message = notif['message'].format(session_name=session.title, link=link)
+
+    fanout = Fanout()
+    for speaker in speakers:
+        if speaker.email and wants_mail(settings.get(SESSION_SCHEDULE), preferences.get(speaker.user_id),
+                                        'session_schedule'):
+            fanout.mail(speaker.email, SESSION_SCHEDULE, subject, html)
+        if speaker.user_id and wants_notification(settings.get(NOTIF_SESSION_SCHEDULE)):
+            fanout.notify(speaker.user_id, NOTIF_SESSION_SCHEDULE, title, message)
+    fanout.send()
 
 
 def trigger_after_purchase_notifications(buyer_email, event_id, event, invoice_id, order_url, resend=False):
@@ -71,28 +98,24 @@ def trigger_after_purchase_notifications(buyer_email, event_id, event, invoice_i
     if not event:
         event = DataGetter.get_event(event_id)
 
-    admin_msg_setting = DataGetter.get_message_setting_by_action(TICKET_PURCHASED)
-    organizers = DataGetter.get_user_event_roles_by_role_name(event.id, 'organizer')
-    for organizer in organizers:
-        email_notification_setting = DataGetter.get_email_notification_settings_by_event_id(organizer.user.id, event_id)
-        if not admin_msg_setting or \
-            (email_notification_setting and email_notification_setting.after_ticket_purchase == 1 and
-             admin_msg_setting.user_control_status == 1) or admin_msg_setting.user_control_status == 0:
-            send_email_for_after_purchase_organizers(organizer.user.email, buyer_email, invoice_id, order_url, event.name, event.organizer_name)
-        if resend:
-            send_notif_for_resend(organizer.user, invoice_id, order_url, event.name, buyer_email)
-        else:
-            send_notif_for_after_purchase_organizer(organizer.user, invoice_id, order_url, event.name, buyer_email)
-
-    coorganizers = DataGetter.get_user_event_roles_by_role_name(event.id, 'coorganizer')
-    for coorganizer in coorganizers:
-        email_notification_setting = DataGetter.get_email_notification_settings_by_event_id(coorganizer.user.id, event_id)
-        if not admin_msg_setting or \
-            (email_notification_setting and email_notification_setting.after_ticket_purchase == 1 and
-                     admin_msg_setting.user_control_status == 1) or admin_msg_setting.user_control_status == 0:
-            send_email_for_after_purchase_organizers(coorganizer.user.email, buyer_email, invoice_id, order_url, event.name, event.organizer_name)
-        if resend:
-            send_notif_for_resend(coorganizer.user, invoice_id, order_url, event.name, buyer_email)
-        else:
-            send_notif_for_after_purchase_organizer(coorganizer.user, invoice_id, order_url, event.name, buyer_email)
-
+    settings = get_message_settings(TICKET_PURCHASED)
+    staff = get_event_staff(event.id, ['organizer', 'coorganizer'])
+    preferences = get_email_preferences(event.id, [user_id for user_id, _ in staff])
+
+    subject = MAILS[TICKET_PURCHASED_ORGANIZER]['subject'].format(invoice_id=invoice_id, event_name=event.name,
+                                                                  buyer_email=buyer_email)
+    html = render(MAILS[TICKET_PURCHASED_ORGANIZER]['message'], order_url=order_url, buyer_email=buyer_email,
+                  event_name=event.name, event_organiser=event.organizer_name)
+    notif_action = NOTIF_TICKET_RESEND_ORGANIZER if resend else NOTIF_TICKET_PURCHASED_ORGANIZER
+    notif = NOTIFS[notif_action]
+    title = notif['title'].format(invoice_id=invoice_id, event_name=event.name, buyer_email=buyer_email)
+    message = notif['message'].format(order_url=order_url)
+
+    fanout = Fanout()
+    for user_id, email in staff:
+        # the admin setting only controls the mail, the organizers are always notified
+        if wants_mail(settings.get(TICKET_PURCHASED), preferences.get(user_id), 'after_ticket_purchase',
+                      check_mail_status=False):
+            fanout.mail(email, TICKET_PURCHASED_ORGANIZER, subject, html)
+        fanout.notify(user_id, notif_action, title, message)
+    fanout.send()
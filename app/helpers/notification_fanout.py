@@ -0,0 +1,136 @@
+"""
+Batched fan-out of mails and notifications to the people of an event.
+
+The notification triggers used to look up the admin message setting and
+the email preferences of every recipient one by one, and then send each
+mail and notification inline, with one more message setting lookup each.
+A `Fanout` is planned in the request instead: the message settings of its
+actions and the preferences of all recipients are read in one query each,
+every template is rendered once, and the mails and notifications are
+handed to a single `send_fanout_task`.
+"""
+from datetime import datetime
+
+from flask import current_app
+
+from app.models import db
+from app.models.email_notifications import EmailNotification
+from app.models.message_settings import MessageSettings
+from app.models.notifications import Notification
+from app.models.role import Role
+from app.models.user import User
+from app.models.users_events_roles import UsersEventsRoles
+
+# stands for the recipient's address in a template rendered once
+EMAIL_TOKEN = u'\x00email\x00'
+
+
+def render(template, **values):
+    """
+    Renders a template once, `{email}` is filled in per recipient by
+    `for_email`
+    """
+    values['email'] = EMAIL_TOKEN
+    return template.format(**values)
+
+
+def for_email(rendered, email):
+    return rendered.replace(EMAIL_TOKEN, email)
+
+
+def get_message_settings(*actions):
+    """Returns {action: MessageSettings} of the actions that have one"""
+    settings = {}
+    for setting in MessageSettings.query.filter(MessageSettings.action.in_(actions)).order_by(MessageSettings.id):
+        settings.setdefault(setting.action, setting)
+    return settings
+
+
+def get_email_preferences(event_id, user_ids):
+    """Returns {user id: EmailNotification} of the users at an event"""
+    user_ids = [user_id for user_id in set(user_ids) if user_id is not None]
+    if not user_ids:
+        return {}
+    preferences = {}
+    for preference in EmailNotification.query.filter(EmailNotification.event_id == event_id) \
+            .filter(EmailNotification.user_id.in_(user_ids)).order_by(EmailNotification.id):
+        preferences.setdefault(preference.user_id, preference)
+    return preferences
+
+
+def get_event_staff(event_id, role_names):
+    """Returns [(user id, email)] of the users with one of the roles at an event"""
+    return db.session.query(User.id, User.email).distinct() \
+        .join(UsersEventsRoles, UsersEventsRoles.user_id == User.id) \
+        .join(Role, UsersEventsRoles.role_id == Role.id) \
+        .filter(UsersEventsRoles.event_id == event_id) \
+        .filter(Role.name.in_(role_names)) \
+        .order_by(User.id).all()
+
+
+def wants_mail(setting, preference, preference_column, check_mail_status=True):
+    """
+    Checks the admin message setting of an action and the email preference
+    of a recipient for it
+    """
+    if setting is None:
+        return True
+    if check_mail_status and setting.mail_status != 1:
+        return False
+    if setting.user_control_status == 0:
+        return True
+    return setting.user_control_status == 1 and preference is not None and \
+        getattr(preference, preference_column) == 1
+
+
+def wants_notification(setting):
+    return setting is None or setting.notif_status == 1
+
+
+class Fanout(object):
+    """Mails and notifications planned by a trigger"""
+
+    def __init__(self):
+        self.mails = []
+        self.notifications = []
+
+    def mail(self, to, action, subject, html):
+        self.mails.append({
+            'to': to,
+            'action': action,
+            'subject': subject,
+            'html': for_email(html, to),
+        })
+
+    def notify(self, user_id, action, title, message):
+        self.notifications.append({
+            'user_id': user_id,
+            'action': action,
+            'title': title,
+            'message': message,
+        })
+
+    def send(self):
+        """Hands everything to one task"""
+        if not self.mails and not self.notifications:
+            return
+        from app.helpers.tasks import send_fanout_task
+        send_fanout_task.delay(self.mails, self.notifications)
+
+
+def send_fanout(mails, notifications):
+    """Sends the mails and stores the notifications of a fan-out"""
+    from app.helpers.data import DataManager
+    from app.helpers.helpers import send_email
+    for mail in mails:
+        send_email(**mail)
+    if not notifications:
+        return
+    received_at = datetime.now()
+    db.session.execute(Notification.__table__.insert(), [
+        dict(notification, received_at=received_at, has_read=False) for notification in notifications])
+    db.session.commit()
+    if current_app.config.get('INTEGRATE_SOCKETIO', False):
+        user_ids = set(notification['user_id'] for notification in notifications)
+        for user in User.query.filter(User.id.in_(user_ids)):
+            DataManager.push_user_notification(user)
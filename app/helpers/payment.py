@@ -5,11 +5,11 @@ import requests
 import sqlalchemy
 import stripe
 from flask import url_for, current_app
-from forex_python.converter import CurrencyRates
 
 from app.helpers.cache import cache
 from app.helpers.data import save_to_db
 from app.helpers.data_getter import DataGetter
+from app.helpers.fx_rates import get_rates
 from app.helpers.helpers import represents_int
 from app.models.fees import TicketFees
 from app.models.order import Order
@@ -19,13 +19,8 @@ from app.settings import get_settings
 DEFAULT_FEE = 0.0
 
 
-@cache.memoize(5)
 def forex(from_currency, to_currency, amount):
-    try:
-        currency_rates = CurrencyRates()
-        return currency_rates.convert(from_currency, to_currency, amount)
-    except:
-        return amount
+    return get_rates().convert(from_currency, to_currency, amount)
 
 
 @cache.memoize(5)
@@ -0,0 +1,215 @@
+"""
+Request scoped resolution of user roles and permissions.
+
+The role checks of `User` (`is_organizer`, `has_role`, `can_update`...),
+and so the permission decorators, used to query the role tables on every
+call. A `RoleResolver` loads what a user is allowed to do at once: their
+roles at every event, the permissions of these roles and their custom
+system roles with the admin panels they open. It is kept in `g` for the
+rest of the request and dropped as soon as a flush touches one of the
+role tables, so that a request sees the roles it changes itself.
+
+The roles table rarely changes and is kept in a per process snapshot,
+reloaded after a commit that touched it, when an unknown role shows up
+and at the latest every `ROLES_SNAPSHOT_TIMEOUT` seconds.
+"""
+import threading
+import time
+
+from flask import g, has_app_context
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session as SQLASession
+
+from app.models import db
+from app.models.panel_permissions import PanelPermission
+from app.models.permission import Permission
+from app.models.role import Role
+from app.models.service import Service
+from app.models.system_role import CustomSysRole, UserSystemRole
+from app.models.users_events_roles import UsersEventsRoles
+
+ROLES_SNAPSHOT_TIMEOUT = 300
+
+# flushing one of these drops the resolvers of the request
+ROLE_MODELS = (Role, UsersEventsRoles, Permission, Service, CustomSysRole, UserSystemRole, PanelPermission)
+
+OPERATIONS = ('create', 'read', 'update', 'delete')
+
+# Roles table snapshot of this process
+
+_roles = {
+    'names': None,
+    'loaded_at': 0,
+}
+_roles_lock = threading.Lock()
+
+
+def get_role_names():
+    """Returns {role id: role name}"""
+    with _roles_lock:
+        age = time.time() - _roles['loaded_at']
+        if _roles['names'] is None or age > ROLES_SNAPSHOT_TIMEOUT:
+            _roles['names'] = dict(db.session.query(Role.id, Role.name))
+            _roles['loaded_at'] = time.time()
+        return _roles['names']
+
+
+def invalidate_role_names():
+    with _roles_lock:
+        _roles['names'] = None
+
+
+def _names_of(role_ids):
+    names = get_role_names()
+    if not set(role_ids) <= set(names):
+        # created by another process after the snapshot was taken
+        invalidate_role_names()
+        names = get_role_names()
+    return names
+
+
+def _event_key(event_id):
+    # view arguments and API payloads may carry the id as a string
+    try:
+        return int(event_id)
+    except (TypeError, ValueError):
+        return event_id
+
+
+class RoleResolver(object):
+    """Roles and permissions of a user"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        # {event id: {role id: role name}}
+        self.event_roles = {}
+        if user_id is not None:
+            rows = db.session.query(UsersEventsRoles.event_id, UsersEventsRoles.role_id) \
+                .filter(UsersEventsRoles.user_id == user_id).all()
+            names = _names_of([role_id for _, role_id in rows])
+            for event_id, role_id in rows:
+                if role_id in names:
+                    self.event_roles.setdefault(event_id, {})[role_id] = names[role_id]
+        self._permissions = None
+        self._system_roles = None
+        self._panels = None
+
+    def roles_at(self, event_id):
+        """Returns the names of the roles of the user at an event"""
+        return set(self.event_roles.get(_event_key(event_id), {}).values())
+
+    @property
+    def permissions(self):
+        """{(role id, service name): {operation: allowed}} of the user's roles"""
+        if self._permissions is None:
+            self._permissions = {}
+            role_ids = set()
+            for roles in self.event_roles.values():
+                role_ids.update(roles)
+            if role_ids:
+                rows = db.session.query(Permission.role_id, Service.name, Permission.can_create,
+                                        Permission.can_read, Permission.can_update, Permission.can_delete) \
+                    .join(Service, Permission.service_id == Service.id) \
+                    .filter(Permission.role_id.in_(role_ids))
+                for row in rows:
+                    self._permissions[(row[0], row[1])] = dict(zip(OPERATIONS, row[2:]))
+        return self._permissions
+
+    def can(self, operation, service_name, event_id):
+        """Checks if one of the user's roles at an event allows `operation` on a service"""
+        for role_id in self.event_roles.get(_event_key(event_id), {}):
+            permission = self.permissions.get((role_id, service_name))
+            if permission and permission[operation]:
+                return True
+        return False
+
+    def _load_system_roles(self):
+        self._system_roles = []
+        self._panels = {}
+        if self.user_id is None:
+            return
+        self._system_roles = [role_id for role_id, in db.session.query(UserSystemRole.role_id)
+                              .filter(UserSystemRole.user_id == self.user_id).order_by(UserSystemRole.id)]
+        if self._system_roles:
+            rows = db.session.query(PanelPermission.role_id, PanelPermission.panel_name, PanelPermission.can_access) \
+                .filter(PanelPermission.role_id.in_(self._system_roles)).order_by(PanelPermission.id)
+            for role_id, panel_name, can_access in rows:
+                self._panels.setdefault(role_id, []).append((panel_name, can_access))
+
+    @property
+    def system_roles(self):
+        """Ids of the custom system roles of the user"""
+        if self._system_roles is None:
+            self._load_system_roles()
+        return self._system_roles
+
+    def panels(self, role_id):
+        """[(panel name, can access)] of a custom system role"""
+        if self._panels is None:
+            self._load_system_roles()
+        return self._panels.get(role_id, [])
+
+    def can_access_panel(self, panel_name):
+        for role_id in self.system_roles:
+            # the first permission of a role for the panel decides
+            for name, can_access in self.panels(role_id):
+                if name == panel_name:
+                    if can_access:
+                        return True
+                    break
+        return False
+
+    def first_access_panel(self):
+        """Returns the first panel opened by the first system role, False if none"""
+        if not self.system_roles:
+            return False
+        for panel_name, can_access in self.panels(self.system_roles[0]):
+            if can_access:
+                return panel_name
+        return False
+
+
+def get_resolver(user_id):
+    """Returns the resolver of a user for the current request"""
+    if not has_app_context():
+        return RoleResolver(user_id)
+    resolvers = g.setdefault('role_resolvers', {})
+    if user_id not in resolvers:
+        resolvers[user_id] = RoleResolver(user_id)
+    return resolvers[user_id]
+
+
+def forget_resolvers():
+    if has_app_context():
+        g.pop('role_resolvers', None)
+
+
+# SQLAlchemy hooks
+
+@sa_event.listens_for(SQLASession, 'after_flush')
+def _forget_flushed_roles(session, flush_context):
+    touched = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(item, ROLE_MODELS) for item in touched):
+        forget_resolvers()
+    if any(isinstance(item, Role) for item in touched):
+        invalidate_role_names()
+        session.info['invalidate_role_names'] = True
+
+
+@sa_event.listens_for(SQLASession, 'after_bulk_delete')
+def _forget_bulk_deleted_roles(delete_context):
+    forget_resolvers()
+
+
+@sa_event.listens_for(SQLASession, 'after_commit')
+def _invalidate_committed_roles(session):
+    # the snapshot may have been reloaded inside the transaction
+    if session.info.pop('invalidate_role_names', False):
+        invalidate_role_names()
+
+
+@sa_event.listens_for(SQLASession, 'after_rollback')
+def _forget_rolled_back_roles(session):
+    forget_resolvers()
+    if session.info.pop('invalidate_role_names', False):
+        invalidate_role_names()
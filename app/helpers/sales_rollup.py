@@ -0,0 +1,284 @@
+"""
+Materialised ticket sales of the platform.
+
+The super admin sales pages report on the orders of every event. Instead
+of walking the order history they read `SalesRollup` rows: the orders,
+tickets, sales and fees of an event on a day, per order status.
+
+The rows are kept up to date by the transactions changing orders: before
+the commit, the (event, day) buckets of the orders and order tickets
+flushed in the transaction are recomputed from the orders table.
+`SalesRollupManager.rebuild` (`python manage.py rebuild_sales_rollups`)
+recomputes everything, e.g. to backfill the table or after ticket prices or
+service fees were changed.
+"""
+from datetime import datetime, date, time, timedelta
+
+from sqlalchemy import func, and_, or_
+from sqlalchemy import event as sa_event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session as SQLASession
+from sqlalchemy.orm.attributes import get_history
+
+from app.helpers.fx_rates import get_rates
+from app.models import db
+from app.models.discount_code import DiscountCode
+from app.models.event import Event
+from app.models.fees import TicketFees
+from app.models.order import Order, OrderTicket
+from app.models.sales_rollup import SalesRollup
+from app.models.ticket import Ticket
+
+# statuses reported under another name
+STATUS_ALIASES = {
+    'initialized': 'pending',
+}
+
+
+def _as_date(value):
+    """`func.date` gives strings on SQLite and dates elsewhere"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date) or value is None:
+        return value
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def _paid_condition():
+    return and_(or_(Order.paid_via.is_(None), Order.paid_via != 'free'), Order.amount > 0)
+
+
+def _buckets_condition(buckets):
+    """SQL condition matching the orders of a set of (event_id, day)"""
+    conditions = []
+    for event_id, day in buckets:
+        start = datetime.combine(day, time())
+        conditions.append(and_(Order.event_id == event_id,
+                               Order.created_at >= start,
+                               Order.created_at < start + timedelta(days=1)))
+    return or_(*conditions)
+
+
+def _rollups_condition(buckets):
+    return or_(*[and_(SalesRollup.event_id == event_id, SalesRollup.day == day)
+                 for event_id, day in buckets])
+
+
+class SalesRollupManager(object):
+    """Maintains and reads the `SalesRollup` table"""
+
+    @staticmethod
+    def compute(condition, session=None):
+        """
+        Returns the rollup rows, as dicts, of the orders matching `condition`
+        """
+        session = session or db.session
+        day = func.date(Order.created_at)
+        paid = _paid_condition()
+        rows = {}
+
+        def row(event_id, order_day, status, currency=None):
+            key = (event_id, _as_date(order_day), status)
+            if key not in rows:
+                rows[key] = {
+                    'event_id': key[0],
+                    'day': key[1],
+                    'status': key[2],
+                    'currency': currency,
+                    'orders_count': 0,
+                    'tickets_count': 0,
+                    'total_sales': 0.0,
+                    'ticket_sales': 0.0,
+                    'fee_amount': 0.0,
+                }
+            return rows[key]
+
+        orders = session.query(Order.event_id, day, Order.status, Event.payment_currency,
+                               func.count(Order.id), func.sum(Order.amount)) \
+            .join(Event, Event.id == Order.event_id) \
+            .filter(Order.user_id.isnot(None)) \
+            .filter(Order.created_at.isnot(None)) \
+            .filter(condition) \
+            .group_by(Order.event_id, day, Order.status, Event.payment_currency)
+        currencies = {}
+        for event_id, order_day, status, currency, count, amount in orders:
+            currencies[event_id] = currency
+            item = row(event_id, order_day, status, currency)
+            item['orders_count'] += count
+            item['total_sales'] += amount or 0
+
+        lines = session.query(Order.event_id, day, Order.status, Order.discount_code_id, OrderTicket.ticket_id,
+                              Ticket.price, paid, func.sum(OrderTicket.quantity), func.count(OrderTicket.order_id)) \
+            .select_from(OrderTicket) \
+            .join(Order, Order.id == OrderTicket.order_id) \
+            .join(Ticket, Ticket.id == OrderTicket.ticket_id) \
+            .filter(Order.user_id.isnot(None)) \
+            .filter(Order.created_at.isnot(None)) \
+            .filter(condition) \
+            .group_by(Order.event_id, day, Order.status, Order.discount_code_id, OrderTicket.ticket_id,
+                      Ticket.price, paid) \
+            .all()
+
+        discount_ids = set(line[3] for line in lines if line[3] is not None)
+        discounts = {}
+        if discount_ids:
+            discounts = dict((discount.id, discount) for discount in
+                             session.query(DiscountCode).filter(DiscountCode.id.in_(discount_ids)))
+        # the latest fee settings of each currency
+        fee_rates = dict(session.query(TicketFees.currency, TicketFees.service_fee).order_by(TicketFees.id))
+
+        for event_id, order_day, status, discount_id, ticket_id, price, is_paid, quantity, line_count in lines:
+            item = row(event_id, order_day, status, currencies.get(event_id))
+            quantity = int(quantity or 0)
+            price = price or 0
+            item['tickets_count'] += quantity
+            if not is_paid:
+                continue
+            discount = discounts.get(discount_id)
+            if discount and discount.tickets and str(ticket_id) in discount.tickets.split(','):
+                if discount.type == 'amount':
+                    item['ticket_sales'] += quantity * (price - discount.value)
+                else:
+                    item['ticket_sales'] += quantity * (price - discount.value * price / 100.0)
+            else:
+                item['ticket_sales'] += quantity * price
+            if price > 0:
+                # charged once per order ticket line, like the monthly fee invoices
+                item['fee_amount'] += line_count * price * (fee_rates.get(item['currency']) or 0) / 100.0
+
+        return rows.values()
+
+    @staticmethod
+    def _replace(rollups_condition, orders_condition, session):
+        table = SalesRollup.__table__
+        session.execute(table.delete().where(rollups_condition))
+        rows = SalesRollupManager.compute(orders_condition, session=session)
+        if rows:
+            session.execute(table.insert(), rows)
+
+    @staticmethod
+    def refresh(buckets, session=None):
+        """
+        Recomputes the rollups of a set of (event_id, day) in the current
+        transaction.
+        """
+        session = session or db.session
+        buckets = set((event_id, day) for event_id, day in buckets if event_id is not None and day is not None)
+        if not buckets:
+            return
+        for attempt in range(2):
+            try:
+                with session.begin_nested():
+                    SalesRollupManager._replace(_rollups_condition(buckets), _buckets_condition(buckets), session)
+                return
+            except IntegrityError:
+                # a concurrent transaction inserted the same bucket and
+                # committed first, recompute on top of its rows
+                if attempt:
+                    raise
+
+    @staticmethod
+    def rebuild(event_id=None):
+        """
+        Recomputes the rollups of an event, or of every event
+        """
+        if event_id is None:
+            SalesRollupManager._replace(SalesRollup.id.isnot(None), Order.id.isnot(None), db.session)
+        else:
+            SalesRollupManager._replace(SalesRollup.event_id == event_id, Order.event_id == event_id, db.session)
+        db.session.commit()
+
+    @staticmethod
+    def get_sales(from_date=None, to_date=None, status=None, event_ids=None):
+        """
+        Returns the rollups summed up per event and status, as rows of
+        (event_id, status, currency, orders_count, tickets_count,
+        total_sales, ticket_sales, fee_amount). Statuses are reported under
+        their `STATUS_ALIASES` name when summed with `status` None.
+        """
+        query = db.session.query(SalesRollup.event_id, SalesRollup.status, SalesRollup.currency,
+                                 func.sum(SalesRollup.orders_count), func.sum(SalesRollup.tickets_count),
+                                 func.sum(SalesRollup.total_sales), func.sum(SalesRollup.ticket_sales),
+                                 func.sum(SalesRollup.fee_amount))
+        if from_date:
+            query = query.filter(SalesRollup.day >= _as_date(from_date))
+        if to_date:
+            query = query.filter(SalesRollup.day <= _as_date(to_date))
+        if status:
+            query = query.filter(SalesRollup.status == status)
+        if event_ids is not None:
+            if not event_ids:
+                return []
+            query = query.filter(SalesRollup.event_id.in_(event_ids))
+        sales = {}
+        for event_id, row_status, currency, orders_count, tickets_count, total_sales, ticket_sales, fee_amount \
+                in query.group_by(SalesRollup.event_id, SalesRollup.status, SalesRollup.currency):
+            key = (event_id, STATUS_ALIASES.get(row_status, row_status), currency)
+            totals = sales.setdefault(key, [0, 0, 0.0, 0.0, 0.0])
+            for index, value in enumerate((orders_count, tickets_count, total_sales, ticket_sales, fee_amount)):
+                totals[index] += value or 0
+        return [key + tuple(totals) for key, totals in sales.items()]
+
+    @staticmethod
+    def in_currency(sales, to_currency):
+        """
+        Returns the `get_sales` rows with their total_sales, ticket_sales
+        and fee_amount converted to `to_currency`, in one batch
+        """
+        amounts = get_rates().convert_all(to_currency, [(row[2], amount) for row in sales for amount in row[5:]])
+        return [row[:2] + (to_currency,) + row[3:5] + tuple(amounts[index * 3:index * 3 + 3])
+                for index, row in enumerate(sales)]
+
+
+# SQLAlchemy hooks
+
+def _order_buckets(order):
+    """The current and, if it was moved, previous bucket of an order"""
+    buckets = set()
+    current = (order.event_id, _as_date(order.created_at))
+    buckets.add(current)
+    event_history = get_history(order, 'event_id')
+    created_history = get_history(order, 'created_at')
+    previous = ((event_history.deleted or [current[0]])[0],
+                _as_date((created_history.deleted or [order.created_at])[0]))
+    buckets.add(previous)
+    return buckets
+
+
+@sa_event.listens_for(SQLASession, 'after_flush')
+def _collect_buckets(session, flush_context):
+    """Remembers the orders flushed, their buckets are refreshed before commit"""
+    buckets = session.info.setdefault('sales_rollup_buckets', set())
+    order_ids = session.info.setdefault('sales_rollup_orders', set())
+    for item in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(item, Order):
+            if item in session.dirty and not session.is_modified(item):
+                continue
+            buckets.update(_order_buckets(item))
+        elif isinstance(item, OrderTicket):
+            order_ids.add(item.order_id)
+
+
+@sa_event.listens_for(SQLASession, 'before_commit')
+def _refresh_before_commit(session):
+    if not session.info.get('sales_rollup_buckets') and not session.info.get('sales_rollup_orders'):
+        return
+    session.flush()
+    buckets = session.info.pop('sales_rollup_buckets', set())
+    order_ids = session.info.pop('sales_rollup_orders', set())
+    order_ids.discard(None)
+    if order_ids:
+        for event_id, created_at in session.query(Order.event_id, Order.created_at) \
+                .filter(Order.id.in_(order_ids)):
+            buckets.add((event_id, _as_date(created_at)))
+    # a failed refresh fails the commit, the rollups never drift from the orders
+    SalesRollupManager.refresh(buckets, session=session)
+
+
+@sa_event.listens_for(SQLASession, 'after_soft_rollback')
+def _discard_buckets(session, previous_transaction):
+    # the savepoint of `refresh` is retried within the same transaction
+    if previous_transaction.parent is not None:
+        return
+    session.info.pop('sales_rollup_buckets', None)
+    session.info.pop('sales_rollup_orders', None)
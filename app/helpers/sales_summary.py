@@ -0,0 +1,160 @@
+"""
+Ticket sales summaries of an event, aggregated in SQL.
+
+The organizer dashboards show, per order status, how many orders and
+tickets were sold and for how much, and the same per ticket. Everything is
+computed with a fixed number of GROUP BY queries, whatever the number of
+orders of the event.
+"""
+from sqlalchemy import func, and_, or_, case, literal
+
+from app.helpers.data_getter import DataGetter
+from app.models import db
+from app.models.discount_code import DiscountCode, TICKET
+from app.models.order import Order, OrderTicket
+from app.models.ticket import Ticket
+
+ORDER_STATUS_CLASSES = (
+    ('completed', 'success'),
+    ('placed', 'info'),
+    ('pending', 'warning'),
+    ('expired', 'danger'),
+    ('deleted', 'primary'),
+    ('cancelled', 'default'),
+)
+
+# statuses shown under another name on the dashboards
+STATUS_ALIASES = {
+    'initialized': 'pending',
+}
+
+
+def _status(status):
+    return STATUS_ALIASES.get(status, status)
+
+
+class SalesSummary(object):
+    """Order and ticket sales summaries of an event"""
+
+    @staticmethod
+    def empty_orders_summary():
+        orders_summary = {}
+        for status, css_class in ORDER_STATUS_CLASSES:
+            orders_summary[status] = {
+                'class': css_class,
+                'tickets_count': 0,
+                'orders_count': 0,
+                'total_sales': 0
+            }
+        return orders_summary
+
+    @staticmethod
+    def empty_tickets_summary(tickets):
+        tickets_summary = {}
+        for ticket in tickets:
+            tickets_summary[str(ticket.id)] = {
+                'name': ticket.name,
+                'quantity': ticket.quantity,
+            }
+            for status, _ in ORDER_STATUS_CLASSES:
+                tickets_summary[str(ticket.id)][status] = {
+                    'tickets_count': 0,
+                    'sales': 0
+                }
+        return tickets_summary
+
+    @staticmethod
+    def _line_total(fees):
+        """
+        SQL expression of the price of an order ticket line with the service
+        fee the buyer paid, capped per line at the maximum fee.
+        """
+        line_price = func.coalesce(Ticket.price, 0) * OrderTicket.quantity
+        if not fees or not fees.service_fee:
+            return line_price
+        line_fee = literal(fees.service_fee) * line_price / 100.0
+        if fees.maximum_fee is not None:
+            line_fee = case([(line_fee > fees.maximum_fee, literal(fees.maximum_fee))], else_=line_fee)
+        return line_price + case([(Ticket.absorb_fees == True, literal(0.0))], else_=line_fee)
+
+    @staticmethod
+    def get_orders_totals(event_id):
+        """
+        Returns {status: (orders count, sum of amounts)} of the orders placed
+        by a buyer
+        """
+        rows = db.session.query(Order.status, func.count(Order.id), func.sum(Order.amount)) \
+            .filter(Order.event_id == event_id) \
+            .filter(Order.user_id.isnot(None)) \
+            .group_by(Order.status)
+        return dict((status, (count, amount or 0)) for status, count, amount in rows)
+
+    @staticmethod
+    def get_ticket_lines(event_id, fees):
+        """
+        Returns the order tickets of an event grouped by ticket, order status,
+        discount code and whether the order was paid for, as tuples
+        (ticket_id, status, discount_code_id, paid, quantity, total with fees)
+        """
+        paid = and_(or_(Order.paid_via.is_(None), Order.paid_via != 'free'), Order.amount > 0)
+        return db.session.query(OrderTicket.ticket_id, Order.status, Order.discount_code_id, paid,
+                                func.sum(OrderTicket.quantity),
+                                func.sum(SalesSummary._line_total(fees))) \
+            .join(Order, Order.id == OrderTicket.order_id) \
+            .join(Ticket, Ticket.id == OrderTicket.ticket_id) \
+            .filter(Order.event_id == event_id) \
+            .filter(Order.user_id.isnot(None)) \
+            .group_by(OrderTicket.ticket_id, Order.status, Order.discount_code_id, paid) \
+            .all()
+
+    @staticmethod
+    def _discounted(total, quantity, discount):
+        if discount.type == 'amount':
+            return total - quantity * discount.value
+        return total - discount.value * total / 100.0
+
+    @staticmethod
+    def get_summaries(event):
+        """
+        Returns (orders_summary, tickets_summary) of an event. Sales of a
+        ticket include the service fee unless the organizer absorbs it and
+        subtract the discount of the order when it applies to the ticket.
+        """
+        orders_summary = SalesSummary.empty_orders_summary()
+        tickets_summary = SalesSummary.empty_tickets_summary(event.tickets)
+
+        for status, (count, amount) in SalesSummary.get_orders_totals(event.id).items():
+            status = _status(status)
+            if status in orders_summary:
+                orders_summary[status]['orders_count'] += count
+                orders_summary[status]['total_sales'] += amount
+
+        fees = DataGetter.get_fee_settings_by_currency(event.payment_currency)
+        lines = SalesSummary.get_ticket_lines(event.id, fees)
+        discount_ids = set(line[2] for line in lines if line[2] is not None)
+        discounts = {}
+        if discount_ids:
+            discounts = dict((discount.id, discount) for discount in DiscountCode.query
+                             .filter(DiscountCode.id.in_(discount_ids))
+                             .filter_by(event_id=event.id)
+                             .filter_by(used_for=TICKET))
+
+        for ticket_id, status, discount_id, paid, quantity, total in lines:
+            status = _status(status)
+            quantity = int(quantity or 0)
+            if status not in orders_summary:
+                continue
+            orders_summary[status]['tickets_count'] += quantity
+            ticket_summary = tickets_summary.get(str(ticket_id))
+            if ticket_summary is None:
+                continue
+            ticket_summary[status]['tickets_count'] += quantity
+            if not paid:
+                continue
+            total = total or 0
+            discount = discounts.get(discount_id)
+            if discount and discount.tickets and str(ticket_id) in discount.tickets.split(','):
+                total = SalesSummary._discounted(total, quantity, discount)
+            ticket_summary[status]['sales'] += total
+
+        return orders_summary, tickets_summary
@@ -1,53 +1,87 @@
 from datetime import datetime, timedelta
+import logging
 import shutil
 
-from dateutil.relativedelta import relativedelta
 from flask import url_for
+from sqlalchemy import and_, or_
 from sqlalchemy_continuum import transaction_class
 
-from app.helpers.data import DataManager, delete_from_db, save_to_db
+from app.helpers.data import DataManager, save_to_db
 from app.helpers.data_getter import DataGetter
+from app.helpers.fx_rates import refresh_rates
+from app.helpers.invoicing import InvoicingManager
+from app.helpers.job_runner import register_job, id_chunks, get_watermark, save_watermark, JOB_CHUNK_SIZE
 from app.helpers.helpers import send_after_event, monthdelta, send_followup_email_for_monthly_fee_payment
 from app.helpers.helpers import send_email_for_expired_orders, send_email_for_monthly_fee_payment
-from app.helpers.payment import get_fee
-from app.helpers.ticketing import TicketingManager
+from app.helpers.last_access import flush_last_access
+from app.helpers.log_writer import flush_logs
+from app.helpers.sales_rollup import SalesRollupManager
+from app.models import db
 from app.models.event import Event
 from app.models.event_invoice import EventInvoice
 from app.models.order import Order
+from app.models.role import Role
 from app.models.session import Session
 from app.models.user import User
+from app.models.users_events_roles import UsersEventsRoles
 
 from app.helpers.storage import UPLOAD_PATHS, generate_hash
 from app.settings import get_settings
 
+# trashed events, users and sessions are deleted for good after
+TRASH_RETENTION = timedelta(days=30)
+# pending orders expire after
+PENDING_ORDER_RETENTION = timedelta(days=3)
+
+
+def _delete_chunk(model, ids, before=None):
+    """Deletes rows through the ORM, the versions of the chunk are recorded in one commit"""
+    try:
+        if before:
+            before(ids)
+        for item in model.query.filter(model.id.in_(ids)):
+            db.session.delete(item)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        logging.exception('Could not delete %s %s' % (model.__tablename__, ids))
+
+
+def _delete_user_transactions(user_ids):
+    transaction = transaction_class(Event)
+    transaction.query.filter(transaction.user_id.in_(user_ids)).delete(synchronize_session=False)
+
+
+def expire_pending_orders(cutoff):
+    """Expires the orders pending since before `cutoff`, a chunk per UPDATE"""
+    query = db.session.query(Order.id).filter(Order.status == 'pending').filter(Order.created_at <= cutoff)
+    for ids in id_chunks(query, Order.id):
+        buckets = set((event_id, created_at.date()) for event_id, created_at in
+                      db.session.query(Order.event_id, Order.created_at).filter(Order.id.in_(ids))
+                      if created_at is not None)
+        Order.query.filter(Order.id.in_(ids)).filter(Order.status == 'pending') \
+            .update({'status': 'expired'}, synchronize_session=False)
+        # bulk updates skip the session hooks of the sales rollups
+        SalesRollupManager.refresh(buckets)
+        db.session.commit()
+
 
 def empty_trash():
     from app import current_app as app
 
     with app.app_context():
-        events = Event.query.filter(Event.deleted_at.isnot(None)).all()
-        users = User.query.filter(User.deleted_at.isnot(None)).all()
-        sessions = Session.query.filter(Session.deleted_at.isnot(None)).all()
-        pending_orders = Order.query.filter_by(status="pending")
-
-        for event in events:
-            if datetime.now() - event.deleted_at >= timedelta(days=30):
-                DataManager.delete_event(event.id)
+        cutoff = datetime.now() - TRASH_RETENTION
+        for ids in id_chunks(db.session.query(Event.id).filter(Event.deleted_at <= cutoff), Event.id):
+            for event_id in ids:
+                DataManager.delete_event(event_id)
 
-        for user in users:
-            if datetime.now() - user.deleted_at >= timedelta(days=30):
-                transaction = transaction_class(Event)
-                transaction.query.filter_by(user_id=user.id).delete()
-                delete_from_db(user, "User deleted permanently")
+        for ids in id_chunks(db.session.query(User.id).filter(User.deleted_at <= cutoff), User.id):
+            _delete_chunk(User, ids, before=_delete_user_transactions)
 
-        for session_ in sessions:
-            if datetime.now() - session_.deleted_at >= timedelta(days=30):
-                delete_from_db(session_, "Session deleted permanently")
+        for ids in id_chunks(db.session.query(Session.id).filter(Session.deleted_at <= cutoff), Session.id):
+            _delete_chunk(Session, ids)
 
-        for pending_order in pending_orders:
-            if datetime.now() - pending_order.created_at >= timedelta(days=3):
-                pending_order.status = "expired"
-                save_to_db(pending_order, "Pending order expired.")
+        expire_pending_orders(datetime.utcnow() - PENDING_ORDER_RETENTION)
 
 
 def empty_csv_export():
@@ -64,22 +98,37 @@ def empty_csv_export():
 
 
 def send_after_event_mail():
+    """
+    Mails the organizers and speakers of the events that ended since the
+    previous run, walking the events by (end_time, id) from the watermark
+    """
     from app import current_app as app
     with app.app_context():
-        events = Event.query.all()
-        for event in events:
-            upcoming_events = DataGetter.get_upcoming_events()
-            organizers = DataGetter.get_user_event_roles_by_role_name(
-                event.id, 'organizer')
-            speakers = DataGetter.get_user_event_roles_by_role_name(event.id,
-                                                                    'speaker')
-            if datetime.now() > event.end_time:
-                for speaker in speakers:
-                    send_after_event(speaker.user.email, event.id,
-                                     upcoming_events)
-                for organizer in organizers:
-                    send_after_event(organizer.user.email, event.id,
-                                     upcoming_events)
+        now = datetime.now()
+        watermark, last_id = get_watermark('send_after_event_mail')
+        if watermark is None:
+            # the first run only covers the events that ended in the last day
+            watermark, last_id = now - timedelta(days=1), 0
+        upcoming_events = Event.query.filter(Event.start_time >= now, Event.deleted_at.is_(None)).all()
+        while True:
+            events = db.session.query(Event.id, Event.name, Event.end_time) \
+                .filter(Event.deleted_at.is_(None)) \
+                .filter(Event.end_time <= now) \
+                .filter(or_(Event.end_time > watermark, and_(Event.end_time == watermark, Event.id > last_id))) \
+                .order_by(Event.end_time, Event.id).limit(JOB_CHUNK_SIZE).all()
+            if not events:
+                break
+            names = dict((event_id, name) for event_id, name, _ in events)
+            recipients = db.session.query(UsersEventsRoles.event_id, User.email).distinct() \
+                .join(User, UsersEventsRoles.user_id == User.id) \
+                .join(Role, UsersEventsRoles.role_id == Role.id) \
+                .filter(UsersEventsRoles.event_id.in_(names.keys())) \
+                .filter(Role.name.in_(['organizer', 'speaker'])) \
+                .order_by(UsersEventsRoles.event_id, User.email)
+            for event_id, email in recipients:
+                send_after_event(email, names[event_id], upcoming_events)
+            _, last_id, watermark = events[-1]
+            save_watermark('send_after_event_mail', watermark, last_id)
 
 
 def send_mail_to_expired_orders():
@@ -96,52 +145,20 @@ def send_mail_to_expired_orders():
 
 
 def send_event_fee_notification():
+    """Invoices the service fees of the previous month and mails the invoices"""
     from app import current_app as app
     with app.app_context():
-        events = Event.query.all()
-        for event in events:
-            latest_invoice = EventInvoice.filter_by(event_id=event.id).order_by(
-                EventInvoice.created_at.desc()).first()
-
-            if latest_invoice:
-                orders = Order.query \
-                    .filter_by(event_id=event.id) \
-                    .filter_by(status='completed') \
-                    .filter(Order.completed_at > latest_invoice.created_at).all()
-            else:
-                orders = Order.query.filter_by(
-                    event_id=event.id).filter_by(status='completed').all()
-
-            fee_total = 0
-            for order in orders:
-                for order_ticket in order.tickets:
-                    ticket = TicketingManager.get_ticket(order_ticket.ticket_id)
-                    if order.paid_via != 'free' and order.amount > 0 and ticket.price > 0:
-                        fee = ticket.price * (get_fee(order.event.payment_currency) / 100.0)
-                        fee_total += fee
-
-            if fee_total > 0:
-                organizer = DataGetter.get_user_event_roles_by_role_name(
-                    event.id, 'organizer').first()
-                new_invoice = EventInvoice(
-                    amount=fee_total, event_id=event.id, user_id=organizer.user.id)
-
-                if event.discount_code_id and event.discount_code:
-                    r = relativedelta(datetime.utcnow(), event.created_at)
-                    if r <= event.discount_code.max_quantity:
-                        new_invoice.amount = fee_total - \
-                            (fee_total * (event.discount_code.value / 100.0))
-                        new_invoice.discount_code_id = event.discount_code_id
-
-                save_to_db(new_invoice)
-                prev_month = monthdelta(new_invoice.created_at, 1).strftime(
-                    "%b %Y")  # Displayed as Aug 2016
-                send_email_for_monthly_fee_payment(new_invoice.user.email,
-                                                   event.name,
-                                                   prev_month,
-                                                   new_invoice.amount,
-                                                   url_for('event_invoicing.view_invoice',
-                                                           invoice_identifier=new_invoice.identifier, _external=True))
+        period_end = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        prev_month = monthdelta(period_end, -1).strftime("%b %Y")  # Displayed as Aug 2016
+        for invoice in InvoicingManager.create_monthly_invoices(period_end):
+            if not invoice.user:
+                continue
+            send_email_for_monthly_fee_payment(invoice.user.email,
+                                               invoice.event.name,
+                                               prev_month,
+                                               invoice.amount,
+                                               url_for('event_invoicing.view_invoice',
+                                                       invoice_identifier=invoice.identifier, _external=True))
 
 
 def send_event_fee_notification_followup():
@@ -159,3 +176,38 @@ def send_event_fee_notification_followup():
                                                             url_for('event_invoicing.view_invoice',
                                                                     invoice_identifier=incomplete_invoice.identifier,
                                                                     _external=True))
+
+
+def refresh_fx_rates():
+    from app import current_app as app
+    with app.app_context():
+        try:
+            refresh_rates()
+        except Exception:
+            # conversions keep using the last rates stored
+            logging.exception('Could not refresh the FX rates')
+
+
+def write_last_access():
+    from app import current_app as app
+    with app.app_context():
+        flush_last_access()
+
+
+def write_logs():
+    from app import current_app as app
+    with app.app_context():
+        flush_logs()
+
+
+# jobs run once per schedule across the fleet, see app.helpers.job_runner
+register_job('send_mail_to_expired_orders', send_mail_to_expired_orders, interval=timedelta(hours=5))
+register_job('empty_trash', empty_trash, cron={'hour': 5, 'minute': 30}, period=timedelta(days=1))
+register_job('empty_csv_export', empty_csv_export, cron={'hour': 5, 'minute': 30}, period=timedelta(days=1))
+register_job('send_after_event_mail', send_after_event_mail, cron={'hour': 5, 'minute': 30},
+             period=timedelta(days=1))
+register_job('send_event_fee_notification', send_event_fee_notification,
+             cron={'day': 1, 'hour': 0, 'minute': 0}, period=timedelta(days=28))
+register_job('send_event_fee_notification_followup', send_event_fee_notification_followup,
+             cron={'day': 15, 'hour': 0, 'minute': 0}, period=timedelta(days=28))
+register_job('refresh_fx_rates', refresh_fx_rates, cron={'hour': 0, 'minute': 30}, period=timedelta(days=1))
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, and_, or_
+
+from app.models import db
+from app.models.order import Order, OrderTicket
+from app.models.ticket import Ticket
+
+# minutes a pending order holds its tickets
+ORDER_EXPIRY = 10
+
+# orders whose tickets are sold for good
+SOLD_STATUSES = ('completed', 'placed')
+# orders holding tickets until they expire
+RESERVED_STATUSES = ('pending', 'initialized')
+
+
+class TicketsSoldOut(Exception):
+    """Raised when an order asks for more tickets than are available"""
+
+    def __init__(self, ticket, available):
+        Exception.__init__(self, 'Only %d %s ticket(s) left' % (available, ticket.name))
+        self.ticket = ticket
+        self.available = available
+
+
+class TicketInventory(object):
+    """Sold, reserved and available quantities of tickets, computed in SQL"""
+
+    @staticmethod
+    def get_reservation_cutoff():
+        """Pending orders created before this time no longer hold tickets"""
+        return datetime.utcnow() - timedelta(minutes=ORDER_EXPIRY)
+
+    @staticmethod
+    def _sum_query(ticket_ids, condition):
+        if not ticket_ids:
+            return {}
+        rows = db.session.query(OrderTicket.ticket_id, func.sum(OrderTicket.quantity)) \
+            .join(Order, Order.id == OrderTicket.order_id) \
+            .filter(OrderTicket.ticket_id.in_(ticket_ids)) \
+            .filter(condition) \
+            .group_by(OrderTicket.ticket_id)
+        return dict((ticket_id, int(quantity or 0)) for ticket_id, quantity in rows)
+
+    @staticmethod
+    def get_sold_counts(ticket_ids):
+        """Returns {ticket_id: quantity sold} of completed and placed orders"""
+        return TicketInventory._sum_query(ticket_ids, Order.status.in_(SOLD_STATUSES))
+
+    @staticmethod
+    def get_inventory(tickets):
+        """
+        Returns {ticket_id: {'ticket', 'total', 'sold', 'reserved', 'available'}}
+        for a list of tickets. `reserved` counts the tickets held by orders
+        that are still being paid for. Uses a single query whatever the
+        number of orders.
+        """
+        ticket_ids = [ticket.id for ticket in tickets]
+        cutoff = TicketInventory.get_reservation_cutoff()
+        sold = Order.status.in_(SOLD_STATUSES)
+        reserved = and_(Order.status.in_(RESERVED_STATUSES), Order.created_at >= cutoff)
+        rows = []
+        if ticket_ids:
+            rows = db.session.query(OrderTicket.ticket_id, sold, func.sum(OrderTicket.quantity)) \
+                .join(Order, Order.id == OrderTicket.order_id) \
+                .filter(OrderTicket.ticket_id.in_(ticket_ids)) \
+                .filter(or_(sold, reserved)) \
+                .group_by(OrderTicket.ticket_id, sold)
+        inventory = {}
+        for ticket in tickets:
+            inventory[ticket.id] = {
+                'ticket': ticket,
+                'total': ticket.quantity or 0,
+                'sold': 0,
+                'reserved': 0,
+            }
+        for ticket_id, is_sold, quantity in rows:
+            inventory[ticket_id]['sold' if is_sold else 'reserved'] += int(quantity or 0)
+        for item in inventory.values():
+            item['available'] = max(item['total'] - item['sold'] - item['reserved'], 0)
+        return inventory
+
+    @staticmethod
+    def get_event_inventory(event_id):
+        """`get_inventory` of every ticket of an event"""
+        return TicketInventory.get_inventory(Ticket.query.filter_by(event_id=event_id).all())
+
+    @staticmethod
+    def reserve(quantities):
+        """
+        Locks the rows of the tickets asked for ({ticket_id: quantity}) with
+        SELECT ... FOR UPDATE and checks they are available. The order must
+        be inserted in the same transaction: concurrent checkouts of these
+        tickets wait until it is committed, then see it as reserved.
+        Raises TicketsSoldOut, returns {ticket_id: ticket} otherwise.
+        """
+        if not quantities:
+            return {}
+        # always lock in the same order so that checkouts can't deadlock
+        tickets = Ticket.query.filter(Ticket.id.in_(quantities.keys())) \
+            .order_by(Ticket.id).with_for_update().all()
+        inventory = TicketInventory.get_inventory(tickets)
+        for ticket in tickets:
+            if quantities[ticket.id] > inventory[ticket.id]['available']:
+                raise TicketsSoldOut(ticket, inventory[ticket.id]['available'])
+        return dict((ticket.id, ticket) for ticket in tickets)
@@ -14,6 +14,7 @@ from app.helpers.helpers import string_empty, send_email_for_after_purchase, get
     send_notif_for_after_purchase, send_email_after_cancel_ticket, get_or_default_string, \
     get_or_default_int
 from app.helpers.notification_email_triggers import trigger_after_purchase_notifications
+from app.helpers.ticket_inventory import TicketInventory, TicketsSoldOut, ORDER_EXPIRY
 from app.helpers.payment import StripePaymentsManager, represents_int, PayPalPaymentsManager
 from app.models import db
 from app.models.access_code import AccessCode
@@ -23,6 +24,11 @@ from app.models.order import Order
 from app.models.order import OrderTicket
 from app.models.ticket import Ticket
 from app.models.ticket_holder import TicketHolder
+from app.models.user import User
+from app.models.user_detail import UserDetail
+
+# rows fetched at a time by the streaming exports
+EXPORT_BATCH_SIZE = 1000
 
 
 class TicketingManager(object):
@@ -85,24 +91,37 @@ class TicketingManager(object):
         return orders.all()
 
     @staticmethod
-    def get_attendee_export_info(event_id):
-        event = DataGetter.get_event(event_id)
-        orders = TicketingManager.get_orders(event_id)
-        holders = []
-        ticket_names = []
-        for ticket in event.tickets:
-            ticket_names.append(ticket.name)
-        for order in orders:
-            for holder in order.ticket_holders:
-                discount = TicketingManager.get_discount_code(event_id, order.discount_code_id)
-                order_holder = {
-                    'order_invoice': order.get_invoice_number(),
-                    'paid_via': order.paid_via,
-                    'status': order.status,
-                    'completed_at': order.completed_at,
-                    'created_at': order.created_at,
-                    'ticket_name': holder.ticket.name,
-                    'ticket_type': holder.ticket.type,
+    def iter_attendee_export_info(event_id, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Yields a dict per ticket holder of the orders of an event, and one
+        per order without holders. Rows are fetched `batch_size` at a time
+        from a server side cursor, so memory use does not grow with the
+        number of attendees.
+        """
+        discounts = dict((discount.id, discount) for discount in
+                         DiscountCode.query.filter_by(event_id=event_id).filter_by(used_for=TICKET))
+        rows = db.session.query(Order, TicketHolder, Ticket, User, UserDetail) \
+            .join(User, User.id == Order.user_id) \
+            .outerjoin(UserDetail, UserDetail.user_id == User.id) \
+            .outerjoin(TicketHolder, TicketHolder.order_id == Order.id) \
+            .outerjoin(Ticket, Ticket.id == TicketHolder.ticket_id) \
+            .filter(Order.event_id == event_id) \
+            .order_by(desc(Order.id), TicketHolder.id) \
+            .yield_per(batch_size)
+        for order, holder, ticket, user, user_detail in rows:
+            order_holder = {
+                'order_invoice': order.get_invoice_number(),
+                'paid_via': order.paid_via,
+                'status': order.status,
+                'completed_at': order.completed_at,
+                'created_at': order.created_at,
+                'by_whom': user_detail.fullname if user_detail and user_detail.fullname else user.email
+            }
+            if holder is not None:
+                discount = discounts.get(order.discount_code_id)
+                order_holder.update({
+                    'ticket_name': ticket.name,
+                    'ticket_type': ticket.type,
                     'firstname': holder.firstname,
                     'lastname': holder.lastname,
                     'email': holder.email,
@@ -114,36 +133,17 @@ class TicketingManager(object):
                     'recruitment': holder.recruitment,
                     'unesco_hackathon': holder.unesco_hackathon,
                     'country': holder.country,
-                    'ticket_price': holder.ticket.price,
-                    'discount': discount
-                }
-
-                order_holder['by_whom'] = order.user.user_detail.fullname \
-                    if order.user.user_detail and order.user.user_detail.fullname else order.user.email
-                if discount and str(holder.ticket.id) in discount.tickets.split(","):
+                    'ticket_price': ticket.price,
+                    'discount': discount,
+                    'checked_in': holder.checked_in,
+                    'id': holder.id
+                })
+                if discount and discount.tickets and str(ticket.id) in discount.tickets.split(","):
                     if discount.type == "amount":
                         order_holder['ticket_price'] = order_holder['ticket_price'] - discount.value
                     else:
                         order_holder['ticket_price'] -= order_holder['ticket_price'] * discount.value / 100.0
-                order_holder['checked_in'] = holder.checked_in
-                order_holder['id'] = holder.id
-                holders.append(order_holder)
-            if len(order.ticket_holders) == 0:
-
-                order_holder = {
-                    'order_invoice': order.get_invoice_number(),
-                    'paid_via': order.paid_via,
-                    'status': order.status,
-                    'completed_at': order.completed_at,
-                    'created_at': order.created_at
-                }
-
-                order_holder['by_whom'] = order.user.user_detail.fullname \
-                    if order.user.user_detail and order.user.user_detail.fullname else order.user.email
-
-                holders.append(order_holder)
-
-        return (event, event_id, holders, orders, ticket_names)
+            yield order_holder
 
     @staticmethod
     def get_orders_count(event_id, status='completed'):
@@ -158,17 +158,13 @@ class TicketingManager(object):
     @staticmethod
     def get_ticket_stats(event):
         tickets_summary = {}
+        sold = TicketInventory.get_sold_counts([ticket.id for ticket in event.tickets])
         for ticket in event.tickets:
             tickets_summary[str(ticket.id)] = {
                 'name': ticket.name,
                 'total': ticket.quantity,
-                'completed': 0
+                'completed': sold.get(ticket.id, 0)
             }
-        orders = Order.query.filter_by(event_id=event.id).filter(
-            or_(Order.status == 'completed', Order.status == 'placed')).all()
-        for order in orders:
-            for order_ticket in order.tickets:
-                tickets_summary[str(order_ticket.ticket_id)]['completed'] += order_ticket.quantity
         return tickets_summary
 
     @staticmethod
@@ -220,7 +216,7 @@ class TicketingManager(object):
 
     @staticmethod
     def get_order_expiry():
-        return 10
+        return ORDER_EXPIRY
 
     @staticmethod
     def get_new_order_identifier():
@@ -303,6 +299,20 @@ class TicketingManager(object):
 
         ticket_ids = form.getlist('ticket_ids[]')
         ticket_quantity = form.getlist('ticket_quantities[]')
+
+        # hold the tickets until the order expires, the lock is released by the commit below
+        requested = {}
+        for index, id in enumerate(ticket_ids):
+            if not string_empty(id) and int(ticket_quantity[index]) > 0:
+                requested[int(id)] = requested.get(int(id), 0) + int(ticket_quantity[index])
+        try:
+            tickets = TicketInventory.reserve(requested)
+        except TicketsSoldOut as e:
+            db.session.rollback()
+            flash('Only %d %s ticket(s) are left. Please change the quantity and try again.'
+                  % (e.available, e.ticket.name), 'danger')
+            return None
+
         ticket_discount = form.get('promo_code', '')
         discount = None
         if ticket_discount:
@@ -330,7 +340,7 @@ class TicketingManager(object):
             if not string_empty(id) and int(ticket_quantity[index]) > 0:
                 with db.session.no_autoflush:
                     order_ticket = OrderTicket()
-                    order_ticket.ticket = TicketingManager.get_ticket(id)
+                    order_ticket.ticket = tickets[int(id)]
                     order_ticket.quantity = int(ticket_quantity[index])
                     order.tickets.append(order_ticket)
 
@@ -84,3 +84,6 @@ class DiscountCode(db.Model):
                 'valid_till': self.valid_till,
                 'event_id': self.event_id,
                 'is_active': self.is_active}
+
+
+db.Index('ix_discount_codes_event_code_used_for', DiscountCode.event_id, DiscountCode.code, DiscountCode.used_for)
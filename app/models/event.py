@@ -286,6 +286,11 @@ class Event(db.Model):
         }
 
 
+db.Index('ix_events_identifier', Event.identifier)
+# the events that ended, walked by the after event mails
+db.Index('ix_events_end_time_id', Event.end_time, Event.id, postgresql_where=Event.deleted_at.is_(None))
+
+
 # LISTENERS
 
 @event.listens_for(Event, 'after_insert')
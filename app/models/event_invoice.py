@@ -20,6 +20,7 @@ class EventInvoice(db.Model):
     Stripe authorization information for an event.
     """
     __tablename__ = 'event_invoices'
+    __table_args__ = (db.UniqueConstraint('event_id', 'billed_until', name='event_invoice_billed_until_uc'),)
 
     id = db.Column(db.Integer, primary_key=True)
     identifier = db.Column(db.String, unique=True)
@@ -34,6 +35,8 @@ class EventInvoice(db.Model):
     event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='SET NULL'))
 
     created_at = db.Column(db.DateTime)
+    # end of the billing period, the orders completed before it are invoiced
+    billed_until = db.Column(db.DateTime, nullable=True, default=None)
     completed_at = db.Column(db.DateTime, nullable=True, default=None)
     transaction_id = db.Column(db.String)
     paid_via = db.Column(db.String)
@@ -0,0 +1,35 @@
+from datetime import datetime
+
+from app.models import db
+
+
+class FxRate(db.Model):
+    """
+    Exchange rate of a currency on a day: one `base` currency unit is worth
+    `rate` units of `currency`. Refreshed daily by `app.helpers.fx_rates`.
+    """
+    __tablename__ = 'fx_rates'
+    __table_args__ = (db.UniqueConstraint('day', 'base', 'currency', name='fx_rate_day_uc'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, index=True)
+    base = db.Column(db.String)
+    currency = db.Column(db.String)
+    rate = db.Column(db.Float)
+    fetched_at = db.Column(db.DateTime)
+
+    def __init__(self, day=None, base=None, currency=None, rate=None):
+        self.day = day
+        self.base = base
+        self.currency = currency
+        self.rate = rate
+        self.fetched_at = datetime.utcnow()
+
+    def __repr__(self):
+        return '<FxRate %r %r/%r>' % (self.day, self.base, self.currency)
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return '%s %s/%s' % (self.day, self.base, self.currency)
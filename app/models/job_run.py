@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from app.models import db
+
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+
+class JobRun(db.Model):
+    """
+    One run of a scheduled job, written by `app.helpers.job_runner`.
+    `trigger` is what started it: `scheduler`, `celery` or `cli`.
+    """
+    __tablename__ = 'job_runs'
+    __table_args__ = (db.Index('ix_job_runs_name_started_at', 'name', 'started_at'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String, nullable=False)
+    trigger = db.Column(db.String)
+    host = db.Column(db.String)
+    status = db.Column(db.String, nullable=False, default=JOB_RUNNING)
+    started_at = db.Column(db.DateTime, nullable=False)
+    finished_at = db.Column(db.DateTime)
+    error = db.Column(db.Text)
+
+    def __init__(self, name=None, trigger=None, host=None, status=JOB_RUNNING, started_at=None):
+        self.name = name
+        self.trigger = trigger
+        self.host = host
+        self.status = status
+        self.started_at = started_at or datetime.utcnow()
+
+    def __repr__(self):
+        return '<JobRun %r %r>' % (self.name, self.started_at)
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return '%s %s' % (self.name, self.started_at)
+
+
+class JobWatermark(db.Model):
+    """
+    How far an incremental job got: the rows up to (`watermark`, `last_id`)
+    in the order the job walks them are done.
+    """
+    __tablename__ = 'job_watermarks'
+
+    name = db.Column(db.String, primary_key=True)
+    watermark = db.Column(db.DateTime)
+    last_id = db.Column(db.Integer)
+    updated_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return '<JobWatermark %r %r>' % (self.name, self.watermark)
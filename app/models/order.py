@@ -121,3 +121,10 @@ class Order(db.Model):
             'exp_year': self.exp_year,
             'last4': self.last4
         }
+
+
+db.Index('ix_orders_event_status_created', Order.event_id, Order.status, Order.created_at)
+# the orders completed in a billing period, for the monthly fee invoices
+db.Index('ix_orders_status_completed', Order.status, Order.completed_at)
+# the primary key leads with order_id, ticket inventory looks up by ticket
+db.Index('ix_orders_tickets_ticket_id', OrderTicket.ticket_id)
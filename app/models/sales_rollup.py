@@ -0,0 +1,33 @@
+from app.models import db
+
+
+class SalesRollup(db.Model):
+    """
+    Ticket sales of an event on a day, per order status, in the payment
+    currency of the event. Maintained by `app.helpers.sales_rollup`.
+    """
+    __tablename__ = 'sales_rollups'
+    __table_args__ = (db.UniqueConstraint('event_id', 'day', 'status', name='sales_rollup_bucket_uc'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), index=True)
+    day = db.Column(db.Date, index=True)
+    status = db.Column(db.String)
+    currency = db.Column(db.String)
+    orders_count = db.Column(db.Integer, default=0)
+    tickets_count = db.Column(db.Integer, default=0)
+    # sum of the order amounts
+    total_sales = db.Column(db.Float, default=0)
+    # price of the tickets of paid orders, discounts applied
+    ticket_sales = db.Column(db.Float, default=0)
+    # service fee of the tickets of paid orders
+    fee_amount = db.Column(db.Float, default=0)
+
+    def __repr__(self):
+        return '<SalesRollup %r %r %r>' % (self.event_id, self.day, self.status)
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return 'Sales of %r on %r' % (self.event_id, self.day)
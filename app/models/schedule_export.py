@@ -0,0 +1,33 @@
+from app.models import db
+
+SCHEDULE_EXPORT_FORMATS = ('pentabarf', 'ical', 'xcal')
+
+
+class ScheduleExport(db.Model):
+    """
+    State of a schedule export of an event, kept by
+    `app.helpers.exporters.export_scheduler`. The export is pending while
+    `requested_at` is set.
+    """
+    __tablename__ = 'schedule_exports'
+
+    event_id = db.Column(db.Integer, db.ForeignKey('events.id', ondelete='CASCADE'), primary_key=True)
+    format = db.Column(db.String, primary_key=True)
+    # latest change not exported yet
+    requested_at = db.Column(db.DateTime)
+    built_at = db.Column(db.DateTime)
+    # sha1 of the last export uploaded
+    content_hash = db.Column(db.String)
+
+    @property
+    def pending(self):
+        return self.requested_at is not None
+
+    def __repr__(self):
+        return '<ScheduleExport %r %r>' % (self.event_id, self.format)
+
+    def __str__(self):
+        return unicode(self).encode('utf-8')
+
+    def __unicode__(self):
+        return '%s %s' % (self.event_id, self.format)
@@ -159,3 +159,8 @@ class Session(db.Model):
 
     def __unicode__(self):
         return self.title
+
+
+# sessions of an event by state, leaving out trashed sessions
+db.Index('ix_session_event_state', Session.event_id, Session.state,
+         postgresql_where=Session.deleted_at.is_(None))
@@ -119,3 +119,6 @@ class TicketHolder(db.Model):
                 'recruitment': self.recruitment,
                 'unesco_hackathon': self.unesco_hackathon,
                 'country': self.country}
+
+
+db.Index('ix_ticket_holders_order_id', TicketHolder.order_id)
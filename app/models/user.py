@@ -6,18 +6,13 @@ from sqlalchemy import event, desc
 from sqlalchemy.orm.exc import MultipleResultsFound, NoResultFound
 
 from app.helpers.helpers import get_count
+from app.helpers.role_resolver import get_resolver
 from app.models.session import Session
 from app.models.speaker import Speaker
 from user_detail import UserDetail
 from app.models import db
 from app.models.notifications import Notification
-from app.models.permission import Permission
-from app.models.role import Role
-from app.models.service import Service
-from app.models.system_role import UserSystemRole
 from app.models.user_permissions import UserPermission
-from app.models.users_events_roles import UsersEventsRoles as UER
-from app.models.panel_permissions import PanelPermission
 
 # System-wide
 ADMIN = 'admin'
@@ -84,25 +79,12 @@ class User(db.Model):
         """Checks if user has any of the Roles at an Event.
         Exclude Attendee Role.
         """
-        attendee_role = Role.query.filter_by(name=ATTENDEE).first()
-        uer = UER.query.filter(UER.user == self, UER.event_id == event_id,
-                               UER.role != attendee_role).first()
-        if uer is None:
-            return False
-        else:
-            return True
+        return any(role != ATTENDEE for role in get_resolver(self.id).roles_at(event_id))
 
     def _is_role(self, role_name, event_id):
         """Checks if a user has a particular Role at an Event.
         """
-        role = Role.query.filter_by(name=role_name).first()
-        uer = UER.query.filter_by(user=self,
-                                  event_id=event_id,
-                                  role=role).first()
-        if not uer:
-            return False
-        else:
-            return True
+        return role_name in get_resolver(self.id).roles_at(event_id)
 
     def is_organizer(self, event_id):
         return self._is_role(ORGANIZER, event_id)
@@ -142,18 +124,7 @@ class User(db.Model):
         if self.is_super_admin:
             return True
 
-        service = Service.query.filter_by(name=service_name).first()
-
-        uer_querylist = UER.query.filter_by(user=self,
-                                            event_id=event_id)
-        for uer in uer_querylist:
-            role = uer.role
-            perm = Permission.query.filter_by(role=role,
-                                              service=service).first()
-            if getattr(perm, operations[operation]):
-                return True
-
-        return False
+        return get_resolver(self.id).can(operation, service_name, event_id)
 
     def can_create(self, service_class, event_id):
         return self._has_perm('create', service_class, event_id)
@@ -214,21 +185,14 @@ class User(db.Model):
         """Check if a user has a Custom System Role assigned.
         `role_id` is id of a `CustomSysRole` instance.
         """
-        role = UserSystemRole.query.filter_by(user=self, role_id=role_id).first()
-        return bool(role)
+        return role_id in get_resolver(self.id).system_roles
 
     def first_access_panel(self):
         """Check if the user is assigned a Custom Role or not
         This checks if there is an entry containing the current user in the `user_system_roles` table
         returns panel name if exists otherwise false
         """
-        custom_role = UserSystemRole.query.filter_by(user=self).first()
-        if not custom_role:
-            return False
-        perm = PanelPermission.query.filter_by(role_id=custom_role.role_id, can_access=True).first()
-        if not perm:
-            return False
-        return perm.panel_name
+        return get_resolver(self.id).first_access_panel()
 
     def can_access_panel(self, panel_name):
         """Check if user can access an Admin Panel
@@ -236,12 +200,7 @@ class User(db.Model):
         if self.is_staff:
             return True
 
-        custom_sys_roles = UserSystemRole.query.filter_by(user=self)
-        for custom_role in custom_sys_roles:
-            if custom_role.role.can_access(panel_name):
-                return True
-
-        return False
+        return get_resolver(self.id).can_access_panel(panel_name)
 
     def get_unread_notif_count(self):
         return get_count(Notification.query.filter_by(user=self, has_read=False))
@@ -262,10 +221,6 @@ class User(db.Model):
 
         return notifs
 
-    # update last access time
-    def update_lat(self):
-        self.last_access_time = datetime.now()
-
     def __repr__(self):
         return '<User %r>' % self.email
 
@@ -40,3 +40,8 @@ class UsersEventsRoles(db.Model):
         return '%r: %r in %r' % (self.user,
                                  self.role,
                                  self.event_id,)
+
+
+db.Index('ix_users_events_roles_user_event_role',
+         UsersEventsRoles.user_id, UsersEventsRoles.event_id, UsersEventsRoles.role_id)
+db.Index('ix_users_events_roles_event_role', UsersEventsRoles.event_id, UsersEventsRoles.role_id)
@@ -1,18 +1,23 @@
 import json
 from datetime import datetime
+from functools import wraps
 import pytz
 
 from flask import Blueprint
-from flask import request, url_for, flash, render_template, jsonify, make_response, current_app as app
+from flask import request, url_for, flash, render_template, jsonify, make_response, session, \
+    current_app as app
 from flask.ext import login
 from flask.ext.restplus import abort
 from markupsafe import Markup
 from werkzeug.utils import redirect
 
+from app.helpers.cache import cache
+from app.helpers.cache_invalidation import event_cache_key
 from app.helpers.data import DataManager
 from app.helpers.data_getter import DataGetter
 from app.helpers.helpers import get_count
 from app.models.call_for_papers import CallForPaper
+from app.helpers.flask_ext.jinja.variables import get_locale
 from app.helpers.wizard.helpers import get_current_timezone
 from app.settings import get_settings
 from urllib2 import urlopen
@@ -33,6 +38,51 @@ def get_published_event_or_abort(identifier):
     return event
 
 
+PAGE_CACHE_TIMEOUT = 60 * 60
+VERSION_COLUMNS = ('event_ver', 'sessions_ver', 'speakers_ver', 'tracks_ver', 'sponsors_ver',
+                   'microlocations_ver')
+
+
+def _page_cache_key(event, page):
+    """
+    Cache key of a public page of an event. It changes whenever the event's
+    Version row changes or the event cache is invalidated.
+    """
+    version = event.version
+    stamp = '.'.join(str(getattr(version, column)) for column in VERSION_COLUMNS) if version else '0'
+    args = '&'.join('%s=%s' % item for item in sorted(request.args.items()))
+    return event_cache_key(event.id, 'page', page, stamp, get_locale(), args)
+
+
+def cached_for_anonymous(page):
+    """
+    Caches the rendered page of a published event for anonymous visitors.
+    Logged in users, and visitors with pending flash messages, always get
+    a freshly rendered page.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(identifier, *args, **kwargs):
+            if login.current_user.is_authenticated or session.get('_flashes'):
+                return view(identifier, *args, **kwargs)
+            event = DataGetter.get_event_by_identifier(identifier=identifier)
+            if not event or event.state != u'Published' or event.deleted_at:
+                # let the view abort
+                return view(identifier, *args, **kwargs)
+            key = _page_cache_key(event, page)
+            html = cache.get(key)
+            if html is None:
+                html = view(identifier, *args, **kwargs)
+                if isinstance(html, basestring):
+                    cache.set(key, html, timeout=PAGE_CACHE_TIMEOUT)
+            return html
+
+        return wrapper
+
+    return decorator
+
+
 event_detail = Blueprint('event_detail', __name__, url_prefix='/e')
 
 
@@ -42,6 +92,7 @@ def display_default():
 
 
 @event_detail.route('/<identifier>/')
+@cached_for_anonymous('home')
 def display_event_detail_home(identifier):
     event = get_published_event_or_abort(identifier)
     placeholder_images = DataGetter.get_event_default_images()
@@ -65,13 +116,7 @@ def display_event_detail_home(identifier):
             if speaker not in speakers:
                 speakers.append(speaker)
 
-    '''Timezone aware current datetime object according to event timezone'''
-    timenow_event_tz = datetime.now(pytz.timezone(event.timezone
-                                                  if (event.timezone and event.timezone != '') else 'UTC'))
     module = DataGetter.get_module()
-    tickets = DataGetter.get_sales_open_tickets(event.id, event.timezone
-                                                  if (event.timezone and event.timezone != '') else 'UTC')
-    sorted_tickets = sorted(tickets, key=lambda x: x['ticket'].position)
 
     '''Sponsor Levels'''
     sponsors = {-1: []}
@@ -83,7 +128,6 @@ def display_event_detail_home(identifier):
         else:
             sponsors[int(sponsor.level)] = [sponsor]
 
-    fees = DataGetter.get_fee_settings_by_currency(event.payment_currency)
     code = request.args.get("code")
     return render_template('gentelella/guest/event/details.html',
                            event=event,
@@ -96,6 +140,26 @@ def display_event_detail_home(identifier):
                            licence_details=licence_details,
                            speakers=speakers,
                            module=module,
+                           code=code)
+
+
+@event_detail.route('/<identifier>/tickets/box/')
+def display_event_tickets_box(identifier):
+    """
+    Ticket availability of the event. Loaded by the (cached) event page,
+    so it is always computed on request.
+    """
+    event = get_published_event_or_abort(identifier)
+    '''Timezone aware current datetime object according to event timezone'''
+    timenow_event_tz = datetime.now(pytz.timezone(event.timezone
+                                                  if (event.timezone and event.timezone != '') else 'UTC'))
+    tickets = DataGetter.get_sales_open_tickets(event.id, event.timezone
+                                                  if (event.timezone and event.timezone != '') else 'UTC')
+    sorted_tickets = sorted(tickets, key=lambda x: x['ticket'].position)
+    fees = DataGetter.get_fee_settings_by_currency(event.payment_currency)
+    code = request.args.get("code")
+    return render_template('gentelella/guest/event/_ticketing_box.html',
+                           event=event,
                            timenow_event_tz=timenow_event_tz,
                            current_timezone=get_current_timezone(),
                            tickets=sorted_tickets if sorted_tickets else [],
@@ -104,6 +168,7 @@ def display_event_detail_home(identifier):
 
 
 @event_detail.route('/<identifier>/sessions/')
+@cached_for_anonymous('sessions')
 def display_event_sessions(identifier):
     event = get_published_event_or_abort(identifier)
     placeholder_images = DataGetter.get_event_default_images()
@@ -128,6 +193,7 @@ def display_event_sessions(identifier):
 
 
 @event_detail.route('/<identifier>/schedule/')
+@cached_for_anonymous('schedule')
 def display_event_schedule(identifier):
     event = get_published_event_or_abort(identifier)
     placeholder_images = DataGetter.get_event_default_images()
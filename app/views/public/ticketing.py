@@ -33,6 +33,9 @@ def index():
 @ticketing.route('/create/', methods=('POST',))
 def create_order():
     order = TicketingManager.create_order(request.form)
+    if not order:
+        event = DataGetter.get_event(request.form.get('event_id'))
+        return redirect(url_for('event_detail.display_event_detail_home', identifier=event.identifier))
     return redirect(url_for('.view_order', order_identifier=order.identifier))
 
 
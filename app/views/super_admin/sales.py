@@ -7,15 +7,15 @@ from flask import Blueprint
 from flask import render_template
 from flask import request
 from flask import url_for
-from flask.ext import login
 from werkzeug.exceptions import abort
 from werkzeug.utils import redirect
 
-from app import forex
 from app.helpers.cached_getter import CachedGetter
 from app.helpers.data_getter import DataGetter
 from app.helpers.invoicing import InvoicingManager
 from app.helpers.payment import get_fee
+from app.helpers.sales_rollup import SalesRollupManager
+from app.helpers.sales_summary import SalesSummary
 from app.helpers.ticketing import TicketingManager
 from app.models.system_role import CustomSysRole, UserSystemRole
 from app.models.user import User
@@ -27,6 +27,12 @@ display_currency = 'USD'
 sadmin_sales = Blueprint('sadmin_sales', __name__, url_prefix='/admin/sales')
 
 
+def parse_date(value):
+    if value:
+        return datetime.strptime(value, '%d/%m/%Y')
+    return None
+
+
 @sadmin_sales.before_request
 def verify_accessible():
     return check_accessible(SALES)
@@ -47,19 +53,6 @@ def fees_by_events_view():
         ('to_date' in request.args and 'from_date' not in request.args):
         return redirect(url_for('.fees_by_events_view'))
 
-    marketer_role = CustomSysRole.query.filter_by(name='Marketer').first()
-    marketer_id = login.current_user.id if login.current_user.is_sys_role(marketer_role.id) else None
-
-    if from_date and to_date:
-        orders = TicketingManager.get_orders(
-            from_date=datetime.strptime(from_date, '%d/%m/%Y'),
-            to_date=datetime.strptime(to_date, '%d/%m/%Y'),
-            status='completed',
-            marketer_id=marketer_id
-        )
-    else:
-        orders = TicketingManager.get_orders(status='completed', marketer_id=marketer_id)
-
     events = DataGetter.get_all_events()
 
     fee_summary = {}
@@ -75,17 +68,15 @@ def fees_by_events_view():
     fee_total = 0
     tickets_total = 0
 
-    for order in orders:
-        if order.event:
-            for order_ticket in order.tickets:
-                fee_summary[str(order.event.id)]['tickets_count'] += order_ticket.quantity
-                tickets_total += order_ticket.quantity
-                ticket = CachedGetter.get_ticket(order_ticket.ticket_id)
-                if order.paid_via != 'free' and order.amount > 0 and ticket.price > 0:
-                    fee = ticket.price * (get_fee(order.event.payment_currency) / 100)
-                    fee = forex(order.event.payment_currency, display_currency, fee)
-                    fee_summary[str(order.event.id)]['fee_amount'] += fee
-                    fee_total += fee
+    sales = SalesRollupManager.get_sales(parse_date(from_date), parse_date(to_date), status='completed')
+    for event_id, status, currency, orders_count, tickets_count, total_sales, ticket_sales, fee_amount \
+            in SalesRollupManager.in_currency(sales, display_currency):
+        if str(event_id) not in fee_summary:
+            continue
+        fee_summary[str(event_id)]['tickets_count'] += tickets_count
+        tickets_total += tickets_count
+        fee_summary[str(event_id)]['fee_amount'] += fee_amount
+        fee_total += fee_amount
 
     return render_template('gentelella/super_admin/sales/fees.html',
                            fee_summary=fee_summary,
@@ -234,62 +225,17 @@ def sales_by_events_view(path):
 
     promoted_events = path == 'discounted-events'
 
-    if from_date and to_date:
-        orders = TicketingManager.get_orders(
-            from_date=datetime.strptime(from_date, '%d/%m/%Y'),
-            to_date=datetime.strptime(to_date, '%d/%m/%Y'),
-            promoted_event=promoted_events
-        )
-    else:
-        orders = TicketingManager.get_orders(promoted_event=promoted_events)
-
     if promoted_events:
         events = DataGetter.get_all_events_with_discounts()
     else:
         events = DataGetter.get_all_events()
 
-    orders_summary = {
-        'completed': {
-            'class': 'success',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'placed': {
-            'class': 'info',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'pending': {
-            'class': 'warning',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'expired': {
-            'class': 'danger',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'deleted': {
-            'class': 'primary',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'cancelled': {
-            'class': 'default',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        }
-    }
+    orders_summary = SalesSummary.empty_orders_summary()
 
     tickets_summary_event_wise = {}
     tickets_summary_organizer_wise = {}
     tickets_summary_location_wise = {}
+    organizer_ids = {}
 
     for event in events:
         tickets_summary_event_wise[str(event.id)] = {
@@ -337,6 +283,7 @@ def sales_by_events_view(path):
                 str(event.discount_code.value) + '% off for ' + str(event.discount_code.max_quantity) + ' months'
 
         if organizer:
+            organizer_ids[event.id] = str(organizer.user.id)
             tickets_summary_organizer_wise[str(organizer.user.id)] = \
                 copy.deepcopy(tickets_summary_event_wise[str(event.id)])
             tickets_summary_organizer_wise[str(organizer.user.id)]['name'] = organizer.user.email
@@ -346,54 +293,23 @@ def sales_by_events_view(path):
         tickets_summary_location_wise[unicode(event.searchable_location_name)]['name'] = \
             event.searchable_location_name
 
-    for order in orders:
-        if order.event:
-            if order.status == 'initialized':
-                order.status = 'pending'
-            orders_summary[str(order.status)]['orders_count'] += 1
-            orders_summary[str(order.status)]['total_sales'] += forex(order.event.payment_currency,
-                                                                      display_currency, order.amount)
-            for order_ticket in order.tickets:
-                discount = TicketingManager.get_discount_code(order.event_id, order.discount_code_id)
-                orders_summary[str(order.status)]['tickets_count'] += order_ticket.quantity
-                ticket = CachedGetter.get_ticket(order_ticket.ticket_id)
-                tickets_summary_event_wise[str(order.event_id)][str(order.status)]['tickets_count'] \
-                    += order_ticket.quantity
-                tickets_summary_organizer_wise[str(organizer.user.id)][str(order.status)]['tickets_count'] \
-                    += order_ticket.quantity
-                tickets_summary_location_wise[unicode(order.event.searchable_location_name)][str(order.status)][
-                    'tickets_count'] \
-                    += order_ticket.quantity
-
-                if order.paid_via != 'free' and order.amount > 0:
-                    if discount and str(ticket.id) in discount.tickets.split(","):
-                        if discount.type == "amount":
-                            tickets_summary_event_wise[str(order.event_id)][str(order.status)][
-                                'sales'] += forex(order.event.payment_currency, display_currency, \
-                                            order_ticket.quantity * (ticket.price - discount.value))
-                            tickets_summary_organizer_wise[str(organizer.user.id)][str(order.status)][
-                                'sales'] += forex(order.event.payment_currency, display_currency, \
-                                            order_ticket.quantity * (ticket.price - discount.value))
-                            tickets_summary_location_wise[str(order.event.searchable_location_name)][str(order.status)][
-                                'sales'] += forex(order.event.payment_currency, display_currency, \
-                                            order_ticket.quantity * (ticket.price - discount.value))
-                        else:
-                            tickets_summary_event_wise[str(order.event_id)][str(order.status)]['sales'] += \
-                                forex(order.event.payment_currency, display_currency, \
-                                    order_ticket.quantity * (ticket.price - discount.value * ticket.price / 100.0))
-                            tickets_summary_organizer_wise[str(organizer.user.id)][str(order.status)]['sales'] += \
-                                forex(order.event.payment_currency, display_currency, \
-                                    order_ticket.quantity * (ticket.price - discount.value * ticket.price / 100.0))
-                            tickets_summary_location_wise[str(order.event.searchable_location_name)][str(order.status)]['sales'] += \
-                                forex(order.event.payment_currency, display_currency, \
-                                    order_ticket.quantity * (ticket.price - discount.value * ticket.price / 100.0))
-                    else:
-                        tickets_summary_event_wise[str(order.event_id)][str(order.status)][
-                            'sales'] += forex(order.event.payment_currency, display_currency, order_ticket.quantity * ticket.price)
-                        tickets_summary_organizer_wise[str(organizer.user.id)][str(order.status)][
-                            'sales'] += forex(order.event.payment_currency, display_currency, order_ticket.quantity * ticket.price)
-                        tickets_summary_location_wise[str(order.event.searchable_location_name)][str(order.status)][
-                            'sales'] += forex(order.event.payment_currency, display_currency, order_ticket.quantity * ticket.price)
+    locations = dict((event.id, unicode(event.searchable_location_name)) for event in events)
+
+    sales = SalesRollupManager.get_sales(parse_date(from_date), parse_date(to_date), event_ids=locations.keys())
+    for event_id, status, currency, orders_count, tickets_count, total_sales, ticket_sales, fee_amount \
+            in SalesRollupManager.in_currency(sales, display_currency):
+        if status not in orders_summary:
+            continue
+        orders_summary[status]['orders_count'] += orders_count
+        orders_summary[status]['tickets_count'] += tickets_count
+        orders_summary[status]['total_sales'] += total_sales
+        summaries = [tickets_summary_event_wise[str(event_id)], tickets_summary_location_wise[locations[event_id]]]
+        if event_id in organizer_ids:
+            summaries.append(tickets_summary_organizer_wise[organizer_ids[event_id]])
+        for summary in summaries:
+            summary[status]['tickets_count'] += tickets_count
+            summary[status]['sales'] += ticket_sales
+
     if path == 'events' or path == 'discounted-events':
         return render_template(
             'gentelella/super_admin/sales/by_events.html',
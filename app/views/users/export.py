@@ -6,6 +6,7 @@ from markupsafe import Markup
 
 from app.helpers.data_getter import DataGetter
 from app.helpers.auth import AuthManager
+from app.helpers.exporters.export_scheduler import get_export_states
 from app.helpers.permission_decorators import can_access
 
 
@@ -25,7 +26,7 @@ def display_export_view(event_id):
                      'click here to resend the confirmation.</a>'))
     return render_template(
         'gentelella/users/events/export/export.html', event=event, export_jobs=export_jobs,
-        current_user=user
+        schedule_exports=get_export_states(event_id), current_user=user
     )
 
 
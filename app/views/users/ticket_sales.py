@@ -13,12 +13,14 @@ from flask import url_for
 from xhtml2pdf import pisa
 
 from app import get_settings
-from app.helpers.cache import cache
 from app.helpers.data import delete_from_db
 from app.helpers.data import save_to_db
 from app.helpers.data_getter import DataGetter
+from app.helpers.exporters.attendee_csv import AttendeeCsv
+from app.helpers.exporters.helpers import csv_response
+from app.helpers.exporters.order_csv import OrderCsv
+from app.helpers.sales_summary import SalesSummary
 from app.helpers.ticketing import TicketingManager
-from app.models.ticket import Ticket
 from app.helpers.permission_decorators import can_access
 
 event_ticket_sales = Blueprint('event_ticket_sales', __name__, url_prefix='/events/<int:event_id>/tickets')
@@ -30,119 +32,11 @@ def create_pdf(pdf_data):
     return pdf
 
 
-@cache.memoize(50)
-def get_ticket(ticket_id):
-    return Ticket.query.get(ticket_id)
-
-
 @event_ticket_sales.route('/')
 @can_access
 def display_ticket_stats(event_id):
     event = DataGetter.get_event(event_id)
-    orders = TicketingManager.get_orders(event_id)
-
-    orders_summary = {
-        'completed': {
-            'class': 'success',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'placed': {
-            'class': 'info',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'pending': {
-            'class': 'warning',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'expired': {
-            'class': 'danger',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'deleted': {
-            'class': 'primary',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        },
-        'cancelled': {
-            'class': 'default',
-            'tickets_count': 0,
-            'orders_count': 0,
-            'total_sales': 0
-        }
-    }
-
-    tickets_summary = {}
-
-    for ticket in event.tickets:
-        tickets_summary[str(ticket.id)] = {
-            'name': ticket.name,
-            'quantity': ticket.quantity,
-            'completed': {
-                'tickets_count': 0,
-                'sales': 0
-            },
-            'placed': {
-                'tickets_count': 0,
-                'sales': 0
-            },
-            'pending': {
-                'tickets_count': 0,
-                'sales': 0
-            },
-            'expired': {
-                'class': 'danger',
-                'tickets_count': 0,
-                'sales': 0
-            },
-            'deleted': {
-                'tickets_count': 0,
-                'sales': 0
-            },
-            'cancelled': {
-                'tickets_count': 0,
-                'sales': 0
-            },
-        }
-
-    for order in orders:
-        if order.status == 'initialized':
-            order.status = 'pending'
-        fees = DataGetter.get_fee_settings_by_currency(DataGetter.get_event(order.event_id).payment_currency)
-        orders_summary[str(order.status)]['orders_count'] += 1
-        orders_summary[str(order.status)]['total_sales'] += order.amount
-
-        for order_ticket in order.tickets:
-            discount = TicketingManager.get_discount_code(event_id, order.discount_code_id)
-            orders_summary[str(order.status)]['tickets_count'] += order_ticket.quantity
-            ticket = get_ticket(order_ticket.ticket_id)
-            tickets_summary[str(ticket.id)][str(order.status)]['tickets_count'] += order_ticket.quantity
-            ticket_price = ticket.price
-            if fees and not ticket.absorb_fees:
-                order_fee = fees.service_fee * (ticket.price * order_ticket.quantity) / 100.0
-                if order_fee > fees.maximum_fee:
-                    ticket_price = ticket.price + fees.maximum_fee / order_ticket.quantity
-                else:
-                    ticket_price = ticket.price + fees.service_fee * ticket.price / 100.0
-
-            if order.paid_via != 'free' and order.amount > 0:
-                if discount and str(ticket.id) in discount.tickets.split(","):
-                    if discount.type == "amount":
-                        tickets_summary[str(ticket.id)][str(order.status)]['sales'] += order_ticket.quantity * (
-                            ticket_price - discount.value)
-                    else:
-                        tickets_summary[str(ticket.id)][str(order.status)]['sales'] += order_ticket.quantity * (
-                            ticket_price - discount.value * ticket_price / 100.0)
-                else:
-                    tickets_summary[str(ticket.id)][str(order.status)]['sales'] += order_ticket.quantity * ticket_price
+    orders_summary, tickets_summary = SalesSummary.get_summaries(event)
     return render_template('gentelella/users/events/tickets/tickets.html', event=event, event_id=event_id,
                            orders_summary=orders_summary, tickets_summary=tickets_summary)
 
@@ -290,11 +184,7 @@ def download_as_pdf(event_id):
 @event_ticket_sales.route('/attendees/csv')
 @can_access
 def download_as_csv(event_id):
-    from app.helpers.tasks import export_attendee_csv_task
-    task = export_attendee_csv_task.delay(event_id)
-    return jsonify({
-            'task_url': url_for('api.extras_celery_task', task_id=task.id)
-        })
+    return csv_response(AttendeeCsv.export(event_id), 'attendees-%d.csv' % event_id)
 
 
 @event_ticket_sales.route('/orders/pdf')
@@ -313,11 +203,7 @@ def download_orders_as_pdf(event_id):
 @event_ticket_sales.route('/orders/csv')
 @can_access
 def download_orders_as_csv(event_id):
-    from app.helpers.tasks import export_order_csv_task
-    task = export_order_csv_task.delay(event_id)
-    return jsonify({
-            'task_url': url_for('api.extras_celery_task', task_id=task.id)
-        })
+    return csv_response(OrderCsv.export(event_id), 'orders-%d.csv' % event_id)
 
 
 @event_ticket_sales.route('/add-order/', methods=('GET', 'POST'))
@@ -325,6 +211,8 @@ def download_orders_as_csv(event_id):
 def add_order(event_id):
     if request.method == 'POST':
         order = TicketingManager.create_order(request.form, True)
+        if not order:
+            return redirect(url_for('.add_order', event_id=event_id))
         return redirect(url_for('.proceed_order', event_id=event_id, order_identifier=order.identifier))
 
     event = DataGetter.get_event(event_id)
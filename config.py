@@ -37,6 +37,23 @@ class Config(object):
     TESTING = False
 
     CACHING = False
+    # `local` (per-process LRU) or `redis` (shared by all workers)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'local')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+    CACHE_KEY_PREFIX = 'open_event:'
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_LOCAL_SIZE = 1000
+    # seconds a value is kept in the in-process tier in front of redis
+    CACHE_LOCAL_TIMEOUT = 5
+    # `forex_python` (web API) or `fixture` (the JSON file FX_RATE_FIXTURE)
+    FX_RATE_PROVIDER = os.environ.get('FX_RATE_PROVIDER', 'forex_python')
+    FX_RATE_FIXTURE = os.environ.get('FX_RATE_FIXTURE')
+    FX_BASE_CURRENCY = 'USD'
+    # seconds a process keeps its exchange rates before reloading them
+    FX_SNAPSHOT_TIMEOUT = 600
+    # `scheduler` (the scheduler of every process, under the job locks) or
+    # `celery` (only `celery beat` starts the scheduled jobs)
+    SCHEDULED_JOBS_RUNNER = os.environ.get('SCHEDULED_JOBS_RUNNER', 'scheduler')
     PROFILE = False
     SQLALCHEMY_RECORD_QUERIES = False
     INTEGRATE_SOCKETIO = False
@@ -77,6 +94,7 @@ class ProductionConfig(Config):
     PRODUCTION = True
     INTEGRATE_SOCKETIO = False
     CACHING = True
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis')
 
     # if force on
     socketio_integration = os.environ.get('INTEGRATE_SOCKETIO')
@@ -116,6 +134,9 @@ class TestingConfig(Config):
     """
     INTEGRATE_SOCKETIO = False
     TESTING = True
+    CACHE_BACKEND = 'local'
+    FX_RATE_PROVIDER = 'fixture'
+    FX_RATE_FIXTURE = os.path.join(basedir, 'tests', 'unittests', 'fixtures', 'fx_rates.json')
     CELERY_ALWAYS_EAGER = True
     CELERY_EAGER_PROPAGATES_EXCEPTIONS = True
     SQLALCHEMY_RECORD_QUERIES = True
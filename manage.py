@@ -94,5 +94,42 @@ def initialize_db(credentials):
                 populate()
 
 
+@manager.option('-e', '--event', help='Event ID. Eg. 1. All events if omitted')
+def rebuild_sales_rollups(event=None):
+    from app.helpers.sales_rollup import SalesRollupManager
+    with app.app_context():
+        SalesRollupManager.rebuild(int(event) if event else None)
+        print "Sales rollups rebuilt"
+
+
+@manager.command
+def refresh_fx_rates():
+    from app.helpers.fx_rates import refresh_rates
+    with app.app_context():
+        print "Stored %d exchange rates" % refresh_rates()
+
+
+@manager.command
+def list_jobs():
+    from app.helpers.job_runner import JOBS, last_run
+    with app.app_context():
+        for name in JOBS:
+            run = last_run(name)
+            if run:
+                print "%s: %s at %s (%s)" % (name, run.status, run.started_at, run.trigger)
+            else:
+                print "%s: never ran" % name
+
+
+@manager.option('-n', '--name', help='Job name. Eg. empty_trash')
+def run_job(name):
+    from app.helpers.job_runner import JOBS, run_job as run_scheduled_job
+    if name not in JOBS:
+        print "Unknown job %s, one of: %s" % (name, ", ".join(JOBS))
+        return
+    status = run_scheduled_job(name, trigger='cli', force=True)
+    print "Job %s %s" % (name, status or "is already running")
+
+
 if __name__ == "__main__":
     manager.run()
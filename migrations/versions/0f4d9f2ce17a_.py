@@ -0,0 +1,42 @@
+"""Add the sales rollups table
+
+Revision ID: 0f4d9f2ce17a
+Revises: e9d61dbd0cb8
+Create Date: 2026-10-17 10:12:31.402515
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '0f4d9f2ce17a'
+down_revision = 'e9d61dbd0cb8'
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+def upgrade():
+    op.create_table('sales_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('event_id', sa.Integer(), nullable=True),
+    sa.Column('day', sa.Date(), nullable=True),
+    sa.Column('status', sa.String(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('orders_count', sa.Integer(), nullable=True),
+    sa.Column('tickets_count', sa.Integer(), nullable=True),
+    sa.Column('total_sales', sa.Float(), nullable=True),
+    sa.Column('ticket_sales', sa.Float(), nullable=True),
+    sa.Column('fee_amount', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('event_id', 'day', 'status', name='sales_rollup_bucket_uc')
+    )
+    op.create_index(op.f('ix_sales_rollups_day'), 'sales_rollups', ['day'], unique=False)
+    op.create_index(op.f('ix_sales_rollups_event_id'), 'sales_rollups', ['event_id'], unique=False)
+    # backfill with `python manage.py rebuild_sales_rollups`
+
+
+def downgrade():
+    op.drop_index(op.f('ix_sales_rollups_event_id'), table_name='sales_rollups')
+    op.drop_index(op.f('ix_sales_rollups_day'), table_name='sales_rollups')
+    op.drop_table('sales_rollups')
@@ -0,0 +1,35 @@
+"""Add the fx rates table
+
+Revision ID: 30773eb67ca8
+Revises: 0f4d9f2ce17a
+Create Date: 2026-10-17 11:02:47.118342
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '30773eb67ca8'
+down_revision = '0f4d9f2ce17a'
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+def upgrade():
+    op.create_table('fx_rates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=True),
+    sa.Column('base', sa.String(), nullable=True),
+    sa.Column('currency', sa.String(), nullable=True),
+    sa.Column('rate', sa.Float(), nullable=True),
+    sa.Column('fetched_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'base', 'currency', name='fx_rate_day_uc')
+    )
+    op.create_index(op.f('ix_fx_rates_day'), 'fx_rates', ['day'], unique=False)
+    # fill with `python manage.py refresh_fx_rates`
+
+
+def downgrade():
+    op.drop_index(op.f('ix_fx_rates_day'), table_name='fx_rates')
+    op.drop_table('fx_rates')
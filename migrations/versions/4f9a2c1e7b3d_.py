@@ -0,0 +1,34 @@
+"""Record the runs of the scheduled jobs
+
+Revision ID: 4f9a2c1e7b3d
+Revises: 708c27cd0ff0
+Create Date: 2026-10-17 14:02:31.418206
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4f9a2c1e7b3d'
+down_revision = '708c27cd0ff0'
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+def upgrade():
+    op.create_table('job_runs',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(), nullable=False),
+                    sa.Column('trigger', sa.String(), nullable=True),
+                    sa.Column('host', sa.String(), nullable=True),
+                    sa.Column('status', sa.String(), nullable=False),
+                    sa.Column('started_at', sa.DateTime(), nullable=False),
+                    sa.Column('finished_at', sa.DateTime(), nullable=True),
+                    sa.Column('error', sa.Text(), nullable=True),
+                    sa.PrimaryKeyConstraint('id'))
+    op.create_index('ix_job_runs_name_started_at', 'job_runs', ['name', 'started_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_job_runs_name_started_at', table_name='job_runs')
+    op.drop_table('job_runs')
@@ -0,0 +1,40 @@
+"""Index the hot filter columns
+
+Revision ID: 708c27cd0ff0
+Revises: 30773eb67ca8
+Create Date: 2026-10-17 11:48:05.633120
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '708c27cd0ff0'
+down_revision = '30773eb67ca8'
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+def upgrade():
+    op.create_index('ix_session_event_state', 'session', ['event_id', 'state'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+    op.create_index('ix_orders_event_status_created', 'orders', ['event_id', 'status', 'created_at'], unique=False)
+    op.create_index('ix_orders_tickets_ticket_id', 'orders_tickets', ['ticket_id'], unique=False)
+    op.create_index('ix_ticket_holders_order_id', 'ticket_holders', ['order_id'], unique=False)
+    op.create_index('ix_users_events_roles_user_event_role', 'users_events_roles',
+                    ['user_id', 'event_id', 'role_id'], unique=False)
+    op.create_index('ix_users_events_roles_event_role', 'users_events_roles', ['event_id', 'role_id'], unique=False)
+    op.create_index('ix_discount_codes_event_code_used_for', 'discount_codes',
+                    ['event_id', 'code', 'used_for'], unique=False)
+    op.create_index('ix_events_identifier', 'events', ['identifier'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_events_identifier', table_name='events')
+    op.drop_index('ix_discount_codes_event_code_used_for', table_name='discount_codes')
+    op.drop_index('ix_users_events_roles_event_role', table_name='users_events_roles')
+    op.drop_index('ix_users_events_roles_user_event_role', table_name='users_events_roles')
+    op.drop_index('ix_ticket_holders_order_id', table_name='ticket_holders')
+    op.drop_index('ix_orders_tickets_ticket_id', table_name='orders_tickets')
+    op.drop_index('ix_orders_event_status_created', table_name='orders')
+    op.drop_index('ix_session_event_state', table_name='session')
@@ -0,0 +1,31 @@
+"""Store the watermarks of the incremental jobs
+
+Revision ID: b1c07e5a9d42
+Revises: 4f9a2c1e7b3d
+Create Date: 2026-10-17 15:21:09.730514
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'b1c07e5a9d42'
+down_revision = '4f9a2c1e7b3d'
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+def upgrade():
+    op.create_table('job_watermarks',
+                    sa.Column('name', sa.String(), nullable=False),
+                    sa.Column('watermark', sa.DateTime(), nullable=True),
+                    sa.Column('last_id', sa.Integer(), nullable=True),
+                    sa.Column('updated_at', sa.DateTime(), nullable=True),
+                    sa.PrimaryKeyConstraint('name'))
+    op.create_index('ix_events_end_time_id', 'events', ['end_time', 'id'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+
+
+def downgrade():
+    op.drop_index('ix_events_end_time_id', table_name='events')
+    op.drop_table('job_watermarks')
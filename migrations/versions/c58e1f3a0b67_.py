@@ -0,0 +1,27 @@
+"""Record the billing period of the monthly fee invoices
+
+Revision ID: c58e1f3a0b67
+Revises: b1c07e5a9d42
+Create Date: 2026-10-17 16:08:44.207391
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c58e1f3a0b67'
+down_revision = 'b1c07e5a9d42'
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+def upgrade():
+    op.add_column('event_invoices', sa.Column('billed_until', sa.DateTime(), nullable=True))
+    op.create_unique_constraint('event_invoice_billed_until_uc', 'event_invoices', ['event_id', 'billed_until'])
+    op.create_index('ix_orders_status_completed', 'orders', ['status', 'completed_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orders_status_completed', table_name='orders')
+    op.drop_constraint('event_invoice_billed_until_uc', 'event_invoices', type_='unique')
+    op.drop_column('event_invoices', 'billed_until')
@@ -0,0 +1,30 @@
+"""Keep the state of the debounced schedule exports
+
+Revision ID: d7a3f0e25c19
+Revises: c58e1f3a0b67
+Create Date: 2026-10-17 19:42:10.531208
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'd7a3f0e25c19'
+down_revision = 'c58e1f3a0b67'
+
+from alembic import op
+import sqlalchemy as sa
+import sqlalchemy_utils
+
+
+def upgrade():
+    op.create_table('schedule_exports',
+                    sa.Column('event_id', sa.Integer(), nullable=False),
+                    sa.Column('format', sa.String(), nullable=False),
+                    sa.Column('requested_at', sa.DateTime(), nullable=True),
+                    sa.Column('built_at', sa.DateTime(), nullable=True),
+                    sa.Column('content_hash', sa.String(), nullable=True),
+                    sa.ForeignKeyConstraint(['event_id'], ['events.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('event_id', 'format'))
+
+
+def downgrade():
+    op.drop_table('schedule_exports')
@@ -0,0 +1,127 @@
+"""
+Benchmark for the streaming attendee and order CSV exports.
+
+Grows the attendees of an event and exports them, once streamed the way
+the download views do it and once materialised in a list the way the
+exports used to work. The memory an export needs on top of what the
+process already held is measured in a forked child so that runs do not
+share a high-water mark. It should stay flat when streaming.
+
+    python -m tests.benchmarks.bench_csv_export
+"""
+import os
+import resource
+import time
+from datetime import datetime
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.exporters.attendee_csv import AttendeeCsv
+from app.helpers.exporters.helpers import iter_csv
+from app.helpers.exporters.order_csv import OrderCsv
+from app.models import db
+from app.models.order import Order
+from app.models.ticket import Ticket
+from app.models.ticket_holder import TicketHolder
+from tests.benchmarks.utils import print_table
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+
+SIZES = (10000, 50000, 100000)
+BATCH = 5000
+
+
+def seed_attendees(event_id, ticket_id, user_id, count):
+    """Bulk insert orders of one attendee until the event has `count`"""
+    existing = Order.query.filter_by(event_id=event_id).count()
+    while existing < count:
+        batch = min(BATCH, count - existing)
+        db.session.bulk_insert_mappings(Order, [{
+            'identifier': 'bench-%d' % i,
+            'amount': 10.0,
+            'event_id': event_id,
+            'user_id': user_id,
+            'status': 'completed',
+            'paid_via': 'stripe',
+            'created_at': datetime(2017, 1, 1),
+        } for i in range(existing, existing + batch)])
+        db.session.commit()
+        order_ids = [order_id for order_id, in db.session.query(Order.id)
+                     .filter(Order.identifier.in_(['bench-%d' % i for i in range(existing, existing + batch)]))]
+        db.session.bulk_insert_mappings(TicketHolder, [{
+            'firstname': u'Attend\xe9e',
+            'lastname': 'Number %d' % order_id,
+            'email': 'attendee%d@example.com' % order_id,
+            'ticket_id': ticket_id,
+            'order_id': order_id,
+        } for order_id in order_ids])
+        db.session.commit()
+        existing += batch
+
+
+def in_child(func):
+    """
+    Runs `func` in a forked process and returns (ms, extra peak memory kb)
+    """
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        # don't share the parent's database connections
+        db.engine.dispose()
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        start = time.time()
+        func()
+        elapsed = (time.time() - start) * 1000
+        extra = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+        os.write(write_end, '%f %d' % (elapsed, extra))
+        os._exit(0)
+    os.close(write_end)
+    result = os.read(read_end, 64)
+    os.waitpid(pid, 0)
+    elapsed, extra = result.split()
+    return float(elapsed), int(extra)
+
+
+def streamed(export, event_id):
+    def run():
+        with app.test_request_context():
+            for _ in iter_csv(export(event_id)):
+                pass
+    return run
+
+
+def materialised(export, event_id):
+    def run():
+        with app.test_request_context():
+            rows = list(export(event_id))
+            ''.join(iter_csv(rows))
+    return run
+
+
+def run():
+    Setup.create_app()
+    rows = []
+    try:
+        with app.test_request_context():
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            event = ObjectMother.get_event()
+            save_to_db(event)
+            ticket = Ticket(name='Bench', event=event, quantity=1000000, price=10.0)
+            save_to_db(ticket)
+            event_id, ticket_id, user_id = event.id, ticket.id, user.id
+        for size in SIZES:
+            with app.test_request_context():
+                seed_attendees(event_id, ticket_id, user_id, size)
+            for name, export in (('attendees', AttendeeCsv.export), ('orders', OrderCsv.export)):
+                for mode, runner in (('streamed', streamed), ('list', materialised)):
+                    elapsed, extra = in_child(runner(export, event_id))
+                    rows.append((size, name, mode, elapsed, extra))
+    finally:
+        Setup.drop_db()
+    print_table('CSV exports', ('attendees', 'export', 'mode', 'ms', 'extra peak kb'), rows)
+
+
+if __name__ == '__main__':
+    run()
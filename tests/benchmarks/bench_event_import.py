@@ -0,0 +1,100 @@
+"""
+Benchmark for the JSON event import.
+
+Builds a synthetic event with many speakers and sessions, exports it the
+way the export task does and imports the zip back, reporting the wall
+time, the number of queries and the sessions imported per second. The
+queries should grow with the services imported, not with a commit and a
+version bump per object.
+
+    python -m tests.benchmarks.bench_event_import
+"""
+import time
+from datetime import datetime
+
+from flask import g
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app import current_app as app
+from app.api.helpers.export_helpers import export_event_json
+from app.api.helpers.import_helpers import import_event_json
+from app.models import db
+from app.models.microlocation import Microlocation
+from app.models.session import Session, speakers_sessions
+from app.models.session_type import SessionType
+from app.models.speaker import Speaker
+from app.models.track import Track
+from app.models.user import User
+from tests.benchmarks.utils import print_table
+from tests.unittests.api.utils import create_event
+from tests.unittests.auth_helper import register
+from tests.unittests.setup_database import Setup
+
+SIZES = (200, 2000)
+SPEAKERS_PER_SESSION = 2
+NO_MEDIA = {'image': False, 'video': False, 'audio': False, 'document': False}
+
+
+def seed_event(sessions_count):
+    """Creates an event with `sessions_count` sessions, returns its id"""
+    event_id = create_event(name='Bench %d' % sessions_count, creator_email='bench@example.com')
+    db.session.add_all([Track(name='Track %d' % i, description='descp', color='#caf034', event_id=event_id)
+                        for i in range(10)])
+    db.session.add_all([Microlocation(name='Room %d' % i, event_id=event_id) for i in range(10)])
+    db.session.add(SessionType(name='Talk', length=30, event_id=event_id))
+    db.session.commit()
+    tracks = [track.id for track in Track.query.filter_by(event_id=event_id)]
+    rooms = [room.id for room in Microlocation.query.filter_by(event_id=event_id)]
+    session_type = SessionType.query.filter_by(event_id=event_id).first().id
+    db.session.bulk_insert_mappings(Speaker, [{
+        'name': 'Speaker %d' % i,
+        'email': 'speaker%d@example.com' % i,
+        'organisation': 'org',
+        'country': 'japan',
+        'event_id': event_id,
+    } for i in range(sessions_count)])
+    db.session.bulk_insert_mappings(Session, [{
+        'title': 'Session %d' % i,
+        'long_abstract': 'descp',
+        'start_time': datetime(2016, 4, 8, 12, 30),
+        'end_time': datetime(2016, 4, 8, 13, 0),
+        'state': 'accepted',
+        'track_id': tracks[i % len(tracks)],
+        'microlocation_id': rooms[i % len(rooms)],
+        'session_type_id': session_type,
+        'event_id': event_id,
+    } for i in range(sessions_count)])
+    db.session.commit()
+    speakers = [speaker_id for speaker_id, in db.session.query(Speaker.id).filter_by(event_id=event_id)]
+    sessions = [session_id for session_id, in db.session.query(Session.id).filter_by(event_id=event_id)]
+    db.session.execute(speakers_sessions.insert(), [
+        {'session_id': session_id, 'speaker_id': speakers[(index + offset) % len(speakers)]}
+        for index, session_id in enumerate(sessions) for offset in range(SPEAKERS_PER_SESSION)])
+    db.session.commit()
+    return event_id
+
+
+def run():
+    client = Setup.create_app()
+    rows = []
+    try:
+        with app.test_request_context():
+            register(client, u'bench@example.com', u'bench')
+        for size in SIZES:
+            with app.test_request_context():
+                g.user = User.query.filter_by(email='bench@example.com').first()
+                zip_path = export_event_json(seed_event(size), NO_MEDIA)
+                issued = len(get_debug_queries())
+                start = time.time()
+                event = import_event_json(zip_path, None)
+                elapsed = time.time() - start
+                queries = len(get_debug_queries()) - issued
+                imported = Session.query.filter_by(event_id=event.id).count()
+                rows.append((size, imported, elapsed * 1000, queries, imported / elapsed))
+    finally:
+        Setup.drop_db()
+    print_table('Event import', ('sessions', 'imported', 'ms', 'queries', 'sessions/s'), rows)
+
+
+if __name__ == '__main__':
+    run()
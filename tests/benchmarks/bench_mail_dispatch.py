@@ -0,0 +1,62 @@
+"""
+Benchmark of the SMTP mail dispatch against a local SMTP sink.
+
+Sends the same mails once with a new mailer per mail, the way every mail
+used to be sent, and once in batches over the pooled connection. Prints
+the throughput of both in mails per second.
+
+    python -m tests.benchmarks.bench_mail_dispatch
+"""
+import time
+
+from marrow.mailer import Mailer
+
+from app.helpers.mail_dispatch import build_message, send_batch, stop_mailers, MAIL_BATCH_SIZE
+from tests.benchmarks.utils import print_table
+from tests.unittests.smtp_sink import SmtpSink
+
+SIZES = (50, 200, 1000)
+
+
+def payloads(count):
+    return [{
+        'to': 'attendee%d@example.com' % index,
+        'from': 'Open Event<noreply@example.com>',
+        'subject': 'Mail %d' % index,
+        'html': '<p>Dear attendee %d,</p><p>%s</p>' % (index, 'Lorem ipsum dolor sit amet. ' * 40),
+    } for index in range(count)]
+
+
+def one_mailer_per_mail(config, mails):
+    for payload in mails:
+        mailer = Mailer({'transport': {'use': 'smtp', 'host': config['host'], 'port': config['port'],
+                                       'username': config['username'], 'password': config['password'],
+                                       'tls': config['encryption']}})
+        mailer.start()
+        mailer.send(build_message(payload))
+        mailer.stop()
+
+
+def pooled_batches(config, mails):
+    for start in range(0, len(mails), MAIL_BATCH_SIZE):
+        send_batch(config, mails[start:start + MAIL_BATCH_SIZE])
+    stop_mailers()
+
+
+def run():
+    rows = []
+    for size in SIZES:
+        mails = payloads(size)
+        for mode, send in (('per mail', one_mailer_per_mail), ('pooled', pooled_batches)):
+            with SmtpSink() as sink:
+                start = time.time()
+                send(sink.config(), mails)
+                while len(sink.messages) < size:
+                    time.sleep(0.01)
+                elapsed = time.time() - start
+                rows.append((size, mode, sink.connections, elapsed * 1000, size / elapsed))
+    print_table('SMTP dispatch', ('mails', 'mode', 'connections', 'ms', 'mails/s'), rows)
+
+
+if __name__ == '__main__':
+    run()
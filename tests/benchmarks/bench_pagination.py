@@ -0,0 +1,72 @@
+"""
+Benchmark for the SQL side paginator of the list APIs.
+
+Grows the events table and fetches a page from the middle of it, both
+in offset and in cursor mode (seeking from a cursor pointing at the
+middle row), and the first cursor page. Latency, queries and ORM objects loaded
+should stay flat as the table grows (they grew linearly when the whole
+table was loaded to slice a page out of it).
+
+    python -m tests.benchmarks.bench_pagination
+"""
+import binascii
+import os
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.api.helpers.helpers import get_paginated_list, encode_cursor
+from app.models import db
+from app.models.event import Event
+from tests.benchmarks.utils import measure, print_table
+from tests.unittests.setup_database import Setup
+
+SIZES = (1000, 10000, 50000)
+PAGE_LIMIT = 20
+BATCH = 5000
+
+
+def seed_events(count):
+    """Bulk insert events until the table holds `count` rows"""
+    existing = Event.query.count()
+    base = datetime(2016, 1, 1)
+    while existing < count:
+        batch = min(BATCH, count - existing)
+        db.session.bulk_insert_mappings(Event, [{
+            'name': 'BenchEvent%d' % i,
+            'identifier': binascii.b2a_hex(os.urandom(4)),
+            'start_time': base + timedelta(hours=i),
+            'end_time': base + timedelta(hours=i + 1),
+            'timezone': 'UTC',
+            'privacy': 'public',
+            'state': 'Published',
+        } for i in range(existing, existing + batch)])
+        db.session.commit()
+        existing += batch
+
+
+def run():
+    Setup.create_app()
+    rows = []
+    try:
+        with app.test_request_context():
+            for size in SIZES:
+                seed_events(size)
+                middle = size / 2
+                offset = measure(lambda: get_paginated_list(Event, url='/bench', args={
+                    'start': middle, 'limit': PAGE_LIMIT}))
+                first = measure(lambda: get_paginated_list(Event, url='/bench', args={
+                    'start': 1, 'limit': PAGE_LIMIT, 'cursor': '', 'cursor_key': 'start_time'}))
+                middle_event = Event.query.order_by(Event.start_time, Event.id).offset(middle - 1).first()
+                middle_cursor = encode_cursor('start_time', middle_event)
+                cursor = measure(lambda: get_paginated_list(Event, url='/bench', args={
+                    'start': 1, 'limit': PAGE_LIMIT, 'cursor': middle_cursor, 'cursor_key': 'start_time'}))
+                for mode, result in (('offset', offset), ('cursor, first page', first), ('cursor', cursor)):
+                    rows.append((size, mode, result['ms'], result['queries'], result['loaded'], result['peak_kb']))
+    finally:
+        Setup.drop_db()
+    print_table('get_paginated_list, page of %d' % PAGE_LIMIT,
+                ('rows', 'mode', 'ms', 'queries', 'orm objects', 'peak kb'), rows)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,46 @@
+"""
+Helpers shared by the benchmarks.
+
+Benchmarks are not collected by the unit test run. Run one with
+    python -m tests.benchmarks.<module>
+against a throwaway `DATABASE_URL`, the database is dropped afterwards.
+"""
+import resource
+import time
+
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app.models import db
+
+
+def peak_memory_kb():
+    """Peak resident set size of the process so far (KB on Linux)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(func, repeat=5):
+    """
+    Runs `func` `repeat` times and returns a dict with the best wall time (ms),
+    the number of queries issued and the ORM objects held by the session
+    during the last run. Must be called inside an app context.
+    """
+    best = None
+    queries = 0
+    loaded = 0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        issued = len(get_debug_queries())
+        start = time.time()
+        func()
+        elapsed = (time.time() - start) * 1000
+        queries = len(get_debug_queries()) - issued
+        loaded = len(db.session.identity_map)
+        best = elapsed if best is None else min(best, elapsed)
+    return {'ms': best, 'queries': queries, 'loaded': loaded, 'peak_kb': peak_memory_kb()}
+
+
+def print_table(title, header, rows):
+    print title
+    print ' | '.join('%12s' % h for h in header)
+    for row in rows:
+        print ' | '.join('%12s' % (('%.2f' % c) if isinstance(c, float) else c) for c in row)
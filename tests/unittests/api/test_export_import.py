@@ -12,6 +12,7 @@ import zipfile
 from StringIO import StringIO
 
 from app import current_app as app
+from app.api.helpers import export_helpers
 from tests.unittests.api.utils import create_event, get_path, create_services, \
     create_session, save_to_db, Speaker
 from tests.unittests.auth_helper import register
@@ -181,6 +182,30 @@ class TestEventExport(ImportExportBase):
         data = open(dr + '/sponsors', 'r').read()
         self.assertTrue(data.find('name') < data.find('description'))
 
+    def test_export_in_batches(self):
+        """
+        Tests that the services written in several batches are complete
+        """
+        with app.test_request_context():
+            create_services(1, '2')
+            create_services(1, '3')
+        batch_size = export_helpers.EXPORT_BATCH_SIZE
+        export_helpers.EXPORT_BATCH_SIZE = 2
+        try:
+            self._create_set()
+        finally:
+            export_helpers.EXPORT_BATCH_SIZE = batch_size
+        dr = 'static/uploads/test_event_import'
+        for name in ['speakers', 'sessions', 'sponsors']:
+            data = json.loads(open(dr + '/' + name, 'r').read())
+            self.assertEqual(len(data), 3)
+            self.assertEqual(len(set(item['id'] for item in data)), 3)
+        # forms are empty
+        self.assertEqual(json.loads(open(dr + '/forms', 'r').read()), [])
+        # the workspace of the job is removed
+        exports_dir = app.config['BASE_DIR'] + export_helpers.EXPORT_WORKSPACES
+        self.assertEqual([name for name in os.listdir(exports_dir) if name.startswith('event1_')], [])
+
 
 class TestEventImport(ImportExportBase):
     """
@@ -153,5 +153,62 @@ class TestGetApiPaginatedEvents(OpenEventTestCase):
         self.assertEqual(resp.status_code, 404)
 
 
+class TestGetApiPaginatedCursor(OpenEventTestCase):
+    """
+    Test the cursor (keyset) mode of the Paginated APIs
+    """
+
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            register(self.app, u'test@example.com', u'test')
+            update_role_to_admin({'admin_perm': 'isAdmin'}, user_id=1)
+            for i in range(3):
+                create_event(name='TestEvent%d' % i)
+
+    def _json_from_url(self, url):
+        response = self.app.get(url)
+        self.assertEqual(response.status_code, 200, msg=response.data)
+        return json.loads(response.data)
+
+    def _walk(self, cursor_key):
+        """
+        Follow next_cursor until the end and return the names seen
+        """
+        path = get_path('page') + '?limit=2&cursor_key=' + cursor_key + '&cursor='
+        data = self._json_from_url(path)
+        # no COUNT unless asked for
+        self.assertIsNone(data['count'])
+        names = [event['name'] for event in data['results']]
+        self.assertNotEqual(data['next_cursor'], '')
+        self.assertIn('cursor=', data['next'])
+        data = self._json_from_url(
+            get_path('page') + '?limit=2&cursor=' + data['next_cursor'])
+        names += [event['name'] for event in data['results']]
+        self.assertEqual(data['next_cursor'], '')
+        self.assertEqual(data['next'], '')
+        return names
+
+    def test_cursor_by_id(self):
+        self.assertEqual(self._walk('id'), ['TestEvent0', 'TestEvent1', 'TestEvent2'])
+
+    def test_cursor_by_start_time(self):
+        # all events share a start time, so id breaks the tie
+        self.assertEqual(self._walk('start_time'), ['TestEvent0', 'TestEvent1', 'TestEvent2'])
+
+    def test_cursor_with_count(self):
+        data = self._json_from_url(get_path('page') + '?limit=2&with_count=true&cursor=')
+        self.assertEqual(data['count'], 3)
+        self.assertIn('with_count=True', data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.app.get(get_path('page') + '?cursor=r@nd0m')
+        self.assertEqual(response.status_code, 400)
+
+    def test_offset_urls_have_no_cursor(self):
+        data = self._json_from_url(get_path('page') + '?limit=1')
+        self.assertNotIn('cursor', data['next'])
+
+
 if __name__ == '__main__':
     unittest.main()
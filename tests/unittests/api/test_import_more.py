@@ -1,12 +1,18 @@
 import json
 import os
 import shutil
+import tempfile
 import time
 import unittest
 
+from flask import g
+
 from app import current_app as app
+from app.api.helpers.import_helpers import import_event_json, IMPORT_WORKSPACES
+from app.models.session import Session
+from app.models.user import User
 from test_export_import import ImportExportBase
-from tests.unittests.api.utils import create_event, get_path, create_services
+from tests.unittests.api.utils import create_event, get_path, create_services, create_session
 from tests.unittests.auth_helper import register
 from tests.unittests.setup_database import Setup
 
@@ -134,5 +140,42 @@ class TestImportUploads(ImportExportBase):
             )
 
 
+class TestImportEngine(ImportExportBase):
+    """
+    Tests the import engine directly
+    """
+
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            register(self.app, u'test@example.com', u'test')
+            create_event(creator_email='test@example.com')
+            create_services(1, '1')
+            create_services(1, '2')
+            create_session(1, '3', track=1, session_type=1, microlocation=1, speakers=[1, 2])
+
+    def test_imports_are_isolated(self):
+        data = self._do_successful_export(1).data
+        fd, zip_path = tempfile.mkstemp(suffix='.zip')
+        os.write(fd, data)
+        os.close(fd)
+        try:
+            with app.test_request_context():
+                g.user = User.query.filter_by(email='test@example.com').first()
+                event_ids = [import_event_json(zip_path, None).id for _ in range(2)]
+                for event_id in event_ids:
+                    sessions = Session.query.filter_by(event_id=event_id).all()
+                    self.assertEqual(len(sessions), 3)
+                    session = [item for item in sessions if item.title == 'TestSession1_3'][0]
+                    # the relations point to the objects imported with the session
+                    self.assertEqual(session.track.event_id, event_id)
+                    self.assertEqual(session.microlocation.event_id, event_id)
+                    self.assertEqual([speaker.event_id for speaker in session.speakers], [event_id, event_id])
+                # the workspaces are removed
+                self.assertEqual(os.listdir(app.config['BASE_DIR'] + IMPORT_WORKSPACES), [])
+        finally:
+            os.remove(zip_path)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+import time
+import unittest
+
+from app.helpers.cache import LRUCache, TieredCache, namespaced_key, stats
+
+
+class TestLRUCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        lru = LRUCache(max_size=2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        # touch `a` so `b` becomes the least recently used
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+        self.assertEqual(len(lru), 2)
+        self.assertEqual(lru.get('b'), None)
+        self.assertEqual(lru.get('a'), 1)
+        self.assertEqual(lru.get('c'), 3)
+
+    def test_timeout(self):
+        lru = LRUCache()
+        lru.set('a', 1, timeout=0.01)
+        time.sleep(0.02)
+        self.assertEqual(lru.get('a'), None)
+        self.assertFalse(lru.has('a'))
+
+    def test_values_are_copies(self):
+        lru = LRUCache()
+        value = {'a': [1]}
+        lru.set('k', value)
+        value['a'].append(2)
+        self.assertEqual(lru.get('k'), {'a': [1]})
+
+
+class TestTieredCache(unittest.TestCase):
+    def setUp(self):
+        stats.reset()
+        self.shared = LRUCache()
+        self.cache = TieredCache(self.shared, LRUCache(), local_timeout=5)
+
+    def test_hit_and_miss_counters(self):
+        self.assertEqual(self.cache.get('a'), None)
+        self.cache.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        counters = stats.as_dict()
+        self.assertEqual(counters['misses'], 1)
+        self.assertEqual(counters['local_hits'], 1)
+        self.assertEqual(counters['sets'], 1)
+        self.assertEqual(counters['hit_ratio'], 0.5)
+
+    def test_reads_through_to_shared_tier(self):
+        # written by another worker
+        self.shared.set('a', 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertEqual(self.cache.get('a'), 1)
+        counters = stats.as_dict()
+        self.assertEqual(counters['shared_hits'], 1)
+        self.assertEqual(counters['local_hits'], 1)
+
+    def test_delete_drops_both_tiers(self):
+        self.cache.set('a', 1)
+        self.cache.delete('a')
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(self.shared.get('a'), None)
+
+    def test_namespaced_key(self):
+        self.assertEqual(namespaced_key('event', 12, 'schedule'), 'event:12:schedule')
+
+
+if __name__ == '__main__':
+    unittest.main()
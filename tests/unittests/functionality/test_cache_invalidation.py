@@ -0,0 +1,53 @@
+import unittest
+
+from app import current_app as app
+from app.helpers.cache import cache, LRUCache, TieredCache
+from app.helpers.cache_invalidation import get_event_fragment, set_event_fragment, invalidate_event_cache
+from app.models import db
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestEventCacheInvalidation(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        # caching is disabled for tests, plug a local cache in
+        self.old_backend = app.extensions['cache'][cache]
+        app.extensions['cache'][cache] = TieredCache(LRUCache())
+        with app.test_request_context():
+            db.session.add(ObjectMother.get_event())
+            db.session.commit()
+
+    def tearDown(self):
+        app.extensions['cache'][cache] = self.old_backend
+        super(TestEventCacheInvalidation, self).tearDown()
+
+    def test_invalidate_event_cache(self):
+        with app.test_request_context():
+            set_event_fragment(1, 'page', 'home')
+            set_event_fragment(2, 'page', 'home')
+            self.assertEqual(get_event_fragment(1, 'home'), 'page')
+            invalidate_event_cache(1)
+            self.assertEqual(get_event_fragment(1, 'home'), None)
+            # other events are untouched
+            self.assertEqual(get_event_fragment(2, 'home'), 'page')
+
+    def test_commit_invalidates_event(self):
+        with app.test_request_context():
+            set_event_fragment(1, 'page', 'home')
+            db.session.add(ObjectMother.get_session(event_id=1))
+            db.session.commit()
+            self.assertEqual(get_event_fragment(1, 'home'), None)
+
+    def test_rollback_keeps_cache(self):
+        with app.test_request_context():
+            set_event_fragment(1, 'page', 'home')
+            db.session.add(ObjectMother.get_session(event_id=1))
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(get_event_fragment(1, 'home'), 'page')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.exporters.attendee_csv import AttendeeCsv
+from app.helpers.exporters.helpers import iter_csv
+from app.helpers.exporters.order_csv import OrderCsv
+from app.models.discount_code import DiscountCode, TICKET
+from app.models.order import Order, OrderTicket
+from app.models.ticket import Ticket
+from app.models.ticket_holder import TicketHolder
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestCsvExport(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            event = ObjectMother.get_event()
+            save_to_db(event)
+            ticket = Ticket(name='Paid', event=event, quantity=100, price=20.0,
+                            sales_start=datetime.now() - timedelta(days=5),
+                            sales_end=datetime.now() + timedelta(days=5))
+            save_to_db(ticket)
+            discount = DiscountCode(code='HALF', value=50.0, type='percent', event_id=event.id, used_for=TICKET)
+            discount.tickets = str(ticket.id)
+            save_to_db(discount)
+            for index, (status, discount_id) in enumerate((('completed', discount.id), ('deleted', None),
+                                                          ('placed', None))):
+                order = Order(event_id=event.id, identifier='order-%d' % index, amount=20.0, user_id=user.id,
+                              discount_code_id=discount_id)
+                order.status = status
+                order_ticket = OrderTicket()
+                order_ticket.ticket_id = ticket.id
+                order_ticket.quantity = 2
+                order.tickets.append(order_ticket)
+                save_to_db(order)
+                for name in ('First', 'Second'):
+                    holder = TicketHolder(firstname=name, lastname='Attendee', email='%s@example.com' % name)
+                    holder.ticket_id = ticket.id
+                    holder.order_id = order.id
+                    save_to_db(holder)
+            self.event_id = event.id
+
+    def test_attendee_export(self):
+        with app.test_request_context():
+            rows = list(AttendeeCsv.export(self.event_id))
+            self.assertEqual(rows[0][0], 'Order#')
+            # the attendees of the deleted order are skipped
+            self.assertEqual(len(rows), 5)
+            prices = sorted(row[9] for row in rows[1:])
+            self.assertEqual(prices, ['10.0', '10.0', '20.0', '20.0'])
+
+    def test_order_export(self):
+        with app.test_request_context():
+            rows = list(OrderCsv.export(self.event_id))
+            self.assertEqual(len(rows), 3)
+            self.assertEqual([row[5] for row in rows[1:]], ['2', '2'])
+            self.assertEqual(sorted(row[6] for row in rows[1:]), ['', 'HALF'])
+
+    def test_iter_csv_chunks(self):
+        rows = [['a', 'b']] * 5
+        chunks = list(iter_csv(rows, chunk_rows=2))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(''.join(chunks), 'a,b\r\n' * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from datetime import date, timedelta
+
+from app import current_app as app
+from app.helpers.fx_rates import FxRates, get_rates, refresh_rates, invalidate_rates
+from app.helpers.payment import forex
+from app.models.fx_rate import FxRate
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class StaticProvider(object):
+    def __init__(self, rates):
+        self.rates = rates
+
+    def get_rates(self, base):
+        return self.rates
+
+
+class TestFxRates(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        invalidate_rates()
+
+    def test_conversions(self):
+        rates = FxRates({'EUR': 0.8, 'INR': 64.0}, 'USD')
+        self.assertEqual(rates.convert('USD', 'EUR', 10), 8.0)
+        self.assertEqual(rates.convert('EUR', 'INR', 8), 640.0)
+        self.assertEqual(rates.convert('EUR', 'EUR', 3), 3)
+        # unknown currencies are not converted
+        self.assertEqual(rates.convert('XYZ', 'USD', 5), 5)
+        self.assertEqual(rates.convert_many('USD', 'INR', [1, 2, None]), [64.0, 128.0, None])
+        self.assertEqual(rates.convert_all('USD', [('EUR', 8), ('INR', 64)]), [10.0, 1.0])
+
+    def test_refresh_from_fixture(self):
+        with app.test_request_context():
+            self.assertEqual(forex('USD', 'EUR', 10), 10)
+            self.assertEqual(refresh_rates(), 4)
+            self.assertEqual(FxRate.query.filter_by(day=date.today()).count(), 4)
+            self.assertEqual(forex('USD', 'EUR', 10), 8.0)
+            self.assertEqual(forex('GBP', 'SGD', 2), 5.0)
+            # refreshing the same day again replaces the rates
+            refresh_rates()
+            self.assertEqual(FxRate.query.filter_by(day=date.today()).count(), 4)
+
+    def test_latest_day_is_used(self):
+        with app.test_request_context():
+            refresh_rates(StaticProvider({'EUR': 0.5}), day=date.today() - timedelta(days=1))
+            refresh_rates(StaticProvider({'EUR': 0.9}))
+            self.assertEqual(get_rates().day, date.today())
+            self.assertEqual(forex('USD', 'EUR', 10), 9.0)
+
+    def test_only_stored_rates_are_counted(self):
+        with app.test_request_context():
+            self.assertEqual(refresh_rates(StaticProvider({'EUR': 0.9, 'XYZ': None})), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.job_runner import get_watermark
+from app.helpers.log_writer import flush_logs
+from app.helpers.scheduled_jobs import send_after_event_mail, empty_trash
+from app.models import db
+from app.models.event import Event
+from app.models.mail import Mail, AFTER_EVENT
+from app.models.order import Order
+from app.models.role import Role
+from app.models.user import User
+from app.models.users_events_roles import UsersEventsRoles
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestIncrementalJobs(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        now = datetime.now()
+        with app.test_request_context():
+            self.events = []
+            # ended recently, ended before the first run window, not ended yet
+            for index, end_time in enumerate((now - timedelta(hours=2), now - timedelta(days=3),
+                                              now + timedelta(days=1))):
+                event = ObjectMother.get_event()
+                event.end_time = end_time
+                save_to_db(event)
+                for role_name in ('organizer', 'speaker'):
+                    user = User(password='test', email='%s-%d@example.com' % (role_name, index))
+                    save_to_db(user)
+                    save_to_db(UsersEventsRoles(user=user, event=event,
+                                                role=Role.query.filter_by(name=role_name).first()))
+                self.events.append(event.id)
+
+    def after_event_recipients(self):
+        flush_logs()
+        return sorted(mail.recipient for mail in Mail.query.filter_by(action=AFTER_EVENT))
+
+    def test_after_event_mails_are_sent_once(self):
+        with app.test_request_context():
+            send_after_event_mail()
+            self.assertEqual(self.after_event_recipients(), ['organizer-0@example.com', 'speaker-0@example.com'])
+            watermark, last_id = get_watermark('send_after_event_mail')
+            self.assertEqual(last_id, self.events[0])
+
+            send_after_event_mail()
+            self.assertEqual(len(self.after_event_recipients()), 2)
+
+            Event.query.filter_by(id=self.events[2]).update({'end_time': datetime.now() - timedelta(minutes=5)})
+            db.session.commit()
+            send_after_event_mail()
+            self.assertEqual(self.after_event_recipients(), ['organizer-0@example.com', 'organizer-2@example.com',
+                                                             'speaker-0@example.com', 'speaker-2@example.com'])
+
+    def test_empty_trash(self):
+        with app.test_request_context():
+            Event.query.filter_by(id=self.events[0]).update({'deleted_at': datetime.now() - timedelta(days=31)})
+            Event.query.filter_by(id=self.events[1]).update({'deleted_at': datetime.now() - timedelta(days=10)})
+            old_order, new_order = Order(event_id=self.events[2]), Order(event_id=self.events[2])
+            old_order.status = new_order.status = 'pending'
+            old_order.created_at = datetime.utcnow() - timedelta(days=4)
+            save_to_db(old_order)
+            save_to_db(new_order)
+            old_order_id, new_order_id = old_order.id, new_order.id
+
+            empty_trash()
+            self.assertIsNone(Event.query.get(self.events[0]))
+            self.assertIsNotNone(Event.query.get(self.events[1]))
+            self.assertEqual(Order.query.get(old_order_id).status, 'expired')
+            self.assertEqual(Order.query.get(new_order_id).status, 'pending')
+
+
+if __name__ == '__main__':
+    unittest.main()
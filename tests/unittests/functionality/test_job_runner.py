@@ -0,0 +1,76 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.job_runner import JOBS, register_job, run_job, job_lock, last_run, beat_schedule
+from app.models import db
+from app.models.job_run import JobRun, JOB_SUCCEEDED, JOB_FAILED
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestJobRunner(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        self.calls = []
+        register_job('test_job', lambda: self.calls.append(1), interval=timedelta(hours=1))
+
+    def tearDown(self):
+        JOBS.pop('test_job', None)
+        JOBS.pop('failing_job', None)
+        super(TestJobRunner, self).tearDown()
+
+    def test_job_runs_once_per_period(self):
+        with app.test_request_context():
+            self.assertEqual(run_job('test_job'), JOB_SUCCEEDED)
+            # another process firing a moment later
+            self.assertIsNone(run_job('test_job'))
+            self.assertEqual(len(self.calls), 1)
+            self.assertEqual(run_job('test_job', trigger='cli', force=True), JOB_SUCCEEDED)
+            self.assertEqual(len(self.calls), 2)
+            self.assertEqual(JobRun.query.filter_by(name='test_job').count(), 2)
+            run = last_run('test_job')
+            self.assertEqual(run.trigger, 'cli')
+            self.assertIsNotNone(run.finished_at)
+
+    def test_job_runs_again_after_half_its_period(self):
+        with app.test_request_context():
+            run_job('test_job')
+            JobRun.query.filter_by(name='test_job').update({'started_at': datetime.utcnow() - timedelta(minutes=31)})
+            db.session.commit()
+            self.assertEqual(run_job('test_job'), JOB_SUCCEEDED)
+            self.assertEqual(len(self.calls), 2)
+
+    def test_locked_job_is_skipped(self):
+        with app.test_request_context():
+            with job_lock('test_job') as acquired:
+                self.assertTrue(acquired)
+                self.assertIsNone(run_job('test_job', force=True))
+            self.assertEqual(self.calls, [])
+            self.assertIsNone(last_run('test_job'))
+
+    def test_failed_run_is_recorded(self):
+        def fail():
+            raise ValueError('no luck')
+
+        register_job('failing_job', fail, interval=timedelta(hours=1))
+        with app.test_request_context():
+            self.assertEqual(run_job('failing_job'), JOB_FAILED)
+            run = last_run('failing_job')
+            self.assertEqual(run.status, JOB_FAILED)
+            self.assertIn('no luck', run.error)
+            # a failed run does not hold the next one back
+            self.assertEqual(run_job('failing_job'), JOB_FAILED)
+
+    def test_beat_schedule(self):
+        schedule = beat_schedule()
+        self.assertEqual(schedule['test_job']['schedule'], timedelta(hours=1))
+        self.assertEqual(schedule['test_job']['task'], 'jobs.run')
+        fee = schedule['send_event_fee_notification']['schedule']
+        self.assertEqual(fee.day_of_month, set([1]))
+        self.assertEqual(fee.hour, set([0]))
+        self.assertEqual(fee.minute, set([0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
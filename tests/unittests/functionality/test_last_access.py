@@ -0,0 +1,57 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.last_access import record_access, flush_last_access, pending_accesses
+from app.models import db
+from app.models.user import User
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestLastAccess(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            flush_last_access()
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            self.user_id = user.id
+
+    def test_accesses_are_coalesced(self):
+        with app.test_request_context():
+            user = User.query.get(self.user_id)
+            record_access(user, datetime(2017, 5, 1, 10, 0, 5))
+            record_access(user, datetime(2017, 5, 1, 10, 3, 50))
+            record_access(user, datetime(2017, 5, 1, 10, 2, 0))
+            self.assertEqual(pending_accesses(), {self.user_id: datetime(2017, 5, 1, 10, 3)})
+            # nothing is written before the flush
+            self.assertFalse(db.session.dirty)
+            self.assertEqual(flush_last_access(), 1)
+            self.assertEqual(pending_accesses(), {})
+            db.session.expire_all()
+            self.assertEqual(User.query.get(self.user_id).last_access_time, datetime(2017, 5, 1, 10, 3))
+
+    def test_recent_access_is_not_recorded(self):
+        with app.test_request_context():
+            user = User.query.get(self.user_id)
+            user.last_access_time = datetime(2017, 5, 1, 10, 0)
+            save_to_db(user)
+            record_access(user, datetime(2017, 5, 1, 10, 0, 40))
+            self.assertEqual(pending_accesses(), {})
+
+    def test_older_access_does_not_overwrite(self):
+        with app.test_request_context():
+            user = User.query.get(self.user_id)
+            record_access(user, datetime.now() - timedelta(days=1))
+            user.last_access_time = datetime.now()
+            save_to_db(user)
+            flush_last_access()
+            db.session.expire_all()
+            self.assertTrue(datetime.now() - User.query.get(self.user_id).last_access_time < timedelta(minutes=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
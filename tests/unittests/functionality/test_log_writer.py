@@ -0,0 +1,48 @@
+import unittest
+
+from app import current_app as app
+from app.helpers.data import record_activity
+from app.helpers.helpers import send_email
+from app.helpers.log_writer import flush_logs, queued_records, _batches
+from app.models.activity import Activity
+from app.models.mail import Mail
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestLogWriter(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            flush_logs()
+
+    def test_records_are_written_in_order(self):
+        with app.test_request_context():
+            for event_id in range(3):
+                record_activity('create_event', event_id=event_id)
+            send_email('attendee@example.com', 'Test Mail', 'Subject', '<p>Body</p>')
+            # nothing is written before the flush
+            self.assertEqual(len(queued_records()), 5)
+            self.assertEqual(Activity.query.count(), 0)
+            self.assertEqual(flush_logs(), 5)
+            self.assertEqual(queued_records(), [])
+            actions = [activity.action for activity in Activity.query.order_by(Activity.id)]
+            self.assertEqual(actions[:3], ['Event 0 created', 'Event 1 created', 'Event 2 created'])
+            self.assertTrue(actions[3].startswith('Mail send to attendee@example.com'))
+            mail = Mail.query.one()
+            self.assertEqual(mail.message, '<p>Body</p>')
+
+    def test_request_teardown_flushes(self):
+        with app.test_request_context():
+            record_activity('create_event', event_id=1)
+        with app.test_request_context():
+            self.assertEqual(queued_records(), [])
+            self.assertEqual(Activity.query.count(), 1)
+
+    def test_batches_keep_order(self):
+        records = [('a', 1), ('a', 2), ('b', 3), ('a', 4)]
+        self.assertEqual(list(_batches(records)), [('a', [1, 2]), ('b', [3]), ('a', [4])])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import time
+import unittest
+
+from app import current_app as app
+from app.helpers.mail_dispatch import queue_mail, dispatch_mails, send_batch, stop_mailers, MAIL_BATCH_SIZE
+from tests.unittests.setup_database import Setup
+from tests.unittests.smtp_sink import SmtpSink
+from tests.unittests.utils import OpenEventTestCase
+
+
+def payload(index):
+    return {
+        'to': 'attendee%d@example.com' % index,
+        'from': 'Open Event<noreply@example.com>',
+        'subject': 'Mail %d' % index,
+        'html': '<p>Mail <b>%d</b></p>' % index,
+    }
+
+
+class TestMailDispatch(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        self.sink = SmtpSink().start()
+
+    def tearDown(self):
+        stop_mailers()
+        self.sink.stop()
+        super(TestMailDispatch, self).tearDown()
+
+    def wait_for(self, count):
+        deadline = time.time() + 5
+        while len(self.sink.messages) < count and time.time() < deadline:
+            time.sleep(0.01)
+
+    def test_batch_shares_the_connection(self):
+        result = send_batch(self.sink.config(), [payload(index) for index in range(20)])
+        self.wait_for(20)
+        self.assertEqual(result['sent'], 20)
+        self.assertTrue(result['rate'] > 0)
+        self.assertEqual(len(self.sink.messages), 20)
+        self.assertEqual(self.sink.connections, 1)
+        # the next batch reuses the connection too
+        send_batch(self.sink.config(), [payload(20)])
+        self.wait_for(21)
+        self.assertEqual(self.sink.connections, 1)
+
+    def test_queued_mails_are_sent_in_batches(self):
+        count = MAIL_BATCH_SIZE * 2 + 1
+        with app.app_context():
+            for index in range(count):
+                queue_mail(self.sink.config(), payload(index))
+            self.assertEqual(self.sink.messages, [])
+            # done when the app context is torn down, celery is eager in tests
+            dispatch_mails()
+        self.wait_for(count)
+        self.assertEqual(len(self.sink.messages), count)
+        self.assertEqual(self.sink.connections, 1)
+        recipients = [rcpttos[0] for _, rcpttos, _ in self.sink.messages]
+        self.assertEqual(recipients, ['attendee%d@example.com' % index for index in range(count)])
+
+
+if __name__ == '__main__':
+    unittest.main()
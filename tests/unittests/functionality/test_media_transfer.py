@@ -0,0 +1,88 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import zipfile
+
+from app import current_app as app
+from app.api.helpers.export_helpers import export_event_json
+from app.api.helpers.media_transfer import MediaFetcher, run_parallel
+from tests.unittests.api.utils import create_event, create_services, save_to_db, Speaker
+from tests.unittests.auth_helper import register
+from tests.unittests.http_stand_in import HttpStandIn
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+PHOTO = '\x89PNG' + 'photo' * 1000
+
+MEDIA = {
+    '/photo.png': ('image/png', PHOTO),
+    '/same_photo.png': ('image/png', PHOTO),
+    '/other.png': ('image/png', '\x89PNG' + 'other' * 1000),
+    '/page.html': ('text/html', '<html></html>'),
+}
+
+EXPORT_SETTINGS = {'image': True, 'video': False, 'audio': False, 'document': False}
+
+
+class TestMediaTransfer(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        self.server = HttpStandIn(dict(MEDIA)).start()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        super(TestMediaTransfer, self).tearDown()
+
+    def test_run_parallel_keeps_order(self):
+        def square(number):
+            if number == 3:
+                raise ValueError()
+            return number * number
+
+        with app.test_request_context():
+            self.assertEqual(run_parallel(square, range(6), workers=3), [0, 1, 4, None, 16, 25])
+
+    def test_fetch_all_dedupes(self):
+        urls = [self.server.url(path) for path in
+                ['/photo.png', '/photo.png', '/same_photo.png', '/other.png', '/page.html', '/missing.png']]
+        with app.test_request_context():
+            fetched = MediaFetcher(self.directory).fetch_all(urls)
+        # one request per url
+        self.assertEqual(sorted(self.server.requests),
+                         ['/missing.png', '/other.png', '/page.html', '/photo.png', '/same_photo.png'])
+        self.assertEqual(set(fetched), set(urls[:4]))
+        # one file per content
+        self.assertEqual(fetched[urls[0]].path, fetched[urls[2]].path)
+        self.assertNotEqual(fetched[urls[0]].path, fetched[urls[3]].path)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        with open(fetched[urls[0]].path, 'rb') as f:
+            self.assertEqual(f.read(), PHOTO)
+
+    def test_export_saves_shared_media_once(self):
+        with app.test_request_context():
+            register(self.app, u'test@example.com', u'test')
+            event_id = create_event(creator_email=u'test@example.com')
+            create_services(event_id)
+            for index, path in enumerate(['/photo.png', '/same_photo.png', '/other.png', '/page.html']):
+                save_to_db(Speaker(name='Speaker %d' % index, email='speaker%d@example.com' % index,
+                                   organisation='org', country='japan', event_id=event_id,
+                                   photo=self.server.url(path)))
+            zip_path = export_event_json(event_id, EXPORT_SETTINGS)
+        with zipfile.ZipFile(zip_path) as z:
+            names = z.namelist()
+            speakers = json.loads(z.read('speakers'))
+        photos = dict((speaker['name'], speaker['photo']) for speaker in speakers)
+        self.assertEqual(photos['Speaker 0'], photos['Speaker 1'])
+        self.assertNotEqual(photos['Speaker 0'], photos['Speaker 2'])
+        # the page is not a media, the link is kept
+        self.assertEqual(photos['Speaker 3'], self.server.url('/page.html'))
+        self.assertEqual(len([name for name in names if name.startswith('images/speakers/')]), 2)
+        self.assertEqual(self.server.requests.count('/photo.png'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
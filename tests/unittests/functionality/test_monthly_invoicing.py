@@ -0,0 +1,80 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.invoicing import InvoicingManager
+from app.models.event_invoice import EventInvoice
+from app.models.fees import TicketFees
+from app.models.order import Order, OrderTicket
+from app.models.role import Role
+from app.models.ticket import Ticket
+from app.models.users_events_roles import UsersEventsRoles
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+PERIOD_END = datetime(2017, 6, 1)
+
+
+class TestMonthlyInvoicing(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            event = ObjectMother.get_event()
+            event.payment_currency = 'USD'
+            save_to_db(event)
+            save_to_db(UsersEventsRoles(user=user, event=event, role=Role.query.filter_by(name='organizer').first()))
+            save_to_db(TicketFees(currency='USD', service_fee=10.0, maximum_fee=5.0))
+            paid = Ticket(name='Paid', event=event, quantity=100, price=20.0,
+                          sales_start=datetime.now() - timedelta(days=5),
+                          sales_end=datetime.now() + timedelta(days=5))
+            free = Ticket(name='Free', event=event, quantity=100, price=0,
+                          sales_start=datetime.now() - timedelta(days=5),
+                          sales_end=datetime.now() + timedelta(days=5))
+            save_to_db(paid)
+            save_to_db(free)
+            self.user_id = user.id
+            self.event_id = event.id
+            self.paid_id = paid.id
+            self.free_id = free.id
+
+    def _order(self, completed_at, ticket_ids, status='completed', paid_via='stripe'):
+        order = Order(event_id=self.event_id, identifier='order-%s' % completed_at.isoformat(),
+                      amount=20.0, user_id=self.user_id, paid_via=paid_via)
+        order.status = status
+        order.completed_at = completed_at
+        for ticket_id in ticket_ids:
+            order_ticket = OrderTicket()
+            order_ticket.ticket_id = ticket_id
+            order_ticket.quantity = 2
+            order.tickets.append(order_ticket)
+        save_to_db(order)
+
+    def test_fees_are_invoiced_once(self):
+        with app.test_request_context():
+            self._order(datetime(2017, 5, 3), [self.paid_id, self.free_id])
+            self._order(datetime(2017, 5, 20), [self.paid_id])
+            self._order(datetime(2017, 5, 21), [self.paid_id], paid_via='free')
+            self._order(datetime(2017, 5, 22), [self.paid_id], status='pending')
+            # next period
+            self._order(datetime(2017, 6, 2), [self.paid_id])
+
+            self.assertEqual(InvoicingManager.get_monthly_fees(PERIOD_END), {self.event_id: 4.0})
+            invoices = InvoicingManager.create_monthly_invoices(PERIOD_END)
+            self.assertEqual([(invoice.event_id, invoice.amount, invoice.user_id) for invoice in invoices],
+                             [(self.event_id, 4.0, self.user_id)])
+            self.assertEqual(invoices[0].billed_until, PERIOD_END)
+
+            # running the job again for the same period does nothing
+            self.assertEqual(InvoicingManager.create_monthly_invoices(PERIOD_END), [])
+            self.assertEqual(EventInvoice.query.count(), 1)
+
+            invoices = InvoicingManager.create_monthly_invoices(datetime(2017, 7, 1))
+            self.assertEqual([invoice.amount for invoice in invoices], [2.0])
+
+
+if __name__ == '__main__':
+    unittest.main()
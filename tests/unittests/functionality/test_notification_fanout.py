@@ -0,0 +1,65 @@
+import unittest
+
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.log_writer import flush_logs
+from app.helpers.notification_email_triggers import trigger_after_purchase_notifications
+from app.helpers.notification_fanout import render, for_email
+from app.models.email_notifications import EmailNotification
+from app.models.mail import Mail, TICKET_PURCHASED_ORGANIZER
+from app.models.notifications import Notification
+from app.models.role import Role
+from app.models.user import User
+from app.models.users_events_roles import UsersEventsRoles
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestNotificationFanout(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            self.events = []
+            for index, staff in enumerate(((('organizer', 1), ('coorganizer', 0), ('organizer', None)),
+                                           (('organizer', 1),))):
+                event = ObjectMother.get_event()
+                save_to_db(event)
+                for position, (role_name, after_ticket_purchase) in enumerate(staff):
+                    user = User(password='test', email='%s-%d-%d@example.com' % (role_name, index, position))
+                    save_to_db(user)
+                    save_to_db(UsersEventsRoles(user=user, event=event,
+                                                role=Role.query.filter_by(name=role_name).first()))
+                    if after_ticket_purchase is not None:
+                        save_to_db(EmailNotification(after_ticket_purchase=after_ticket_purchase,
+                                                     user_id=user.id, event_id=event.id))
+                self.events.append(event.id)
+
+    def notify(self, event_id):
+        issued = len(get_debug_queries())
+        trigger_after_purchase_notifications('buyer@example.com', event_id, None, 'INV-1', 'http://example.com/o')
+        return len(get_debug_queries()) - issued
+
+    def test_preferences_are_respected(self):
+        with app.test_request_context():
+            self.notify(self.events[0])
+            flush_logs()
+            mails = Mail.query.filter_by(action=TICKET_PURCHASED_ORGANIZER).all()
+            self.assertEqual([mail.recipient for mail in mails], ['organizer-0-0@example.com'])
+            self.assertIn('buyer@example.com', mails[0].message)
+            # organizers and coorganizers are all notified
+            self.assertEqual(Notification.query.count(), 3)
+
+    def test_queries_do_not_grow_with_recipients(self):
+        with app.test_request_context():
+            self.assertEqual(self.notify(self.events[0]), self.notify(self.events[1]))
+
+    def test_render_once(self):
+        html = render(u'Hi {email}, {name}', name=u'{not a field}')
+        self.assertEqual(for_email(html, u'a@example.com'), u'Hi a@example.com, {not a field}')
+
+
+if __name__ == '__main__':
+    unittest.main()
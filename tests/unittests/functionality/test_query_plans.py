@@ -0,0 +1,141 @@
+"""
+Query plan regression tests.
+
+Runs the canonical DataGetter/TicketingManager queries against a seeded
+database, then EXPLAINs every statement they issued with sequential scans
+disabled. The planner still picks a sequential scan when no index can
+serve a query, so a Seq Scan on one of the tables under test means an
+index is missing or the query stopped matching it.
+"""
+import unittest
+from datetime import datetime, timedelta
+
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.data_getter import DataGetter
+from app.helpers.ticket_inventory import TicketInventory
+from app.helpers.ticketing import TicketingManager
+from app.models import db
+from app.models.discount_code import DiscountCode, TICKET
+from app.models.order import Order, OrderTicket
+from app.models.role import Role
+from app.models.session import Session
+from app.models.ticket import Ticket
+from app.models.ticket_holder import TicketHolder
+from app.models.users_events_roles import UsersEventsRoles
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+EVENTS = 5
+ROWS_PER_EVENT = 40
+
+
+def is_postgres():
+    return app.config['SQLALCHEMY_DATABASE_URI'].find('postgresql://') > -1
+
+
+def seq_scans(plan):
+    """Returns the relations read with a sequential scan in a JSON plan"""
+    relations = []
+    if plan.get('Node Type') == 'Seq Scan':
+        relations.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        relations.extend(seq_scans(child))
+    return relations
+
+
+@unittest.skipUnless(is_postgres(), 'query plans are checked on postgresql')
+class TestQueryPlans(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            role = Role.query.filter_by(name='organizer').first()
+            for index in range(EVENTS):
+                event = ObjectMother.get_event()
+                event.name = 'Plan Event %d' % index
+                save_to_db(event)
+                ticket = Ticket(name='Ticket', event=event, quantity=1000, price=10.0,
+                                sales_start=datetime.now() - timedelta(days=5),
+                                sales_end=datetime.now() + timedelta(days=5))
+                db.session.add(ticket)
+                db.session.add(UsersEventsRoles(user=user, event=event, role=role))
+                for row in range(ROWS_PER_EVENT):
+                    db.session.add(Session(title='Session %d' % row, event_id=event.id,
+                                           state='accepted' if row % 2 else 'pending'))
+                    db.session.add(DiscountCode(code='CODE%d' % row, value=10.0, type='percent',
+                                                event_id=event.id, used_for=TICKET))
+                    order = Order(event_id=event.id, identifier='plan-%d-%d' % (index, row), amount=10.0,
+                                  user_id=user.id)
+                    order.status = 'completed'
+                    order_ticket = OrderTicket()
+                    order_ticket.ticket = ticket
+                    order_ticket.quantity = 1
+                    order.tickets.append(order_ticket)
+                    db.session.add(order)
+                    db.session.add(TicketHolder(firstname='Holder', ticket_id=ticket.id, order=order))
+                db.session.commit()
+            db.engine.execute('ANALYZE')
+            self.event_id = event.id
+            self.identifier = event.identifier
+            self.user_id = user.id
+            self.ticket_id = ticket.id
+
+    def assertNoSeqScan(self, tables, func):
+        """Runs `func` and checks the plans of the statements it issued"""
+        issued = len(get_debug_queries())
+        func()
+        queries = get_debug_queries()[issued:]
+        self.assertTrue(queries, 'nothing was queried')
+        cursor = db.session.connection().connection.cursor()
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            for query in queries:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + query.statement, query.parameters)
+                plan = cursor.fetchone()[0][0]['Plan']
+                scanned = [table for table in seq_scans(plan) if table in tables]
+                self.assertEqual(scanned, [], 'Seq Scan on %s for %s' % (', '.join(scanned), query.statement))
+        finally:
+            cursor.execute('RESET enable_seqscan')
+
+    def test_sessions(self):
+        with app.test_request_context():
+            self.assertNoSeqScan(['session'], lambda: DataGetter.get_sessions_by_event_id(self.event_id).all())
+            self.assertNoSeqScan(['session'], lambda: DataGetter.get_sessions_by_state_and_event_id(
+                'accepted', self.event_id).all())
+
+    def test_orders(self):
+        with app.test_request_context():
+            self.assertNoSeqScan(['orders'], lambda: TicketingManager.get_orders(self.event_id))
+            self.assertNoSeqScan(['orders'], lambda: TicketingManager.get_orders(self.event_id, status='completed'))
+            self.assertNoSeqScan(['orders_tickets'], lambda: TicketInventory.get_sold_counts([self.ticket_id]))
+
+    def test_ticket_holders(self):
+        with app.test_request_context():
+            order = Order.query.filter_by(event_id=self.event_id).first()
+            self.assertNoSeqScan(['ticket_holders'], lambda: list(order.ticket_holders))
+
+    def test_roles(self):
+        with app.test_request_context():
+            self.assertNoSeqScan(['users_events_roles'],
+                                 lambda: DataGetter.get_event_roles_for_user(self.user_id).all())
+            self.assertNoSeqScan(['users_events_roles'],
+                                 lambda: DataGetter.get_user_event_roles_by_role_name(self.event_id,
+                                                                                      'organizer').all())
+
+    def test_discount_codes(self):
+        with app.test_request_context():
+            self.assertNoSeqScan(['discount_codes'],
+                                 lambda: TicketingManager.get_discount_code(self.event_id, 'CODE3'))
+
+    def test_event_by_identifier(self):
+        with app.test_request_context():
+            self.assertNoSeqScan(['events'], lambda: DataGetter.get_event_by_identifier(self.identifier))
+
+
+if __name__ == '__main__':
+    unittest.main()
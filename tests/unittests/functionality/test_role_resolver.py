@@ -0,0 +1,78 @@
+import unittest
+
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app import current_app as app
+from app.helpers.data import save_to_db, delete_from_db
+from app.models.role import Role
+from app.models.session import Session
+from app.models.system_role import CustomSysRole, UserSystemRole
+from app.models.track import Track
+from app.models.user import User
+from app.models.users_events_roles import UsersEventsRoles
+from app.views.super_admin import SALES
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestRoleResolver(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            event = ObjectMother.get_event()
+            save_to_db(event)
+            save_to_db(UsersEventsRoles(user=user, event=event, role=Role.query.filter_by(name='coorganizer').first()))
+            self.user_id = user.id
+            self.event_id = event.id
+
+    def test_roles_are_loaded_once_per_request(self):
+        with app.test_request_context():
+            user = User.query.get(self.user_id)
+            self.assertTrue(user.is_coorganizer(self.event_id))
+            issued = len(get_debug_queries())
+            self.assertFalse(user.is_organizer(self.event_id))
+            self.assertTrue(user.has_role(str(self.event_id)))
+            self.assertFalse(user.has_role(self.event_id + 1))
+            self.assertFalse(user.is_registrar(self.event_id))
+            self.assertEqual(len(get_debug_queries()), issued)
+
+    def test_permissions(self):
+        with app.test_request_context():
+            user = User.query.get(self.user_id)
+            self.assertTrue(user.can_update(Session, self.event_id))
+            self.assertFalse(user.can_create(Session, self.event_id))
+            issued = len(get_debug_queries())
+            self.assertTrue(user.can_read(Track, self.event_id))
+            self.assertFalse(user.can_delete(Track, self.event_id))
+            self.assertFalse(user.can_update(Session, self.event_id + 1))
+            self.assertEqual(len(get_debug_queries()), issued)
+
+    def test_role_changes_are_seen(self):
+        with app.test_request_context():
+            user = User.query.get(self.user_id)
+            self.assertFalse(user.is_organizer(self.event_id))
+            uer = UsersEventsRoles(user=user, event_id=self.event_id,
+                                   role=Role.query.filter_by(name='organizer').first())
+            save_to_db(uer)
+            self.assertTrue(user.is_organizer(self.event_id))
+            self.assertTrue(user.can_create(Session, self.event_id))
+            delete_from_db(uer, 'UER deleted')
+            self.assertFalse(user.is_organizer(self.event_id))
+
+    def test_admin_panels(self):
+        with app.test_request_context():
+            user = User.query.get(self.user_id)
+            self.assertFalse(user.can_access_panel(SALES))
+            self.assertFalse(user.first_access_panel())
+            role = CustomSysRole.query.filter_by(name='Marketer').first()
+            save_to_db(UserSystemRole(user, role))
+            self.assertTrue(user.is_sys_role(role.id))
+            self.assertTrue(user.can_access_panel(SALES))
+            self.assertEqual(user.first_access_panel(), SALES)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.fx_rates import refresh_rates, invalidate_rates
+from app.helpers.sales_rollup import SalesRollupManager
+from app.models.fees import TicketFees
+from app.models.order import Order, OrderTicket
+from app.models.sales_rollup import SalesRollup
+from app.models.ticket import Ticket
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestSalesRollup(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            event = ObjectMother.get_event()
+            event.payment_currency = 'USD'
+            save_to_db(event)
+            save_to_db(TicketFees(currency='USD', service_fee=10.0, maximum_fee=5.0))
+            ticket = Ticket(name='Paid', event=event, quantity=100, price=20.0,
+                            sales_start=datetime.now() - timedelta(days=5),
+                            sales_end=datetime.now() + timedelta(days=5))
+            save_to_db(ticket)
+            self.user_id = user.id
+            self.event_id = event.id
+            self.ticket_id = ticket.id
+
+    def _order(self, status, quantity, created_at=None):
+        order = Order(event_id=self.event_id, identifier='%s-%d' % (status, quantity),
+                      amount=quantity * 20.0, user_id=self.user_id, paid_via='stripe')
+        order.status = status
+        if created_at:
+            order.created_at = created_at
+        order_ticket = OrderTicket()
+        order_ticket.ticket_id = self.ticket_id
+        order_ticket.quantity = quantity
+        order.tickets.append(order_ticket)
+        save_to_db(order)
+        return order
+
+    def _rollups(self):
+        return dict(((rollup.day, rollup.status), rollup) for rollup in
+                    SalesRollup.query.filter_by(event_id=self.event_id))
+
+    def _snapshot(self):
+        return sorted((day, status, rollup.orders_count, rollup.tickets_count, rollup.total_sales,
+                       rollup.ticket_sales, rollup.fee_amount)
+                      for (day, status), rollup in self._rollups().items())
+
+    def test_orders_update_rollups(self):
+        with app.test_request_context():
+            today = datetime.utcnow().date()
+            self._order('completed', 2)
+            order = self._order('pending', 3)
+            rollups = self._rollups()
+            self.assertEqual(rollups[(today, 'completed')].tickets_count, 2)
+            self.assertEqual(rollups[(today, 'completed')].total_sales, 40.0)
+            self.assertEqual(rollups[(today, 'completed')].ticket_sales, 40.0)
+            self.assertEqual(rollups[(today, 'completed')].fee_amount, 2.0)
+            self.assertEqual(rollups[(today, 'pending')].orders_count, 1)
+
+            order.status = 'completed'
+            save_to_db(order)
+            rollups = self._rollups()
+            self.assertNotIn((today, 'pending'), rollups)
+            self.assertEqual(rollups[(today, 'completed')].orders_count, 2)
+            self.assertEqual(rollups[(today, 'completed')].tickets_count, 5)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        with app.test_request_context():
+            self._order('completed', 1)
+            self._order('placed', 4, created_at=datetime.utcnow() - timedelta(days=3))
+            self._order('expired', 2, created_at=datetime.utcnow() - timedelta(days=3))
+            incremental = self._snapshot()
+            SalesRollup.query.delete()
+            SalesRollupManager.rebuild()
+            self.assertEqual(self._snapshot(), incremental)
+
+    def test_get_sales(self):
+        with app.test_request_context():
+            self._order('completed', 1)
+            self._order('completed', 2, created_at=datetime.utcnow() - timedelta(days=10))
+            self._order('initialized', 3)
+            sales = dict(((row[0], row[1]), row) for row in SalesRollupManager.get_sales())
+            self.assertEqual(sales[(self.event_id, 'completed')][4], 3)
+            self.assertEqual(sales[(self.event_id, 'pending')][4], 3)
+            recent = SalesRollupManager.get_sales(from_date=datetime.utcnow() - timedelta(days=1),
+                                                  status='completed')
+            self.assertEqual([row[4] for row in recent], [1])
+
+    def test_sales_in_currency(self):
+        with app.test_request_context():
+            self._order('completed', 2)
+            invalidate_rates()
+            refresh_rates()
+            sales = SalesRollupManager.get_sales()
+            converted = SalesRollupManager.in_currency(sales, 'EUR')
+            self.assertEqual([row[:5] for row in converted], [row[:2] + ('EUR',) + row[3:5] for row in sales])
+            for row, converted_row in zip(sales, converted):
+                for amount, converted_amount in zip(row[5:], converted_row[5:]):
+                    self.assertAlmostEqual(converted_amount, amount * 0.8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+from datetime import datetime, timedelta
+
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.sales_summary import SalesSummary
+from app.models.discount_code import DiscountCode, TICKET
+from app.models.event import Event
+from app.models.fees import TicketFees
+from app.models.order import Order, OrderTicket
+from app.models.ticket import Ticket
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestSalesSummary(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            user = ObjectMother.get_user()
+            save_to_db(user)
+            event = ObjectMother.get_event()
+            event.payment_currency = 'USD'
+            save_to_db(event)
+            save_to_db(TicketFees(currency='USD', service_fee=10.0, maximum_fee=5.0))
+            ticket = Ticket(name='Paid', event=event, quantity=100, price=20.0,
+                            sales_start=datetime.now() - timedelta(days=5),
+                            sales_end=datetime.now() + timedelta(days=5))
+            save_to_db(ticket)
+            discount = DiscountCode(code='HALF', value=50.0, type='percent', event_id=event.id, used_for=TICKET)
+            discount.tickets = str(ticket.id)
+            save_to_db(discount)
+            self.user_id = user.id
+            self.event_id = event.id
+            self.ticket_id = ticket.id
+            self.discount_id = discount.id
+
+    def _order(self, status, quantity, amount, discount_code_id=None):
+        order = Order(event_id=self.event_id, identifier='%s-%d-%d' % (status, quantity, amount),
+                      amount=amount, user_id=self.user_id, discount_code_id=discount_code_id, paid_via='stripe')
+        order.status = status
+        order_ticket = OrderTicket()
+        order_ticket.ticket_id = self.ticket_id
+        order_ticket.quantity = quantity
+        order.tickets.append(order_ticket)
+        save_to_db(order)
+
+    def _summaries(self):
+        return SalesSummary.get_summaries(Event.query.get(self.event_id))
+
+    def test_summaries(self):
+        with app.test_request_context():
+            # fee 10% of 20 per ticket
+            self._order('completed', 1, 22)
+            # fee capped at 5 for the line
+            self._order('completed', 3, 65)
+            self._order('completed', 2, 22, discount_code_id=self.discount_id)
+            self._order('initialized', 1, 22)
+            orders_summary, tickets_summary = self._summaries()
+            self.assertEqual(orders_summary['completed']['orders_count'], 3)
+            self.assertEqual(orders_summary['completed']['tickets_count'], 6)
+            self.assertEqual(orders_summary['completed']['total_sales'], 109)
+            self.assertEqual(orders_summary['pending']['orders_count'], 1)
+            ticket_summary = tickets_summary[str(self.ticket_id)]
+            self.assertEqual(ticket_summary['completed']['tickets_count'], 6)
+            self.assertAlmostEqual(ticket_summary['completed']['sales'], 22 + 65 + 22)
+            self.assertAlmostEqual(ticket_summary['pending']['sales'], 22)
+
+    def test_constant_query_count(self):
+        with app.test_request_context():
+            self._order('completed', 2, 22, discount_code_id=self.discount_id)
+            self._summaries()
+            queries = len(get_debug_queries())
+            self._summaries()
+            first = len(get_debug_queries()) - queries
+            for i in range(10):
+                self._order('placed', i + 1, 22 * (i + 1), discount_code_id=self.discount_id)
+            queries = len(get_debug_queries())
+            self._summaries()
+            self.assertEqual(len(get_debug_queries()) - queries, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.exporters import export_scheduler
+from app.helpers.exporters.export_scheduler import dispatch_exports, mark_pending, run_exports, build_export, \
+    get_export_states
+from app.helpers.signals import sessions_modified, microlocations_modified
+from app.models import db
+from app.models.schedule_export import ScheduleExport, SCHEDULE_EXPORT_FORMATS
+from tests.unittests.api.utils import create_event
+from tests.unittests.auth_helper import register
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestScheduleExports(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            register(self.app, u'test@example.com', u'test')
+            self.event_id = create_event(creator_email=u'test@example.com')
+        self.queued = []
+        self.built = []
+        self._queue_task = export_scheduler._queue_task
+        self._build_export = export_scheduler.build_export
+        export_scheduler._queue_task = lambda event_id, countdown=None: self.queued.append((event_id, countdown))
+
+    def tearDown(self):
+        export_scheduler._queue_task = self._queue_task
+        export_scheduler.build_export = self._build_export
+        super(TestScheduleExports, self).tearDown()
+
+    def test_signals_are_coalesced(self):
+        with app.test_request_context():
+            for _ in range(50):
+                sessions_modified.send(app, event_id=self.event_id)
+            microlocations_modified.send(app, event_id=self.event_id)
+            dispatch_exports()
+            # a later request while the exports are pending
+            sessions_modified.send(app, event_id=self.event_id)
+            dispatch_exports()
+            self.assertEqual(len(self.queued), 1)
+            states = get_export_states(self.event_id)
+            self.assertEqual(list(states), list(SCHEDULE_EXPORT_FORMATS))
+            self.assertTrue(all(state.pending for state in states.values()))
+
+    def test_run_waits_for_the_debounce_window(self):
+        export_scheduler.build_export = lambda event_id, export_format: self.built.append(export_format)
+        eager = app.config.get('CELERY_ALWAYS_EAGER')
+        app.config['CELERY_ALWAYS_EAGER'] = False
+        try:
+            with app.test_request_context():
+                mark_pending(self.event_id, ['ical', 'xcal'])
+                run_exports(self.event_id)
+                self.assertEqual(self.built, [])
+                self.assertEqual(len(self.queued), 2)
+                self.assertTrue(self.queued[1][1] > 0)
+                ScheduleExport.query.update({'requested_at': datetime.utcnow() - timedelta(hours=1)})
+                db.session.commit()
+                run_exports(self.event_id)
+                self.assertEqual(sorted(self.built), ['ical', 'xcal'])
+        finally:
+            app.config['CELERY_ALWAYS_EAGER'] = eager
+
+    def test_unchanged_export_is_not_uploaded(self):
+        with app.test_request_context():
+            mark_pending(self.event_id, ['ical'])
+            self.assertTrue(build_export(self.event_id, 'ical'))
+            export = ScheduleExport.query.get((self.event_id, 'ical'))
+            db.session.refresh(export)
+            self.assertFalse(export.pending)
+            self.assertIsNotNone(export.built_at)
+            self.assertIsNotNone(export.content_hash)
+            self.assertFalse(build_export(self.event_id, 'ical'))
+            # nothing was requested during the builds
+            self.assertEqual(len(self.queued), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
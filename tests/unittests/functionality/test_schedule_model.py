@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime, timedelta
+
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.exporters.ical import ICalExporter
+from app.helpers.exporters.pentabarfxml import PentabarfExporter
+from app.helpers.exporters.schedule import get_schedule
+from app.helpers.exporters.xcal import XCalExporter
+from app.models import db
+from app.models.microlocation import Microlocation
+from app.models.session import Session
+from app.models.speaker import Speaker
+from app.models.track import Track
+from tests.unittests.api.utils import create_event
+from tests.unittests.auth_helper import register
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+START = datetime(2014, 8, 4, 9, 0)
+
+
+class TestScheduleModel(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            register(self.app, u'test@example.com', u'test')
+            self.event_id = create_event(creator_email=u'test@example.com',
+                                         latitude=1.23456789, longitude=2.3456789)
+            rooms = [Microlocation(name='Room %d' % index, event_id=self.event_id) for index in range(2)]
+            track = Track(name='Track', description='descp', event_id=self.event_id, color='#caf034')
+            for obj in rooms + [track]:
+                save_to_db(obj)
+            self.room_ids = [room.id for room in rooms]
+            self.track_id = track.id
+        self.sessions = 0
+
+    def add_sessions(self, count):
+        with app.test_request_context():
+            for _ in range(count):
+                index = self.sessions
+                speaker = Speaker(name='Speaker %d' % index, email='speaker%d@example.com' % index,
+                                  organisation='org', country='japan', event_id=self.event_id)
+                start = START + timedelta(days=index % 2, hours=index)
+                save_to_db(Session(title='Session %d' % index, start_time=start,
+                                   end_time=start + timedelta(minutes=30), event_id=self.event_id,
+                                   state='accepted', track=Track.query.get(self.track_id),
+                                   microlocation=Microlocation.query.get(self.room_ids[index % 2]),
+                                   speakers=[speaker]))
+                self.sessions += 1
+
+    def count_queries(self, exporter):
+        with app.test_request_context():
+            db.session.expunge_all()
+            before = len(get_debug_queries())
+            exporter.export(self.event_id)
+            return len(get_debug_queries()) - before
+
+    def test_sessions_are_grouped_by_day_and_room(self):
+        self.add_sessions(4)
+        with app.test_request_context():
+            days = get_schedule(self.event_id).days()
+            self.assertEqual([date for date, _ in days], [START.date(), (START + timedelta(days=1)).date()])
+            for date, rooms in days:
+                self.assertEqual(len(rooms), 1)
+                for room, sessions in rooms:
+                    self.assertTrue(all(session.microlocation_id == room.id for session in sessions))
+                    self.assertTrue(all(session.start_time.date() == date for session in sessions))
+                    self.assertEqual(sessions, sorted(sessions, key=lambda session: session.start_time))
+
+    def test_query_count_does_not_grow_with_the_schedule(self):
+        self.add_sessions(2)
+        counts = [self.count_queries(exporter) for exporter in [PentabarfExporter, ICalExporter, XCalExporter]]
+        self.add_sessions(10)
+        self.assertEqual([self.count_queries(exporter) for exporter in [PentabarfExporter, ICalExporter, XCalExporter]],
+                         counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
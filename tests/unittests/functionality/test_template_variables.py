@@ -0,0 +1,64 @@
+import unittest
+
+from flask import render_template_string
+from flask.ext.sqlalchemy import get_debug_queries
+
+from app import current_app as app
+from app.helpers.cache import cache, LRUCache, TieredCache
+from app.helpers.data import save_to_db
+from app.models.custom_placeholder import CustomPlaceholder
+from app.models.page import Page
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+FOOTER = u'{{ app_name }}|{% for page in system_pages %}{{ page.name }},{% endfor %}|' \
+         u'{% if logo != None %}{{ logo.url }}{% endif %}'
+
+
+class TestTemplateVariables(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        # caching is disabled for tests, plug a local cache in
+        self.old_backend = app.extensions['cache'][cache]
+        app.extensions['cache'][cache] = TieredCache(LRUCache())
+        with app.test_request_context():
+            save_to_db(Page(name='About', url='/about', place='footer', index=1))
+            save_to_db(CustomPlaceholder(name='Logo', url='/logo.png'))
+
+    def tearDown(self):
+        app.extensions['cache'][cache] = self.old_backend
+        super(TestTemplateVariables, self).tearDown()
+
+    def render(self, source):
+        with app.test_request_context():
+            issued = len(get_debug_queries())
+            html = render_template_string(source)
+            # partials rendered later in the request reuse the values
+            render_template_string(source)
+            return html, len(get_debug_queries()) - issued
+
+    def test_unused_variables_are_not_computed(self):
+        html, queries = self.render(u'{{ 1 + 1 }}')
+        self.assertEqual(html, u'2')
+        self.assertEqual(queries, 0)
+
+    def test_cached_between_requests(self):
+        html, _ = self.render(FOOTER)
+        self.assertEqual(html, u'Open Event|About,|/logo.png')
+        html, queries = self.render(FOOTER)
+        self.assertEqual(html, u'Open Event|About,|/logo.png')
+        self.assertEqual(queries, 0)
+
+    def test_commit_invalidates(self):
+        self.render(FOOTER)
+        with app.test_request_context():
+            save_to_db(Page(name='Terms', url='/terms', place='footer', index=2))
+            placeholder = CustomPlaceholder.query.filter_by(name='Logo').first()
+            placeholder.url = '/new-logo.png'
+            save_to_db(placeholder)
+        html, _ = self.render(FOOTER)
+        self.assertEqual(html, u'Open Event|Terms,About,|/new-logo.png')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.ticket_inventory import TicketInventory
+from app.helpers.ticketing import TicketingManager
+from app.models.event import Event
+from app.models.order import Order, OrderTicket
+from app.models.ticket import Ticket
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+
+class TestTicketInventory(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            event = ObjectMother.get_event()
+            save_to_db(event)
+            ticket = Ticket(name='Test Ticket', event=event, quantity=10,
+                            sales_start=datetime.now() - timedelta(days=5),
+                            sales_end=datetime.now() + timedelta(days=5))
+            save_to_db(ticket)
+            self.event_id = event.id
+            self.ticket_id = ticket.id
+
+    def _order(self, status, quantity, created_at=None):
+        order = Order(event_id=self.event_id, identifier=status + str(quantity))
+        order.status = status
+        if created_at:
+            order.created_at = created_at
+        order_ticket = OrderTicket()
+        order_ticket.ticket_id = self.ticket_id
+        order_ticket.quantity = quantity
+        order.tickets.append(order_ticket)
+        save_to_db(order)
+
+    def test_inventory(self):
+        with app.test_request_context():
+            self._order('completed', 3)
+            self._order('placed', 2)
+            self._order('pending', 1)
+            # expired holds are released
+            self._order('pending', 4, created_at=datetime.utcnow() - timedelta(hours=1))
+            self._order('cancelled', 5)
+            inventory = TicketInventory.get_event_inventory(self.event_id)[self.ticket_id]
+            self.assertEqual(inventory['sold'], 5)
+            self.assertEqual(inventory['reserved'], 1)
+            self.assertEqual(inventory['available'], 4)
+            self.assertEqual(TicketInventory.get_sold_counts([self.ticket_id]), {self.ticket_id: 5})
+            stats = TicketingManager.get_ticket_stats(Event.query.get(self.event_id))
+            self.assertEqual(stats[str(self.ticket_id)]['completed'], 5)
+
+    def test_empty(self):
+        with app.test_request_context():
+            self.assertEqual(TicketInventory.get_sold_counts([]), {})
+            inventory = TicketInventory.get_event_inventory(self.event_id)[self.ticket_id]
+            self.assertEqual(inventory['available'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
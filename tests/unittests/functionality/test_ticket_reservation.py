@@ -0,0 +1,91 @@
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+from werkzeug.datastructures import MultiDict
+
+from app import current_app as app
+from app.helpers.data import save_to_db
+from app.helpers.ticket_inventory import TicketInventory
+from app.helpers.ticketing import TicketingManager
+from app.models import db
+from app.models.ticket import Ticket
+from tests.unittests.object_mother import ObjectMother
+from tests.unittests.setup_database import Setup
+from tests.unittests.utils import OpenEventTestCase
+
+TICKET_QUANTITY = 5
+CHECKOUTS = 25
+
+
+def is_postgres():
+    return app.config['SQLALCHEMY_DATABASE_URI'].find('postgresql://') > -1
+
+
+class TestTicketReservation(OpenEventTestCase):
+    def setUp(self):
+        self.app = Setup.create_app()
+        with app.test_request_context():
+            event = ObjectMother.get_event()
+            save_to_db(event)
+            ticket = Ticket(name='Limited', event=event, quantity=TICKET_QUANTITY, max_order=TICKET_QUANTITY,
+                            sales_start=datetime.now() - timedelta(days=5),
+                            sales_end=datetime.now() + timedelta(days=5))
+            save_to_db(ticket)
+            self.event_id = event.id
+            self.ticket_id = ticket.id
+
+    def _checkout(self, quantity=1):
+        form = MultiDict([
+            ('event_id', self.event_id),
+            ('ticket_ids[]', str(self.ticket_id)),
+            ('ticket_quantities[]', str(quantity)),
+        ])
+        return TicketingManager.create_order(form)
+
+    def test_sold_out_order_is_refused(self):
+        with app.test_request_context():
+            self.assertIsNotNone(self._checkout(TICKET_QUANTITY - 1))
+            self.assertIsNone(self._checkout(2))
+            self.assertIsNotNone(self._checkout(1))
+            self.assertIsNone(self._checkout(1))
+
+    def test_expired_orders_release_tickets(self):
+        with app.test_request_context():
+            order = self._checkout(TICKET_QUANTITY)
+            self.assertIsNone(self._checkout(1))
+            order.created_at = datetime.utcnow() - timedelta(minutes=TicketingManager.get_order_expiry() + 1)
+            save_to_db(order)
+            self.assertIsNotNone(self._checkout(1))
+
+    @unittest.skipUnless(is_postgres(), 'row locks need postgresql')
+    def test_parallel_checkouts_do_not_oversell(self):
+        """Fire many concurrent checkouts at a ticket with few seats"""
+        results = []
+        start = threading.Event()
+
+        def checkout():
+            start.wait()
+            with app.test_request_context():
+                try:
+                    results.append(self._checkout() is not None)
+                finally:
+                    # every thread checks out on its own connection
+                    db.session.remove()
+
+        threads = [threading.Thread(target=checkout) for _ in range(CHECKOUTS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(True), TICKET_QUANTITY)
+        with app.test_request_context():
+            inventory = TicketInventory.get_event_inventory(self.event_id)[self.ticket_id]
+            self.assertEqual(inventory['reserved'], TICKET_QUANTITY)
+            self.assertEqual(inventory['available'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Local HTTP server serving fixed responses, for the media tests and benchmarks.
+
+    with HttpStandIn({'/a.png': ('image/png', 'data')}) as server:
+        ... get server.url('/a.png') ...
+        server.requests
+"""
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        stand_in = self.server.stand_in
+        with stand_in.lock:
+            stand_in.requests.append(self.path)
+        if self.path not in stand_in.responses:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type, body = stand_in.responses[self.path]
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class HttpStandIn(object):
+    def __init__(self, responses=None):
+        # path -> (content type, body)
+        self.responses = responses or {}
+        self.requests = []
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def url(self, path):
+        return 'http://127.0.0.1:%d%s' % (self.port, path)
+
+    def start(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.server.stand_in = self
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
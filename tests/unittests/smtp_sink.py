@@ -0,0 +1,70 @@
+"""
+Local SMTP server accepting every mail, for the mail tests and benchmarks.
+
+    with SmtpSink() as sink:
+        ... send to localhost:sink.port ...
+        sink.messages, sink.connections
+"""
+import asyncore
+import smtpd
+import threading
+
+
+class _SinkServer(smtpd.SMTPServer):
+    def __init__(self, sink):
+        smtpd.SMTPServer.__init__(self, ('127.0.0.1', 0), None)
+        self.sink = sink
+
+    def handle_accept(self):
+        self.sink.connections += 1
+        smtpd.SMTPServer.handle_accept(self)
+
+    def process_message(self, peer, mailfrom, rcpttos, data):
+        self.sink.messages.append((mailfrom, rcpttos, data))
+
+
+class SmtpSink(object):
+    def __init__(self):
+        self.messages = []
+        self.connections = 0
+        self.server = None
+        self.thread = None
+        self.running = False
+
+    @property
+    def port(self):
+        return self.server.socket.getsockname()[1]
+
+    def config(self):
+        """SMTP configuration of `send_email` pointing at the sink"""
+        return {
+            'host': '127.0.0.1',
+            'username': None,
+            'password': None,
+            'encryption': None,
+            'port': self.port,
+        }
+
+    def _serve(self):
+        while self.running:
+            asyncore.loop(timeout=0.05, count=1)
+
+    def start(self):
+        self.server = _SinkServer(self)
+        self.running = True
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.server.close()
+        asyncore.close_all()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -4,7 +4,9 @@ from datetime import datetime
 from flask import url_for
 
 from app import current_app as app
+from app.helpers.cache import cache, LRUCache, TieredCache
 from app.helpers.data import save_to_db
+from app.models import db
 from app.models.call_for_papers import CallForPaper
 from tests.unittests.object_mother import ObjectMother
 from tests.unittests.utils import OpenEventTestCase
@@ -154,6 +156,37 @@ class TestGuestEventPage(OpenEventTestCase):
                                       identifier=event.identifier), follow_redirects=True)
             self.assertEqual(rv.status_code, 404)
 
+    def test_published_event_tickets_box_view(self):
+        with app.test_request_context():
+            event = ObjectMother.get_event()
+            event.state = 'Published'
+            save_to_db(event, "Event Saved")
+            rv = self.app.get(url_for('event_detail.display_event_tickets_box', identifier=event.identifier),
+                              follow_redirects=True)
+            self.assertEqual(rv.status_code, 200)
+
+    def test_published_event_view_is_cached(self):
+        old_backend = app.extensions['cache'][cache]
+        app.extensions['cache'][cache] = TieredCache(LRUCache())
+        try:
+            with app.test_request_context():
+                event = ObjectMother.get_event()
+                event.state = 'Published'
+                save_to_db(event, "Event Saved")
+                url = url_for('event_detail.display_event_detail_home', identifier=event.identifier)
+                rv = self.app.get(url, follow_redirects=True)
+                self.assertTrue("event1" in rv.data, msg=rv.data)
+                # a raw update bypasses the invalidation hooks, the cached page is served
+                db.session.execute("UPDATE events SET name = 'renamed' WHERE id = %d" % event.id)
+                db.session.commit()
+                self.assertTrue("event1" in self.app.get(url, follow_redirects=True).data)
+                # saving the event through the ORM invalidates it
+                event.name = 'renamed again'
+                save_to_db(event, "Event Saved")
+                self.assertTrue("renamed again" in self.app.get(url, follow_redirects=True).data)
+        finally:
+            app.extensions['cache'][cache] = old_backend
+
 
 if __name__ == '__main__':
     unittest.main()